@@ -5,13 +5,20 @@
  *
  * SPDX-License-Identifier: Apache-2.0
  */
+import { tables } from '@architect/functions'
 import type { AttributeType } from '@aws-sdk/client-cognito-identity-provider'
 
 import {
   extractAttribute,
   extractAttributeRequired,
+  getGroupMemberFromUser,
+  updateGroupMemberAttributes,
 } from '~/lib/cognito.server'
 
+jest.mock('@architect/functions', () => ({
+  tables: jest.fn(),
+}))
+
 const mockUserAttribues: AttributeType[] = [
   { Name: 'sub', Value: '00000000-0000-0000-0000-000000000000' },
   { Name: 'email', Value: 'example@example.com' },
@@ -58,3 +65,61 @@ describe('extractAttributeRequired', () => {
     ).toThrow(new Error('required user attribute username is missing'))
   })
 })
+
+describe('updateGroupMemberAttributes', () => {
+  const mockUpdate = jest.fn()
+  const sub = '00000000-0000-0000-0000-000000000000'
+
+  beforeEach(() => {
+    ;(tables as unknown as jest.Mock).mockResolvedValue({
+      group_members: {
+        query: async () => ({ Items: [{ groupName: 'group' }] }),
+        update: mockUpdate,
+      },
+    })
+  })
+
+  afterEach(() => {
+    jest.clearAllMocks()
+  })
+
+  test('sets the name and affiliation', async () => {
+    await updateGroupMemberAttributes(sub, {
+      name: 'Example User',
+      affiliation: 'The Example Institute',
+    })
+    expect(mockUpdate).toHaveBeenCalledWith(
+      expect.objectContaining({
+        UpdateExpression: 'SET #name = :name, #affiliation = :affiliation',
+        ExpressionAttributeValues: {
+          ':name': 'Example User',
+          ':affiliation': 'The Example Institute',
+        },
+      })
+    )
+  })
+
+  test('removes empty attributes, like getGroupMemberFromUser', async () => {
+    await updateGroupMemberAttributes(sub, { name: 'Example User' })
+    expect(mockUpdate).toHaveBeenCalledWith(
+      expect.objectContaining({
+        UpdateExpression: 'SET #name = :name REMOVE #affiliation',
+        ExpressionAttributeValues: { ':name': 'Example User' },
+      })
+    )
+    expect(
+      getGroupMemberFromUser('group', {
+        Attributes: mockUserAttribues.filter(
+          ({ Name }) => Name !== 'custom:affiliation'
+        ),
+      })
+    ).not.toHaveProperty('affiliation')
+  })
+
+  test('removes all attributes if they are empty', async () => {
+    await updateGroupMemberAttributes(sub, { name: '', affiliation: '' })
+    const [[params]] = mockUpdate.mock.calls
+    expect(params.UpdateExpression).toBe('REMOVE #name, #affiliation')
+    expect(params).not.toHaveProperty('ExpressionAttributeValues')
+  })
+})
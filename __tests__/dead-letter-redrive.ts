@@ -0,0 +1,182 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+import { events, tables } from '@architect/functions'
+import type { Context, DynamoDBRecord } from 'aws-lambda'
+
+import recordedEvents from './table-streams/circulars.events.json'
+import { handler } from '~/events/dead-letter-redrive'
+import { deleteDeadLetter, getDeadLetters } from '~/lib/deadLetters.server'
+import { handler as circularsHandler } from '~/table-streams/circulars'
+import { unmarshallTrigger } from '~/table-streams/utils'
+
+const records = recordedEvents as Record<
+  keyof typeof recordedEvents,
+  DynamoDBRecord
+>
+
+jest.mock('@architect/functions', () => ({
+  events: { publish: jest.fn() },
+  tables: jest.fn(),
+}))
+
+jest.mock('~/lib/deadLetters.server', () => ({
+  deleteDeadLetter: jest.fn(),
+  getDeadLetters: jest.fn(),
+}))
+
+jest.mock('~/table-streams/circulars', () => ({
+  handler: jest.fn(),
+}))
+
+const mockGet = jest.fn()
+
+const context = {
+  getRemainingTimeInMillis: () => 900_000,
+} as Context
+
+function getDeadLetter(record: DynamoDBRecord) {
+  return { recordId: record.dynamodb!.SequenceNumber!, record }
+}
+
+beforeEach(() => {
+  ;(tables as unknown as jest.Mock).mockResolvedValue({
+    circulars: { get: mockGet },
+  })
+  ;(deleteDeadLetter as jest.Mock).mockResolvedValue(true)
+  ;(circularsHandler as jest.Mock).mockResolvedValue({ batchItemFailures: [] })
+})
+
+afterEach(() => {
+  jest.clearAllMocks()
+})
+
+describe('dead-letter-redrive', () => {
+  test('deletes the dead letters of records that succeed', async () => {
+    const { insert, modifyBody } = records
+    ;(getDeadLetters as jest.Mock).mockResolvedValue([
+      getDeadLetter(insert),
+      getDeadLetter(modifyBody),
+    ])
+    mockGet.mockResolvedValue(unmarshallTrigger(modifyBody.dynamodb!.NewImage))
+    ;(circularsHandler as jest.Mock).mockResolvedValue({
+      batchItemFailures: [
+        { itemIdentifier: modifyBody.dynamodb!.SequenceNumber },
+      ],
+    })
+
+    await handler({ source: 'circulars', before: 1000 }, context)
+
+    expect(getDeadLetters).toHaveBeenCalledWith('circulars', 1000)
+    expect(circularsHandler).toHaveBeenCalledTimes(1)
+    expect(deleteDeadLetter).toHaveBeenCalledTimes(1)
+    expect(deleteDeadLetter).toHaveBeenCalledWith(
+      'circulars',
+      insert.dynamodb!.SequenceNumber,
+      expect.any(Number)
+    )
+  })
+
+  test('discards modifications that newer changes superseded', async () => {
+    const { modifyBody } = records
+    ;(getDeadLetters as jest.Mock).mockResolvedValue([
+      getDeadLetter(modifyBody),
+    ])
+    mockGet.mockResolvedValue({
+      ...unmarshallTrigger(modifyBody.dynamodb!.NewImage),
+      body: 'A newer edit',
+    })
+
+    await handler({ source: 'circulars' }, context)
+
+    expect(circularsHandler).not.toHaveBeenCalled()
+    expect(deleteDeadLetter).toHaveBeenCalledWith(
+      'circulars',
+      modifyBody.dynamodb!.SequenceNumber,
+      expect.any(Number)
+    )
+  })
+
+  test('replays insertions with the current item', async () => {
+    const { insert } = records
+    ;(getDeadLetters as jest.Mock).mockResolvedValue([getDeadLetter(insert)])
+    const item = {
+      ...unmarshallTrigger(insert.dynamodb!.NewImage),
+      body: 'A newer edit',
+    }
+    mockGet.mockResolvedValue(item)
+
+    await handler({ source: 'circulars' }, context)
+
+    const [[{ Records }]] = (circularsHandler as jest.Mock).mock.calls
+    expect(Records).toHaveLength(1)
+    expect(unmarshallTrigger(Records[0].dynamodb.NewImage)).toEqual(item)
+    expect(Records[0].dynamodb.SequenceNumber).toBe(
+      insert.dynamodb!.SequenceNumber
+    )
+  })
+
+  test('discards records of circulars that were deleted', async () => {
+    const { modifyBody } = records
+    ;(getDeadLetters as jest.Mock).mockResolvedValue([
+      getDeadLetter(modifyBody),
+    ])
+    mockGet.mockResolvedValue(undefined)
+
+    await handler({ source: 'circulars' }, context)
+
+    expect(circularsHandler).not.toHaveBeenCalled()
+    expect(deleteDeadLetter).toHaveBeenCalledTimes(1)
+  })
+
+  test('keeps the dead letters if the handler throws', async () => {
+    const { insert } = records
+    ;(getDeadLetters as jest.Mock).mockResolvedValue([getDeadLetter(insert)])
+    mockGet.mockResolvedValue(unmarshallTrigger(insert.dynamodb!.NewImage))
+    ;(circularsHandler as jest.Mock).mockRejectedValue(new Error('Oops'))
+    jest.spyOn(console, 'error').mockImplementation(() => {})
+
+    await handler({ source: 'circulars' }, context)
+
+    expect(deleteDeadLetter).not.toHaveBeenCalled()
+  })
+
+  test('does not replay anything in a dry run', async () => {
+    jest.spyOn(console, 'log').mockImplementation(() => {})
+    ;(getDeadLetters as jest.Mock).mockResolvedValue([
+      { ...getDeadLetter(records.insert), attempts: 10, deadOn: 0 },
+    ])
+
+    await handler({ source: 'circulars', dryRun: true }, context)
+
+    expect(circularsHandler).not.toHaveBeenCalled()
+    expect(deleteDeadLetter).not.toHaveBeenCalled()
+  })
+
+  test('continues in a new invocation when time is running out', async () => {
+    ;(getDeadLetters as jest.Mock).mockResolvedValue([
+      getDeadLetter(records.insert),
+    ])
+
+    await handler(
+      { source: 'circulars', rate: 5, before: 1000 },
+      { getRemainingTimeInMillis: () => 1000 } as Context
+    )
+
+    expect(circularsHandler).not.toHaveBeenCalled()
+    expect(events.publish).toHaveBeenCalledWith({
+      name: 'dead-letter-redrive',
+      payload: { source: 'circulars', rate: 5, before: 1000 },
+    })
+  })
+
+  test('rejects unknown sources', async () => {
+    await expect(handler({ source: 'foo' }, context)).rejects.toThrow(
+      'unknown dead letter source'
+    )
+  })
+})
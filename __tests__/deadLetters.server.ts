@@ -0,0 +1,100 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+import { tables } from '@architect/functions'
+import { ConditionalCheckFailedException } from '@aws-sdk/client-dynamodb'
+
+import { deleteDeadLetter, putFailedRecord } from '~/lib/deadLetters.server'
+
+jest.mock('@architect/functions', () => ({
+  tables: jest.fn(),
+}))
+
+const mockUpdate = jest.fn()
+const mockDelete = jest.fn()
+
+beforeEach(() => {
+  ;(tables as unknown as jest.Mock).mockResolvedValue({
+    dead_letters: { update: mockUpdate },
+    _doc: { delete: mockDelete },
+    name: (name: string) => name,
+  })
+})
+
+afterEach(() => {
+  jest.clearAllMocks()
+})
+
+describe('putFailedRecord', () => {
+  test('counts a failure without keeping a dead letter', async () => {
+    mockUpdate.mockResolvedValueOnce({ Attributes: { attempts: 1 } })
+
+    await expect(
+      putFailedRecord('circulars', '1', { a: 1 }, new Error('Oops'), 3)
+    ).resolves.toBe(false)
+
+    expect(mockUpdate).toHaveBeenCalledTimes(1)
+    const [[{ Key, UpdateExpression, ExpressionAttributeValues }]] =
+      mockUpdate.mock.calls
+    expect(Key).toEqual({ source: 'circulars', recordId: '1' })
+    expect(UpdateExpression).toContain('ADD attempts :one')
+    expect(ExpressionAttributeValues[':record']).toBe('{"a":1}')
+    expect(ExpressionAttributeValues[':error']).toContain('Oops')
+  })
+
+  test('keeps a dead letter once the record has failed too many times', async () => {
+    mockUpdate.mockResolvedValueOnce({ Attributes: { attempts: 3 } })
+
+    await expect(
+      putFailedRecord('circulars', '1', { a: 1 }, 'Oops', 3)
+    ).resolves.toBe(true)
+
+    expect(mockUpdate).toHaveBeenCalledTimes(2)
+    expect(mockUpdate).toHaveBeenLastCalledWith(
+      expect.objectContaining({
+        Key: { source: 'circulars', recordId: '1' },
+        UpdateExpression:
+          'SET deadOn = if_not_exists(deadOn, :now) REMOVE #ttl',
+      })
+    )
+  })
+})
+
+describe('deleteDeadLetter', () => {
+  test('deletes a dead letter that has not failed again', async () => {
+    mockDelete.mockResolvedValueOnce({})
+
+    await expect(deleteDeadLetter('circulars', '1', 1000)).resolves.toBe(true)
+
+    expect(mockDelete).toHaveBeenCalledWith(
+      expect.objectContaining({
+        TableName: 'dead_letters',
+        Key: { source: 'circulars', recordId: '1' },
+        ConditionExpression: 'lastFailedOn < :before',
+        ExpressionAttributeValues: { ':before': 1000 },
+      })
+    )
+  })
+
+  test('keeps a dead letter that failed again', async () => {
+    mockDelete.mockRejectedValueOnce(
+      new ConditionalCheckFailedException({ message: '', $metadata: {} })
+    )
+
+    await expect(deleteDeadLetter('circulars', '1', 1000)).resolves.toBe(
+      false
+    )
+  })
+
+  test('throws other errors', async () => {
+    mockDelete.mockRejectedValueOnce(new Error('Throttled'))
+
+    await expect(deleteDeadLetter('circulars', '1', 1000)).rejects.toThrow(
+      'Throttled'
+    )
+  })
+})
@@ -0,0 +1,157 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+import { queues, tables } from '@architect/functions'
+import { paginateQuery } from '@aws-sdk/lib-dynamodb'
+import type { Context, SQSEvent } from 'aws-lambda'
+
+import {
+  type BulkEmailChunk,
+  isTransientEmailError,
+  sendEmailBulkChunk,
+} from '~/lib/email.server'
+import { handler } from '~/queues/email-outgoing'
+
+jest.mock('@architect/functions', () => ({
+  queues: { publish: jest.fn() },
+  tables: jest.fn(),
+}))
+
+jest.mock('@aws-sdk/lib-dynamodb', () => ({
+  paginateQuery: jest.fn(),
+}))
+
+jest.mock('~/lib/email.server', () => ({
+  getMaxSendRate: async () => 14,
+  isTransientEmailError: jest.fn(),
+  sendEmailBulkChunk: jest.fn(),
+}))
+
+const jobId = 'circular-1-1'
+
+const event = {
+  Records: [{ body: JSON.stringify({ jobId }) }],
+} as SQSEvent
+
+const context = {
+  getRemainingTimeInMillis: () => 900_000,
+} as Context
+
+const mockUpdate = jest.fn()
+
+let chunk: BulkEmailChunk
+
+beforeEach(() => {
+  chunk = {
+    jobId,
+    chunk: 0,
+    addresses: ['a@example.org', 'b@example.org'],
+    status: 'pending',
+    attempts: 4,
+  }
+  ;(tables as unknown as jest.Mock).mockResolvedValue({
+    email_outgoing_jobs: { get: async () => ({ jobId, topic: 'circulars' }) },
+    email_outgoing_chunks: { update: mockUpdate },
+    _doc: {},
+    name: (name: string) => name,
+  })
+  ;(paginateQuery as jest.Mock).mockImplementation(async function* () {
+    const { status, retryAfter } = chunk
+    yield {
+      Items: ['pending', 'sending'].includes(status)
+        ? [{ chunk: chunk.chunk, retryAfter }]
+        : [],
+    }
+  })
+  // Apply claims and checkpoints to the chunk.
+  mockUpdate.mockImplementation(
+    async ({ UpdateExpression, ExpressionAttributeValues: values }) => {
+      if (UpdateExpression.startsWith('SET #status = :sending')) {
+        chunk = { ...chunk, status: 'sending' }
+        return { Attributes: chunk }
+      }
+      chunk = {
+        ...chunk,
+        status: values[':status'],
+        addresses: values[':addresses'],
+        attempts: values[':attempts'],
+        throttles: values[':throttles'],
+        retryAfter: values[':retryAfter'],
+      }
+      return {}
+    }
+  )
+  jest.spyOn(console, 'error').mockImplementation(() => {})
+})
+
+afterEach(() => {
+  jest.clearAllMocks()
+})
+
+describe('email-outgoing', () => {
+  test('retries a throttled chunk later without counting the attempt', async () => {
+    ;(sendEmailBulkChunk as jest.Mock).mockRejectedValue(
+      new Error('TooManyRequestsException')
+    )
+    ;(isTransientEmailError as jest.Mock).mockReturnValue(true)
+    const now = Date.now()
+
+    await handler(event, context)
+
+    expect(sendEmailBulkChunk).toHaveBeenCalledTimes(1)
+    expect(chunk).toMatchObject({
+      status: 'pending',
+      attempts: 4,
+      throttles: 1,
+      addresses: ['a@example.org', 'b@example.org'],
+    })
+    expect(chunk.retryAfter).toBeGreaterThan(now)
+    expect(queues.publish).toHaveBeenCalledWith({
+      name: 'email-outgoing',
+      payload: { jobId },
+      delaySeconds: expect.any(Number),
+    })
+    const [[{ delaySeconds }]] = (queues.publish as jest.Mock).mock.calls
+    expect(delaySeconds).toBeGreaterThan(0)
+    expect(delaySeconds).toBeLessThanOrEqual(900)
+  })
+
+  test('gives up on recipients that keep failing', async () => {
+    ;(sendEmailBulkChunk as jest.Mock).mockResolvedValue(['b@example.org'])
+
+    await handler(event, context)
+
+    expect(chunk).toMatchObject({
+      status: 'failed',
+      attempts: 5,
+      addresses: ['b@example.org'],
+    })
+    expect(queues.publish).not.toHaveBeenCalled()
+  })
+
+  test('does not claim a chunk before its retry is due', async () => {
+    chunk.retryAfter = Date.now() + 120_000
+
+    await handler(event, context)
+
+    expect(mockUpdate).not.toHaveBeenCalled()
+    expect(sendEmailBulkChunk).not.toHaveBeenCalled()
+    const [[{ delaySeconds }]] = (queues.publish as jest.Mock).mock.calls
+    expect(delaySeconds).toBeGreaterThan(100)
+    expect(delaySeconds).toBeLessThanOrEqual(120)
+  })
+
+  test('sends a chunk once its retry is due', async () => {
+    chunk.retryAfter = Date.now() - 1000
+    ;(sendEmailBulkChunk as jest.Mock).mockResolvedValue([])
+
+    await handler(event, context)
+
+    expect(chunk).toMatchObject({ status: 'sent', attempts: 5 })
+    expect(queues.publish).not.toHaveBeenCalled()
+  })
+})
@@ -0,0 +1,197 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+import { events, tables } from '@architect/functions'
+import { search } from '@nasa-gcn/architect-functions-search'
+import type { Context } from 'aws-lambda'
+
+import { handler } from '~/events/search-reindex'
+import type { ReindexState } from '~/lib/search.server'
+
+jest.mock('@architect/functions', () => ({
+  events: { publish: jest.fn() },
+  tables: jest.fn(),
+}))
+
+jest.mock('@nasa-gcn/architect-functions-search', () => ({
+  search: jest.fn(),
+}))
+
+jest.mock('github-slugger', () => ({
+  slug: jest.fn(),
+}))
+
+jest.mock('node:timers/promises', () => ({
+  setTimeout: jest.fn(),
+}))
+
+const mockScan = jest.fn()
+const mockBatchGet = jest.fn()
+const mockStateGet = jest.fn()
+const mockStatePut = jest.fn()
+const mockStateDelete = jest.fn()
+const mockBulk = jest.fn()
+const mockIndices = {
+  create: jest.fn(),
+  refresh: jest.fn(),
+  existsAlias: jest.fn(),
+  getAlias: jest.fn(),
+  exists: jest.fn(),
+  updateAliases: jest.fn(),
+  delete: jest.fn(),
+}
+
+const target = 'circulars-1'
+
+const context = {
+  getRemainingTimeInMillis: () => 900_000,
+} as Context
+
+function getState(): ReindexState {
+  return {
+    alias: 'circulars',
+    target,
+    startedOn: 0,
+    segments: [{ done: false }],
+  }
+}
+
+/** Get the actions and documents of each _bulk request. */
+function getBulkBodies() {
+  return mockBulk.mock.calls.map(([{ body }]) => body)
+}
+
+beforeEach(() => {
+  ;(tables as unknown as jest.Mock).mockResolvedValue({
+    _doc: { scan: mockScan, batchGet: mockBatchGet },
+    name: (name: string) => name,
+    search_reindex: {
+      get: mockStateGet,
+      put: mockStatePut,
+      update: jest.fn(),
+      delete: mockStateDelete,
+    },
+  })
+  ;(search as unknown as jest.Mock).mockResolvedValue({
+    bulk: mockBulk,
+    indices: mockIndices,
+  })
+  mockBulk.mockResolvedValue({ body: { items: [] } })
+  mockIndices.existsAlias.mockResolvedValue({ body: true })
+  mockIndices.getAlias.mockResolvedValue({ body: { 'circulars-0': {} } })
+  mockScan.mockResolvedValue({
+    Items: [
+      { circularId: 1, subject: 'GRB 1' },
+      { circularId: 2, subject: 'GRB 2' },
+    ],
+  })
+  mockBatchGet.mockResolvedValue({
+    Responses: { circulars: [{ circularId: 1 }, { circularId: 2 }] },
+  })
+})
+
+afterEach(() => {
+  jest.clearAllMocks()
+})
+
+describe('search-reindex', () => {
+  test('starts a reindex by creating the new index', async () => {
+    mockStateGet.mockResolvedValue(undefined)
+
+    await handler({ alias: 'circulars', totalSegments: 1 }, context)
+
+    expect(mockIndices.create).toHaveBeenCalledWith({
+      index: expect.stringMatching(/^circulars-\d+$/),
+      body: undefined,
+    })
+    const [[{ index: newTarget }]] = mockIndices.create.mock.calls
+    expect(mockStatePut).toHaveBeenCalledWith(
+      expect.objectContaining({ alias: 'circulars', target: newTarget })
+    )
+  })
+
+  test('copies documents that are absent and swaps the alias', async () => {
+    mockStateGet.mockResolvedValue(getState())
+
+    await handler({ alias: 'circulars' }, context)
+
+    expect(getBulkBodies()[0]).toEqual([
+      { create: { _index: target, _id: '1' } },
+      { circularId: 1, subject: 'GRB 1' },
+      { create: { _index: target, _id: '2' } },
+      { circularId: 2, subject: 'GRB 2' },
+    ])
+    expect(mockBulk).toHaveBeenCalledTimes(1)
+    expect(mockIndices.updateAliases).toHaveBeenCalledWith({
+      body: {
+        actions: [
+          { remove: { index: 'circulars-0', alias: 'circulars' } },
+          { add: { index: target, alias: 'circulars' } },
+        ],
+      },
+    })
+    expect(mockIndices.delete).toHaveBeenCalledWith({ index: 'circulars-0' })
+    expect(mockStateDelete).toHaveBeenCalledWith({ alias: 'circulars' })
+  })
+
+  test('deletes documents of items that were deleted during the scan', async () => {
+    mockStateGet.mockResolvedValue(getState())
+    mockBatchGet.mockResolvedValue({
+      Responses: { circulars: [{ circularId: 1 }] },
+    })
+
+    await handler({ alias: 'circulars' }, context)
+
+    expect(mockBatchGet).toHaveBeenCalledWith({
+      RequestItems: {
+        circulars: {
+          Keys: [{ circularId: 1 }, { circularId: 2 }],
+          ProjectionExpression: 'circularId',
+        },
+      },
+    })
+    expect(getBulkBodies()[1]).toEqual([
+      { delete: { _index: target, _id: '2' } },
+    ])
+  })
+
+  test('does not finish if the copy fails', async () => {
+    mockStateGet.mockResolvedValue(getState())
+    mockBulk.mockResolvedValue({
+      body: {
+        errors: true,
+        items: [
+          { create: { _id: '1', status: 429, error: { reason: 'Busy' } } },
+        ],
+      },
+    })
+
+    await expect(handler({ alias: 'circulars' }, context)).rejects.toThrow()
+    expect(mockIndices.updateAliases).not.toHaveBeenCalled()
+  })
+
+  test('continues in a new invocation when time is running out', async () => {
+    mockStateGet.mockResolvedValue(getState())
+
+    await handler({ alias: 'circulars' }, {
+      getRemainingTimeInMillis: () => 1000,
+    } as Context)
+
+    expect(mockScan).not.toHaveBeenCalled()
+    expect(mockIndices.updateAliases).not.toHaveBeenCalled()
+    expect(events.publish).toHaveBeenCalledWith({
+      name: 'search-reindex',
+      payload: { alias: 'circulars' },
+    })
+  })
+
+  test('rejects unknown aliases', async () => {
+    await expect(handler({ alias: 'foo' }, context)).rejects.toThrow(
+      'Cannot reindex unknown alias: foo'
+    )
+  })
+})
@@ -0,0 +1,113 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+import type {
+  APIGatewayProxyEventV2,
+  APIGatewayProxyStructuredResultV2,
+  Context,
+} from 'aws-lambda'
+
+import { handler } from '../server'
+
+const mockRemixHandler = jest.fn()
+
+jest.mock('@remix-run/architect', () => ({
+  createRequestHandler:
+    () =>
+    (...args: unknown[]) =>
+      mockRemixHandler(...args),
+}))
+
+jest.mock('@remix-run/dev/server-build', () => ({}), { virtual: true })
+
+jest.mock('~/routes/_auth/auth.server', () => ({
+  sessionCookieName: 'session',
+}))
+
+const anonymousCacheControl =
+  'public, max-age=0, s-maxage=60, stale-while-revalidate=600'
+
+function getEvent({
+  method = 'GET',
+  cookies,
+}: { method?: string; cookies?: string[] } = {}) {
+  return {
+    headers: {},
+    cookies,
+    requestContext: { http: { method } },
+  } as unknown as APIGatewayProxyEventV2
+}
+
+async function handle(
+  event: APIGatewayProxyEventV2,
+  result: APIGatewayProxyStructuredResultV2
+) {
+  mockRemixHandler.mockResolvedValueOnce(result)
+  return (await handler(
+    event,
+    {} as Context,
+    () => {}
+  )) as APIGatewayProxyStructuredResultV2
+}
+
+describe('handler', () => {
+  test('does not cache responses by default', async () => {
+    const result = await handle(getEvent(), { statusCode: 200, body: '' })
+    expect(result.headers).toEqual({ 'Cache-Control': 'max-age=0, no-store' })
+  })
+
+  test('keeps the Cache-Control header set by a route', async () => {
+    const result = await handle(getEvent(), {
+      statusCode: 200,
+      headers: { 'cache-control': 'private, max-age=60' },
+    })
+    expect(result.headers).toEqual({ 'cache-control': 'private, max-age=60' })
+  })
+
+  test('caches anonymous requests for routes that opt in', async () => {
+    const result = await handle(getEvent({ cookies: ['theme=dark'] }), {
+      statusCode: 200,
+      headers: { 'x-anonymous-cache-control': anonymousCacheControl },
+    })
+    expect(result.headers).toEqual({
+      'Cache-Control': anonymousCacheControl,
+      Vary: 'Cookie',
+    })
+  })
+
+  test('does not cache requests with a session cookie', async () => {
+    const result = await handle(getEvent({ cookies: ['session=abc'] }), {
+      statusCode: 200,
+      headers: { 'x-anonymous-cache-control': anonymousCacheControl },
+    })
+    expect(result.headers).toEqual({ 'Cache-Control': 'max-age=0, no-store' })
+  })
+
+  test('does not cache responses that set cookies', async () => {
+    const result = await handle(getEvent(), {
+      statusCode: 200,
+      headers: { 'x-anonymous-cache-control': anonymousCacheControl },
+      cookies: ['session=abc'],
+    })
+    expect(result.headers).toEqual({ 'Cache-Control': 'max-age=0, no-store' })
+  })
+
+  test('does not cache errors or other methods', async () => {
+    for (const [method, statusCode] of [
+      ['GET', 404],
+      ['POST', 200],
+    ] as const) {
+      const result = await handle(getEvent({ method }), {
+        statusCode,
+        headers: { 'x-anonymous-cache-control': anonymousCacheControl },
+      })
+      expect(result.headers).toEqual({
+        'Cache-Control': 'max-age=0, no-store',
+      })
+    }
+  })
+})
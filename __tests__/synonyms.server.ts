@@ -12,6 +12,7 @@ import crypto from 'crypto'
 
 import type { Circular } from '~/routes/circulars/circulars.lib'
 import {
+  getEventIdDocument,
   moderatorCreateSynonyms,
   putSynonyms,
 } from '~/routes/synonyms/synonyms.server'
@@ -362,3 +363,19 @@ describe('putSynonyms', () => {
     expect(mockBatchWrite).toHaveBeenLastCalledWith(params)
   })
 })
+
+describe('getEventIdDocument', () => {
+  test('has a suggestion input for every word in the event ID', () => {
+    expect(getEventIdDocument('GRB 230812A')).toEqual({
+      eventId: 'GRB 230812A',
+      suggest: ['GRB 230812A', '230812A'],
+    })
+  })
+
+  test('treats hyphens and underscores as word separators', () => {
+    expect(getEventIdDocument('IceCube-230101A')).toEqual({
+      eventId: 'IceCube-230101A',
+      suggest: ['IceCube 230101A', '230101A'],
+    })
+  })
+})
@@ -0,0 +1,292 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+import { tables } from '@architect/functions'
+import { search } from '@nasa-gcn/architect-functions-search'
+import type { DynamoDBRecord } from 'aws-lambda'
+
+import recordedEvents from './circulars.events.json'
+import { send as sendKafka } from '~/lib/kafka.server'
+import { getWriteIndices } from '~/lib/search.server'
+import { putCircularBodyHast } from '~/routes/circulars/body.server'
+import { bumpSearchCacheVersion } from '~/routes/circulars/cache.server'
+import { send } from '~/routes/circulars/circulars.server'
+import { diffCircularRecord } from '~/table-streams/circulars/diff'
+import { handler } from '~/table-streams/circulars/index'
+
+const records = recordedEvents as Record<
+  keyof typeof recordedEvents,
+  DynamoDBRecord
+>
+
+jest.mock('github-slugger', () => ({
+  slug: jest.fn(),
+}))
+
+jest.mock('@nasa-gcn/architect-functions-search', () => ({
+  search: jest.fn(),
+}))
+
+jest.mock('@architect/functions', () => ({
+  tables: jest.fn(),
+}))
+
+jest.mock('~/lib/kafka.server', () => ({
+  send: jest.fn(),
+}))
+
+jest.mock('~/routes/circulars/circulars.server', () => ({
+  send: jest.fn(),
+}))
+
+jest.mock('~/routes/circulars/cache.server', () => ({
+  bumpSearchCacheVersion: jest.fn(),
+}))
+
+jest.mock('~/routes/circulars/body.server', () => ({
+  putCircularBodyHast: jest.fn(),
+}))
+
+jest.mock('~/lib/search.server', () => ({
+  ...jest.requireActual('~/lib/search.server'),
+  getWriteIndices: jest.fn(),
+}))
+
+/** Get the write indices when no reindex is in progress. */
+async function getAliasOnly(index: string) {
+  return [index]
+}
+
+/** Get the write indices while a reindex into a new index is in progress. */
+async function getAliasAndReindexTarget(index: string) {
+  return [index, `${index}-1`]
+}
+
+const mockBulk = jest.fn()
+const mockDeadLetterUpdate = jest.fn()
+
+beforeEach(() => {
+  ;(getWriteIndices as jest.Mock).mockImplementation(getAliasOnly)
+  mockBulk.mockResolvedValue({ body: { items: [] } })
+  mockDeadLetterUpdate.mockResolvedValue({ Attributes: { attempts: 1 } })
+  ;(search as unknown as jest.Mock).mockReturnValue({
+    bulk: mockBulk,
+    indices: { exists: async () => ({ body: true }) },
+  })
+  ;(tables as unknown as jest.Mock).mockResolvedValue({
+    synonyms: { get: async () => undefined },
+    circulars: { query: async () => ({ Count: 1 }) },
+    dead_letters: { update: mockDeadLetterUpdate },
+  })
+})
+
+afterEach(() => {
+  jest.clearAllMocks()
+})
+
+/** Get the actions and documents in the _bulk requests for circulars. */
+function getCircularsBulkBody() {
+  const body: object[] = mockBulk.mock.calls.flatMap(([{ body }]) => body)
+  const result = []
+  for (let i = 0; i < body.length; i++) {
+    const [[action, { _index }]] = Object.entries(body[i])
+    const hasDocument = action !== 'delete'
+    if (_index === 'circulars')
+      result.push(...body.slice(i, hasDocument ? i + 2 : i + 1))
+    if (hasDocument) i++
+  }
+  return result
+}
+
+describe('diffCircularRecord', () => {
+  test('classifies an insert', () => {
+    expect(diffCircularRecord(records.insert).kind).toBe('insert')
+  })
+
+  test('classifies a change to the body as content', () => {
+    expect(diffCircularRecord(records.modifyBody)).toEqual({
+      kind: 'content',
+      changedFields: ['body', 'version'],
+    })
+  })
+
+  test('classifies a new bibcode as internal', () => {
+    expect(diffCircularRecord(records.modifyBibcode)).toEqual({
+      kind: 'internal',
+      changedFields: ['bibcode'],
+    })
+  })
+
+  test('classifies identical images as none', () => {
+    expect(diffCircularRecord(records.modifyIdentical)).toEqual({
+      kind: 'none',
+      changedFields: [],
+    })
+  })
+
+  test('classifies a removal', () => {
+    expect(diffCircularRecord(records.remove).kind).toBe('remove')
+  })
+})
+
+describe('circulars table stream handler', () => {
+  test('an insert is indexed, published, and emailed', async () => {
+    await handler({ Records: [records.insert] })
+
+    expect(getCircularsBulkBody()).toEqual([
+      { index: { _index: 'circulars', _id: '35000' } },
+      expect.objectContaining({ circularId: 35000 }),
+    ])
+    expect(sendKafka).toHaveBeenCalledTimes(1)
+    expect(sendKafka).toHaveBeenCalledWith('gcn.circulars', [
+      { key: '35000', value: expect.stringContaining('"circularId":35000') },
+    ])
+    expect(send).toHaveBeenCalledTimes(1)
+    expect(bumpSearchCacheVersion).toHaveBeenCalledTimes(1)
+  })
+
+  test('a content change is reindexed and republished', async () => {
+    await handler({ Records: [records.modifyBody] })
+
+    expect(getCircularsBulkBody()).toEqual([
+      { index: { _index: 'circulars', _id: '35000' } },
+      expect.objectContaining({ version: 2 }),
+    ])
+    expect(sendKafka).toHaveBeenCalledTimes(1)
+    expect(send).not.toHaveBeenCalled()
+    expect(putCircularBodyHast).toHaveBeenCalledWith(
+      expect.objectContaining({ circularId: 35000, version: 2 })
+    )
+  })
+
+  test('an internal change is a partial update and is not republished', async () => {
+    await handler({ Records: [records.modifyBibcode] })
+
+    expect(getCircularsBulkBody()).toEqual([
+      { update: { _index: 'circulars', _id: '35000' } },
+      { doc: { bibcode: '2024GCN.35000....1E' } },
+    ])
+    expect(sendKafka).toHaveBeenCalledWith('gcn.circulars', [])
+    expect(putCircularBodyHast).not.toHaveBeenCalled()
+  })
+
+  test('an internal change after a content change is a full update', async () => {
+    await handler({ Records: [records.modifyBody, records.modifyBibcode] })
+
+    expect(getCircularsBulkBody()).toEqual([
+      { index: { _index: 'circulars', _id: '35000' } },
+      expect.objectContaining({ bibcode: '2024GCN.35000....1E' }),
+    ])
+    expect(sendKafka).toHaveBeenCalledTimes(1)
+  })
+
+  test('an internal change during a reindex is a full update', async () => {
+    ;(getWriteIndices as jest.Mock).mockImplementation(getAliasAndReindexTarget)
+
+    await handler({ Records: [records.modifyBibcode] })
+
+    const body = mockBulk.mock.calls.flatMap(([{ body }]) => body)
+    for (const _index of ['circulars', 'circulars-1'])
+      expect(body).toContainEqual({ index: { _index, _id: '35000' } })
+    expect(body).toContainEqual(
+      expect.objectContaining({ bibcode: '2024GCN.35000....1E' })
+    )
+    expect(body).not.toContainEqual(
+      expect.objectContaining({ update: expect.anything() })
+    )
+  })
+
+  test('identical images are dropped', async () => {
+    await handler({ Records: [records.modifyIdentical] })
+
+    expect(mockBulk).not.toHaveBeenCalled()
+    expect(sendKafka).toHaveBeenCalledWith('gcn.circulars', [])
+    expect(bumpSearchCacheVersion).not.toHaveBeenCalled()
+  })
+
+  test('records that fail to index are reported as batch item failures', async () => {
+    mockBulk.mockResolvedValue({
+      body: {
+        errors: true,
+        items: [
+          {
+            index: {
+              _id: '35000',
+              status: 429,
+              error: { type: 'es_rejected_execution_exception', reason: '' },
+            },
+          },
+        ],
+      },
+    })
+
+    await expect(handler({ Records: [records.insert] })).resolves.toEqual({
+      batchItemFailures: [{ itemIdentifier: '100000000000000000001' }],
+    })
+    expect(sendKafka).toHaveBeenCalledWith('gcn.circulars', [])
+    expect(send).not.toHaveBeenCalled()
+    expect(mockDeadLetterUpdate).toHaveBeenCalledTimes(1)
+  })
+
+  test('records that keep failing are kept as dead letters', async () => {
+    mockBulk.mockResolvedValue({
+      body: {
+        errors: true,
+        items: [
+          {
+            index: {
+              _id: '35000',
+              status: 429,
+              error: { type: 'es_rejected_execution_exception', reason: '' },
+            },
+          },
+        ],
+      },
+    })
+    mockDeadLetterUpdate.mockResolvedValue({ Attributes: { attempts: 10 } })
+
+    await expect(handler({ Records: [records.insert] })).resolves.toEqual({
+      batchItemFailures: [],
+    })
+    expect(mockDeadLetterUpdate).toHaveBeenCalledTimes(2)
+    expect(mockDeadLetterUpdate).toHaveBeenNthCalledWith(
+      1,
+      expect.objectContaining({
+        Key: { source: 'circulars', recordId: '100000000000000000001' },
+      })
+    )
+    const [[{ ExpressionAttributeValues }]] = mockDeadLetterUpdate.mock.calls
+    expect(JSON.parse(ExpressionAttributeValues[':record'])).toEqual(
+      records.insert
+    )
+    expect(send).not.toHaveBeenCalled()
+  })
+
+  test('records fail when the whole _bulk request fails', async () => {
+    mockBulk.mockRejectedValue(new Error('Service Unavailable'))
+
+    await expect(handler({ Records: [records.insert] })).resolves.toEqual({
+      batchItemFailures: [{ itemIdentifier: '100000000000000000001' }],
+    })
+    expect(mockDeadLetterUpdate).toHaveBeenCalledWith(
+      expect.objectContaining({
+        Key: { source: 'circulars', recordId: '100000000000000000001' },
+      })
+    )
+    expect(sendKafka).toHaveBeenCalledWith('gcn.circulars', [])
+    expect(send).not.toHaveBeenCalled()
+  })
+
+  test('a removal is deleted from the index and not republished', async () => {
+    await handler({ Records: [records.remove] })
+
+    expect(getCircularsBulkBody()).toEqual([
+      { delete: { _index: 'circulars', _id: '35000' } },
+    ])
+    expect(sendKafka).toHaveBeenCalledWith('gcn.circulars', [])
+  })
+})
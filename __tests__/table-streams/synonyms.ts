@@ -21,21 +21,6 @@ const existingEventSlug = existingEventId.replace(' ', '-').toLowerCase()
 const eventSlug = eventId.replace(' ', '-').toLowerCase()
 const additionalEventSlug = additionalEventId.replace(' ', '-').toLowerCase()
 
-const putData = {
-  index: 'synonym-groups',
-  id: synonymId,
-  body: {
-    synonymId,
-    slugs: [] as string[],
-    eventIds: [] as string[],
-  },
-}
-
-const deleteData = {
-  index: 'synonym-groups',
-  id: previousSynonymId,
-}
-
 const mockStreamEvent = {
   Records: [
     {
@@ -144,9 +129,31 @@ jest.mock('@architect/functions', () => ({
   tables: jest.fn(),
 }))
 
-const mockIndex = jest.fn()
-const mockDelete = jest.fn()
+// No reindex is in progress, so only the alias receives writes.
+jest.mock('~/lib/search.server', () => ({
+  ...jest.requireActual('~/lib/search.server'),
+  getWriteIndices: async (index: string) => [index],
+}))
+
+const mockBulk = jest.fn()
 const mockQuery = jest.fn()
+const mockCircularsQuery = jest.fn()
+
+const versioning = { version: expect.any(Number), version_type: 'external' }
+
+function indexAction(id: string) {
+  return { index: { _index: 'synonym-groups', _id: id, ...versioning } }
+}
+
+function deleteAction(id: string) {
+  return { delete: { _index: 'synonym-groups', _id: id, ...versioning } }
+}
+
+beforeEach(() => {
+  mockBulk.mockResolvedValue({ body: { items: [] } })
+  mockCircularsQuery.mockResolvedValue({ Items: [] })
+  ;(search as unknown as jest.Mock).mockReturnValue({ bulk: mockBulk })
+})
 
 afterEach(() => {
   jest.clearAllMocks()
@@ -154,11 +161,6 @@ afterEach(() => {
 
 describe('testing synonymGroup table-stream', () => {
   test('insert initial synonym record where no previous opensearch record exists', async () => {
-    putData.id = synonymId
-    putData.body.synonymId = synonymId
-    putData.body.eventIds = [eventId]
-    putData.body.slugs = [eventSlug]
-
     mockQuery.mockResolvedValue({
       Items: [{ synonymId, eventId, slug: eventSlug }],
     })
@@ -167,28 +169,24 @@ describe('testing synonymGroup table-stream', () => {
       synonyms: {
         query: mockQuery,
       },
+      circulars: { query: mockCircularsQuery },
     }
 
     ;(tables as unknown as jest.Mock).mockResolvedValue(mockClient)
-    ;(search as unknown as jest.Mock).mockReturnValue({
-      index: mockIndex,
-      delete: mockDelete,
-    })
 
     await handler(mockStreamEvent)
 
-    expect(mockIndex).toHaveBeenCalledWith(putData)
-    expect(mockIndex).toHaveBeenCalledTimes(1)
-    expect(mockDelete).not.toHaveBeenCalled()
+    expect(mockBulk).toHaveBeenCalledWith({
+      body: [
+        indexAction(synonymId),
+        { synonymId, eventIds: [eventId], slugs: [eventSlug], members: [] },
+      ],
+    })
+    expect(mockBulk).toHaveBeenCalledTimes(1)
     expect(mockQuery).toHaveBeenCalledTimes(1)
   })
 
   test('insert into existing synonym group with removal of previous now unused group', async () => {
-    putData.id = synonymId
-    putData.body.synonymId = synonymId
-    putData.body.eventIds = [existingEventId, eventId]
-    putData.body.slugs = [existingEventSlug, eventSlug]
-
     const mockItems = [
       { synonymId, eventId: existingEventId, slug: existingEventSlug },
       { synonymId, eventId, slug: eventSlug },
@@ -202,15 +200,11 @@ describe('testing synonymGroup table-stream', () => {
       }
     })
 
-    ;(search as unknown as jest.Mock).mockReturnValue({
-      index: mockIndex,
-      delete: mockDelete,
-    })
-
     const mockClient = {
       synonyms: {
         query: implementedMockQuery,
       },
+      circulars: { query: mockCircularsQuery },
     }
 
     ;(tables as unknown as jest.Mock).mockResolvedValue(mockClient)
@@ -218,12 +212,21 @@ describe('testing synonymGroup table-stream', () => {
     await handler(mockStreamEventWithOldRecord)
 
     expect(mockQuery).toHaveBeenCalledTimes(2)
-    // the new group opensearch record is updated
-    expect(mockIndex).toHaveBeenCalledWith(putData)
-    expect(mockIndex).toHaveBeenCalledTimes(1)
-    // the old group opensearch record is deleted
-    expect(mockDelete).toHaveBeenCalledWith(deleteData)
-    expect(mockDelete).toHaveBeenCalledTimes(1)
+    // the old group opensearch record is deleted and the new group
+    // opensearch record is updated in the same request
+    expect(mockBulk).toHaveBeenCalledWith({
+      body: [
+        deleteAction(previousSynonymId),
+        indexAction(synonymId),
+        {
+          synonymId,
+          eventIds: [existingEventId, eventId],
+          slugs: [existingEventSlug, eventSlug],
+          members: [],
+        },
+      ],
+    })
+    expect(mockBulk).toHaveBeenCalledTimes(1)
   })
 
   test('insert into existing synonym group with removal from old group with remaining members', async () => {
@@ -248,15 +251,11 @@ describe('testing synonymGroup table-stream', () => {
       }
     })
 
-    ;(search as unknown as jest.Mock).mockReturnValue({
-      index: mockIndex,
-      delete: mockDelete,
-    })
-
     const mockClient = {
       synonyms: {
         query: implementedMockQuery,
       },
+      circulars: { query: mockCircularsQuery },
     }
 
     ;(tables as unknown as jest.Mock).mockResolvedValue(mockClient)
@@ -264,18 +263,25 @@ describe('testing synonymGroup table-stream', () => {
     await handler(mockStreamEventWithOldRecord)
 
     expect(mockQuery).toHaveBeenCalledTimes(2)
-    putData.id = synonymId
-    putData.body.synonymId = synonymId
-    putData.body.eventIds = [existingEventId, eventId]
-    putData.body.slugs = [existingEventSlug, eventSlug]
-    expect(mockIndex).toHaveBeenCalledWith(putData)
-    putData.id = previousSynonymId
-    putData.body.synonymId = previousSynonymId
-    putData.body.eventIds = [additionalEventId]
-    putData.body.slugs = [additionalEventSlug]
-    expect(mockIndex).toHaveBeenCalledWith(putData)
-    expect(mockIndex).toHaveBeenCalledTimes(2)
-    expect(mockDelete).not.toHaveBeenCalled()
+    expect(mockBulk).toHaveBeenCalledWith({
+      body: [
+        indexAction(previousSynonymId),
+        {
+          synonymId: previousSynonymId,
+          eventIds: [additionalEventId],
+          slugs: [additionalEventSlug],
+          members: [],
+        },
+        indexAction(synonymId),
+        {
+          synonymId,
+          eventIds: [existingEventId, eventId],
+          slugs: [existingEventSlug, eventSlug],
+          members: [],
+        },
+      ],
+    })
+    expect(mockBulk).toHaveBeenCalledTimes(1)
   })
 
   test('insert into new synonym group with removal from old group with remaining members', async () => {
@@ -297,15 +303,11 @@ describe('testing synonymGroup table-stream', () => {
       }
     })
 
-    ;(search as unknown as jest.Mock).mockReturnValue({
-      index: mockIndex,
-      delete: mockDelete,
-    })
-
     const mockClient = {
       synonyms: {
         query: implementedMockQuery,
       },
+      circulars: { query: mockCircularsQuery },
     }
 
     ;(tables as unknown as jest.Mock).mockResolvedValue(mockClient)
@@ -313,26 +315,23 @@ describe('testing synonymGroup table-stream', () => {
     await handler(mockStreamEventWithOldRecord)
 
     expect(mockQuery).toHaveBeenCalledTimes(2)
-    putData.id = synonymId
-    putData.body.synonymId = synonymId
-    putData.body.eventIds = [eventId]
-    putData.body.slugs = [eventSlug]
-    expect(mockIndex).toHaveBeenCalledWith(putData)
-    putData.id = previousSynonymId
-    putData.body.synonymId = previousSynonymId
-    putData.body.eventIds = [additionalEventId]
-    putData.body.slugs = [additionalEventSlug]
-    expect(mockIndex).toHaveBeenCalledWith(putData)
-    expect(mockIndex).toHaveBeenCalledTimes(2)
-    expect(mockDelete).not.toHaveBeenCalled()
+    expect(mockBulk).toHaveBeenCalledWith({
+      body: [
+        indexAction(previousSynonymId),
+        {
+          synonymId: previousSynonymId,
+          eventIds: [additionalEventId],
+          slugs: [additionalEventSlug],
+          members: [],
+        },
+        indexAction(synonymId),
+        { synonymId, eventIds: [eventId], slugs: [eventSlug], members: [] },
+      ],
+    })
+    expect(mockBulk).toHaveBeenCalledTimes(1)
   })
 
   test('insert into new synonym group with removal of previous now unused group', async () => {
-    putData.id = synonymId
-    putData.body.synonymId = synonymId
-    putData.body.eventIds = [eventId]
-    putData.body.slugs = [eventSlug]
-
     const mockItems = [{ synonymId, eventId, slug: eventSlug }]
 
     const implementedMockQuery = mockQuery.mockImplementation((query) => {
@@ -343,15 +342,11 @@ describe('testing synonymGroup table-stream', () => {
       }
     })
 
-    ;(search as unknown as jest.Mock).mockReturnValue({
-      index: mockIndex,
-      delete: mockDelete,
-    })
-
     const mockClient = {
       synonyms: {
         query: implementedMockQuery,
       },
+      circulars: { query: mockCircularsQuery },
     }
 
     ;(tables as unknown as jest.Mock).mockResolvedValue(mockClient)
@@ -359,11 +354,160 @@ describe('testing synonymGroup table-stream', () => {
     await handler(mockStreamEventWithOldRecord)
 
     expect(mockQuery).toHaveBeenCalledTimes(2)
-    // the new group opensearch record is updated
-    expect(mockIndex).toHaveBeenCalledWith(putData)
-    expect(mockIndex).toHaveBeenCalledTimes(1)
-    // the old group opensearch record is deleted
-    expect(mockDelete).toHaveBeenCalledWith(deleteData)
-    expect(mockDelete).toHaveBeenCalledTimes(1)
+    expect(mockBulk).toHaveBeenCalledWith({
+      body: [
+        deleteAction(previousSynonymId),
+        indexAction(synonymId),
+        { synonymId, eventIds: [eventId], slugs: [eventSlug], members: [] },
+      ],
+    })
+    expect(mockBulk).toHaveBeenCalledTimes(1)
+  })
+
+  test('repeated records for the same synonym group are written once', async () => {
+    mockQuery.mockResolvedValue({
+      Items: [{ synonymId, eventId, slug: eventSlug }],
+    })
+
+    ;(tables as unknown as jest.Mock).mockResolvedValue({
+      synonyms: { query: mockQuery },
+      circulars: { query: mockCircularsQuery },
+    })
+
+    await handler({
+      Records: [...mockStreamEvent.Records, ...mockStreamEvent.Records],
+    })
+
+    expect(mockQuery).toHaveBeenCalledTimes(1)
+    expect(mockBulk).toHaveBeenCalledWith({
+      body: [
+        indexAction(synonymId),
+        { synonymId, eventIds: [eventId], slugs: [eventSlug], members: [] },
+      ],
+    })
+  })
+
+  test('failed bulk items fail the originating records', async () => {
+    mockQuery.mockResolvedValue({
+      Items: [{ synonymId, eventId, slug: eventSlug }],
+    })
+
+    ;(tables as unknown as jest.Mock).mockResolvedValue({
+      synonyms: { query: mockQuery },
+      circulars: { query: mockCircularsQuery },
+    })
+    mockBulk.mockResolvedValue({
+      body: {
+        errors: true,
+        items: [
+          {
+            index: {
+              _id: synonymId,
+              status: 429,
+              error: { type: 'es_rejected_execution_exception', reason: '' },
+            },
+          },
+        ],
+      },
+    })
+
+    await expect(handler(mockStreamEvent)).resolves.toEqual({
+      batchItemFailures: [{ itemIdentifier: '111' }],
+    })
+  })
+
+  test('a failed _bulk request fails every record', async () => {
+    mockQuery.mockResolvedValue({
+      Items: [{ synonymId, eventId, slug: eventSlug }],
+    })
+    const mockDeadLetterUpdate = jest.fn()
+    mockDeadLetterUpdate.mockResolvedValue({ Attributes: { attempts: 1 } })
+
+    ;(tables as unknown as jest.Mock).mockResolvedValue({
+      synonyms: { query: mockQuery },
+      circulars: { query: mockCircularsQuery },
+      dead_letters: { update: mockDeadLetterUpdate },
+    })
+    mockBulk.mockRejectedValue(new Error('Service Unavailable'))
+
+    await expect(handler(mockStreamEvent)).resolves.toEqual({
+      batchItemFailures: [{ itemIdentifier: '111' }],
+    })
+    expect(mockDeadLetterUpdate).toHaveBeenCalledWith(
+      expect.objectContaining({
+        Key: { source: 'synonyms', recordId: '111' },
+      })
+    )
+  })
+
+  test('groups that a newer snapshot has already written are skipped', async () => {
+    mockQuery.mockResolvedValue({
+      Items: [{ synonymId, eventId, slug: eventSlug }],
+    })
+
+    ;(tables as unknown as jest.Mock).mockResolvedValue({
+      synonyms: { query: mockQuery },
+      circulars: { query: mockCircularsQuery },
+    })
+    mockBulk.mockResolvedValue({
+      body: {
+        errors: true,
+        items: [
+          {
+            index: {
+              _id: synonymId,
+              status: 409,
+              error: { type: 'version_conflict_engine_exception', reason: '' },
+            },
+          },
+        ],
+      },
+    })
+
+    await expect(handler(mockStreamEvent)).resolves.toEqual({
+      batchItemFailures: [],
+    })
+  })
+
+  test('group documents include summaries of member circulars', async () => {
+    mockQuery.mockResolvedValue({
+      Items: [
+        { synonymId, eventId: existingEventId, slug: existingEventSlug },
+        { synonymId, eventId, slug: eventSlug },
+      ],
+    })
+    mockCircularsQuery.mockImplementation(async (query) => ({
+      Items:
+        query.ExpressionAttributeValues[':eventId'] === eventId
+          ? [{ circularId: 2, subject: 'b', createdOn: 2, submitter: 'x' }]
+          : [{ circularId: 1, subject: 'a', createdOn: 1, submitter: 'y' }],
+    }))
+
+    ;(tables as unknown as jest.Mock).mockResolvedValue({
+      synonyms: { query: mockQuery },
+      circulars: { query: mockCircularsQuery },
+    })
+
+    await handler(mockStreamEvent)
+
+    expect(mockCircularsQuery).toHaveBeenCalledWith(
+      expect.objectContaining({
+        ProjectionExpression: 'circularId, subject, createdOn, submitter',
+      })
+    )
+    expect(mockBulk).toHaveBeenCalledWith({
+      body: [
+        indexAction(synonymId),
+        {
+          synonymId,
+          eventIds: [existingEventId, eventId],
+          slugs: [existingEventSlug, eventSlug],
+          members: [
+            { circularId: 1, subject: 'a', createdOn: 1, submitter: 'y' },
+            { circularId: 2, subject: 'b', createdOn: 2, submitter: 'x' },
+          ],
+        },
+      ],
+    })
   })
 })
@@ -0,0 +1,249 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+import { get } from '~/routes/circulars/circulars.server'
+import {
+  MemoryTooltipCacheBackend,
+  getTooltipCacheCounters,
+  logTooltipCacheCounters,
+  setTooltipCacheBackend,
+  withTooltipCache,
+} from '~/routes/tooltips/cache.server'
+import { getTooltips } from '~/routes/tooltips/tooltips.server'
+
+jest.mock('@architect/functions', () => ({
+  tables: jest.fn(),
+}))
+
+jest.mock('~/lib/env.server', () => ({
+  feature: () => false,
+  getEnvOrDieInProduction: () => undefined,
+}))
+
+jest.mock('~/routes/circulars/circulars.server', () => ({
+  get: jest.fn(),
+}))
+
+const options = { ttl: 3600, notFoundTtl: 60 }
+
+let source: string
+let sourceNumber = 0
+
+beforeEach(() => {
+  setTooltipCacheBackend(new MemoryTooltipCacheBackend())
+  // Use a new source for each test, so that the counters start at zero.
+  source = `test${sourceNumber++}`
+})
+
+describe('withTooltipCache', () => {
+  test('computes a value once and then serves it from the cache', async () => {
+    const compute = jest.fn(async () => ({ title: 'Example' }))
+
+    await expect(
+      withTooltipCache(source, 'a', compute, options)
+    ).resolves.toEqual({ title: 'Example' })
+    await expect(
+      withTooltipCache(source, 'a', compute, options)
+    ).resolves.toEqual({ title: 'Example' })
+
+    expect(compute).toHaveBeenCalledTimes(1)
+    expect(getTooltipCacheCounters()[source]).toEqual({
+      hits: 1,
+      negativeHits: 0,
+      coalesced: 0,
+      misses: 1,
+    })
+  })
+
+  test('caches not found responses', async () => {
+    const compute = jest.fn(async () => {
+      throw new Response(null, { status: 404 })
+    })
+
+    for (let i = 0; i < 2; i++)
+      await expect(
+        withTooltipCache(source, 'a', compute, options)
+      ).rejects.toHaveProperty('status', 404)
+
+    expect(compute).toHaveBeenCalledTimes(1)
+    expect(getTooltipCacheCounters()[source]).toMatchObject({
+      negativeHits: 1,
+      misses: 1,
+    })
+  })
+
+  test('does not cache other errors', async () => {
+    const compute = jest
+      .fn()
+      .mockRejectedValueOnce(new Error('Service unavailable'))
+      .mockResolvedValueOnce({ title: 'Example' })
+
+    await expect(
+      withTooltipCache(source, 'a', compute, options)
+    ).rejects.toThrow('Service unavailable')
+    await expect(
+      withTooltipCache(source, 'a', compute, options)
+    ).resolves.toEqual({ title: 'Example' })
+
+    expect(compute).toHaveBeenCalledTimes(2)
+  })
+
+  test('coalesces concurrent lookups of the same key', async () => {
+    const compute = jest.fn(async () => ({ title: 'Example' }))
+
+    const results = await Promise.all(
+      Array.from({ length: 5 }, () =>
+        withTooltipCache(source, 'a', compute, options)
+      )
+    )
+
+    expect(results).toEqual(Array(5).fill({ title: 'Example' }))
+    expect(compute).toHaveBeenCalledTimes(1)
+    expect(getTooltipCacheCounters()[source]).toMatchObject({
+      coalesced: 4,
+      misses: 1,
+    })
+  })
+
+  test('expires entries', async () => {
+    const compute = jest.fn(async () => ({ title: 'Example' }))
+    const now = Date.now()
+    const dateNow = jest.spyOn(Date, 'now').mockReturnValue(now)
+
+    await withTooltipCache(source, 'a', compute, options)
+    dateNow.mockReturnValue(now + options.ttl * 1000)
+    await withTooltipCache(source, 'a', compute, options)
+
+    expect(compute).toHaveBeenCalledTimes(2)
+    dateNow.mockRestore()
+  })
+})
+
+describe('logTooltipCacheCounters', () => {
+  test('logs the counters as metrics and resets them', async () => {
+    const log = jest.spyOn(console, 'log').mockImplementation(() => {})
+    const compute = async () => ({ title: 'Example' })
+    await withTooltipCache(source, 'a', compute, options)
+    await withTooltipCache(source, 'a', compute, options)
+
+    logTooltipCacheCounters()
+
+    const lines = log.mock.calls.map(([line]) => JSON.parse(line))
+    expect(lines).toContainEqual(
+      expect.objectContaining({
+        source,
+        hits: 1,
+        negativeHits: 0,
+        coalesced: 0,
+        misses: 1,
+        _aws: expect.objectContaining({
+          CloudWatchMetrics: [
+            expect.objectContaining({ Dimensions: [['source']] }),
+          ],
+        }),
+      })
+    )
+    expect(getTooltipCacheCounters()).toEqual({})
+    log.mockRestore()
+  })
+
+  test('logs the counters periodically during lookups', async () => {
+    const log = jest.spyOn(console, 'log').mockImplementation(() => {})
+    const now = Date.now()
+    const dateNow = jest.spyOn(Date, 'now').mockReturnValue(now)
+    const compute = async () => ({ title: 'Example' })
+    logTooltipCacheCounters()
+    log.mockClear()
+
+    await withTooltipCache(source, 'a', compute, options)
+    expect(log).not.toHaveBeenCalled()
+
+    dateNow.mockReturnValue(now + 60_000)
+    await withTooltipCache(source, 'a', compute, options)
+    expect(log).toHaveBeenCalledTimes(1)
+    expect(JSON.parse(log.mock.calls[0][0])).toMatchObject({
+      source,
+      hits: 1,
+      misses: 1,
+    })
+
+    dateNow.mockRestore()
+    log.mockRestore()
+  })
+})
+
+describe('MemoryTooltipCacheBackend', () => {
+  test('evicts the least recently used entry', async () => {
+    const backend = new MemoryTooltipCacheBackend(2)
+    const entry = { value: {}, expiresOn: Date.now() + 60_000 }
+
+    await backend.put('a', entry)
+    await backend.put('b', entry)
+    await backend.get('a')
+    await backend.put('c', entry)
+
+    expect(await backend.get('a')).toBe(entry)
+    expect(await backend.get('b')).toBeUndefined()
+    expect(await backend.get('c')).toBe(entry)
+  })
+})
+
+describe('getTooltips', () => {
+  test('resolves found and missing tooltips in one batch', async () => {
+    ;(get as jest.Mock)
+      .mockResolvedValueOnce({ subject: 'GRB 1', submitter: 'A' })
+      .mockRejectedValueOnce(new Response(null, { status: 404 }))
+
+    await expect(
+      getTooltips([
+        ['circular', '1'],
+        ['circular', '2'],
+      ])
+    ).resolves.toEqual({
+      tooltips: {
+        circular: { 1: { subject: 'GRB 1', submitter: 'A' }, 2: null },
+      },
+      failed: false,
+    })
+  })
+
+  test('reports failures other than not found', async () => {
+    ;(get as jest.Mock).mockRejectedValueOnce(new Error('Throttled'))
+
+    const { tooltips, failed } = await getTooltips([['circular', '1']])
+    expect(failed).toBe(true)
+    expect(Object.keys(tooltips.circular)).toEqual([])
+  })
+
+  test('rejects unknown classes', async () => {
+    await expect(getTooltips([['foo', '1']])).rejects.toHaveProperty(
+      'status',
+      400
+    )
+  })
+
+  test.each(['constructor', '__proto__', 'hasOwnProperty'])(
+    'rejects the inherited property %s as a class',
+    async (className) => {
+      await expect(getTooltips([[className, 'keys']])).rejects.toHaveProperty(
+        'status',
+        400
+      )
+      expect(typeof Object.keys).toBe('function')
+    }
+  )
+
+  test('does not write values through the prototype', async () => {
+    ;(get as jest.Mock).mockResolvedValueOnce({ subject: 'GRB 1' })
+
+    const { tooltips } = await getTooltips([['circular', '__proto__']])
+
+    expect(Object.getPrototypeOf(tooltips.circular)).toBeNull()
+    expect(Object.keys(tooltips.circular)).toEqual(['__proto__'])
+    expect(({} as Record<string, unknown>).subject).toBeUndefined()
+  })
+})
@@ -0,0 +1,179 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+import { tables } from '@architect/functions'
+
+import { getRecipients } from '~/lib/recipients.server'
+import { unsubscribeActions } from '~/routes/unsubscribe.$jwt/actions.server'
+import { handler as reconcileRecipients } from '~/scheduled/recipients'
+
+type Item = Record<string, any>
+
+jest.mock('@architect/functions', () => ({
+  tables: jest.fn(),
+}))
+
+jest.mock('@aws-sdk/lib-dynamodb', () => ({
+  paginateQuery: jest.fn(),
+  paginateScan: jest.fn(),
+}))
+
+/** The key attributes of each table. */
+const keys: Record<string, string[]> = {
+  circulars_subscriptions: ['email', 'sub'],
+  announcement_subscriptions: ['email', 'sub'],
+  legacy_users: ['email'],
+  email_recipients: ['topic', 'email'],
+}
+
+let store: Record<string, Item[]>
+
+function matches(item: Item, key: Item) {
+  return Object.entries(key).every(([name, value]) => item[name] === value)
+}
+
+function put(tableName: string, item: Item) {
+  const key = Object.fromEntries(keys[tableName].map((k) => [k, item[k]]))
+  store[tableName] = [
+    ...store[tableName].filter((other) => !matches(other, key)),
+    item,
+  ]
+}
+
+function remove(tableName: string, key: Item) {
+  store[tableName] = store[tableName].filter((item) => !matches(item, key))
+}
+
+/** A table with the parts of the Architect API that the code uses. */
+function getTable(tableName: string) {
+  return {
+    async get(key: Item) {
+      return store[tableName].find((item) => matches(item, key))
+    },
+    async put(item: Item) {
+      put(tableName, item)
+    },
+    async delete(key: Item) {
+      remove(tableName, key)
+    },
+    async update({
+      Key,
+      ExpressionAttributeNames,
+      ExpressionAttributeValues,
+    }: Item) {
+      const item = store[tableName].find((item) => matches(item, Key))
+      item![ExpressionAttributeNames['#attribute']] =
+        ExpressionAttributeValues[':value']
+    },
+  }
+}
+
+beforeEach(() => {
+  store = Object.fromEntries(Object.keys(keys).map((name) => [name, []]))
+  ;(tables as unknown as jest.Mock).mockResolvedValue({
+    ...Object.fromEntries(
+      Object.keys(keys).map((name) => [name, getTable(name)])
+    ),
+    name: (name: string) => name,
+    _doc: {
+      async batchWrite({ RequestItems }: Item) {
+        for (const [tableName, requests] of Object.entries(RequestItems))
+          for (const { PutRequest, DeleteRequest } of requests as Item[]) {
+            if (PutRequest) put(tableName, PutRequest.Item)
+            if (DeleteRequest) remove(tableName, DeleteRequest.Key)
+          }
+        return {}
+      },
+    },
+  })
+
+  const { paginateQuery, paginateScan } = jest.requireMock(
+    '@aws-sdk/lib-dynamodb'
+  )
+  paginateScan.mockImplementation(async function* (
+    _: unknown,
+    { TableName }: Item
+  ) {
+    yield { Items: [...store[TableName]] }
+  })
+  // Every query in the code under test has the form '#name = :value'.
+  paginateQuery.mockImplementation(async function* (
+    _: unknown,
+    {
+      TableName,
+      KeyConditionExpression,
+      ExpressionAttributeNames,
+      ExpressionAttributeValues,
+    }: Item
+  ) {
+    const [name, value] = KeyConditionExpression.split(' = ')
+    yield {
+      Items: store[TableName].filter(
+        (item) =>
+          item[ExpressionAttributeNames[name]] ===
+          ExpressionAttributeValues[value]
+      ),
+    }
+  })
+})
+
+afterEach(() => {
+  jest.clearAllMocks()
+})
+
+describe('unsubscribe', () => {
+  beforeEach(() => {
+    jest.spyOn(console, 'log').mockImplementation(() => {})
+  })
+
+  test('sends mail to the address as it was spelled', async () => {
+    put('circulars_subscriptions', { email: 'Alice@Example.org', sub: '1' })
+
+    await reconcileRecipients()
+
+    await expect(getRecipients('circulars')).resolves.toEqual([
+      'Alice@Example.org',
+    ])
+  })
+
+  test('removes every spelling of a mixed-case address', async () => {
+    put('circulars_subscriptions', { email: 'Alice@Example.org', sub: '1' })
+    put('circulars_subscriptions', { email: 'alice@example.org', sub: '2' })
+    put('legacy_users', { email: 'ALICE@example.org', receive: 1 })
+    put('circulars_subscriptions', { email: 'bob@example.org', sub: '3' })
+
+    await reconcileRecipients()
+    await expect(getRecipients('circulars')).resolves.toHaveLength(2)
+
+    await unsubscribeActions.circulars('Alice@Example.org')
+    await reconcileRecipients()
+
+    await expect(getRecipients('circulars')).resolves.toEqual([
+      'bob@example.org',
+    ])
+    expect(store.circulars_subscriptions).toEqual([
+      { email: 'bob@example.org', sub: '3' },
+    ])
+    expect(store.legacy_users).toEqual([
+      { email: 'ALICE@example.org', receive: 0 },
+    ])
+  })
+
+  test('does not touch other topics', async () => {
+    put('circulars_subscriptions', { email: 'Alice@Example.org', sub: '1' })
+    put('announcement_subscriptions', { email: 'Alice@Example.org', sub: '1' })
+
+    await reconcileRecipients()
+    await unsubscribeActions.announcements('alice@example.org')
+    await reconcileRecipients()
+
+    await expect(getRecipients('circulars')).resolves.toEqual([
+      'Alice@Example.org',
+    ])
+    await expect(getRecipients('announcements')).resolves.toEqual([])
+  })
+})
@@ -9,7 +9,8 @@ import { type LoaderFunction } from '@remix-run/node'
 import { type useLoaderData } from '@remix-run/react'
 
 import { AstroDataLinkWithTooltip } from './AstroDataContext'
-import { throwForStatus, useSearchString } from '~/lib/utils'
+import { loadTooltip } from './tooltips'
+import { useSearchString } from '~/lib/utils'
 import { type loader as arxivTooltipLoader } from '~/routes/api.tooltip.arxiv.$'
 import { type loader as circularTooltipLoader } from '~/routes/api.tooltip.circular.$'
 import { type loader as doiTooltipLoader } from '~/routes/api.tooltip.doi.$'
@@ -17,13 +18,14 @@ import type { loader as tnsTooltipLoader } from '~/routes/api.tooltip.tns.$'
 
 import styles from './AstroData.components.module.css'
 
-async function fetchTooltipData<loader extends LoaderFunction>(
+function fetchTooltipData<loader extends LoaderFunction>(
   className: string,
   value: JSX.IntrinsicElements['data']['value']
-): Promise<ReturnType<typeof useLoaderData<loader>>> {
-  const response = await fetch(`/api/tooltip/${className}/${value}`)
-  throwForStatus(response)
-  return await response.json()
+) {
+  return loadTooltip<ReturnType<typeof useLoaderData<loader>>>(
+    className,
+    value
+  )
 }
 
 export function GcnCircular({
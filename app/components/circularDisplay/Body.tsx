@@ -5,26 +5,20 @@
  *
  * SPDX-License-Identifier: Apache-2.0
  */
-import { rehypeAstro } from '@nasa-gcn/remark-rehype-astro'
 import classNames from 'classnames'
-import type { Root } from 'mdast'
+import type { Root } from 'hast'
 import { Fragment, createElement } from 'react'
-import rehypeClassNames from 'rehype-class-names'
 import rehypeReact from 'rehype-react'
-import remarkGfm from 'remark-gfm'
-import remarkParse from 'remark-parse'
-import remarkRehype from 'remark-rehype'
 import { type Plugin, unified } from 'unified'
-import { u } from 'unist-builder'
 
 import { AstroData } from './AstroData'
 import { AstroDataLink } from './AstroDataContext'
-import rehypeAutolinkLiteral from './rehypeAutolinkLiteral'
+import { markdownToHast, plainTextToHast } from './hast'
 
 import styles from './PlainTextBody.module.css'
 
 /** A Unified.js parser plugin that just returns a canned tree. */
-const remarkFromMdast: Plugin<[Root], string, Root> = function (tree) {
+const rehypeFromHast: Plugin<[Root], string, Root> = function (tree) {
   this.Parser = () => tree
 }
 
@@ -43,57 +37,68 @@ function LinkWrapper({
   }
 }
 
-export function MarkdownBody({
-  children,
-  ...props
-}: {
-  children: string
-} & Omit<JSX.IntrinsicElements['div'], 'children'>) {
-  const { result } = unified()
-    .use(remarkParse)
-    .use(remarkGfm)
-    .use(remarkRehype)
-    .use(rehypeAstro)
-    .use(rehypeClassNames, {
-      ol: 'usa-list',
-      p: 'usa-paragraph',
-      table: 'usa-table',
-      ul: 'usa-list',
-    })
+function renderHast(tree: Root) {
+  return unified()
+    .use(rehypeFromHast, tree)
     .use(rehypeReact, {
       Fragment,
       createElement,
       components: { a: LinkWrapper, data: AstroData },
     })
-    .processSync(children)
+    .processSync().result
+}
 
-  return <div {...props}>{result}</div>
+/**
+ * Render a Markdown circular body that was already transformed to a HTML
+ * syntax tree by {@link markdownToHast}.
+ */
+export function MarkdownHastBody({
+  children,
+  ...props
+}: {
+  children: Root
+} & Omit<JSX.IntrinsicElements['div'], 'children'>) {
+  return <div {...props}>{renderHast(children)}</div>
 }
 
-export function PlainTextBody({
+/**
+ * Render a plain text circular body that was already transformed to a HTML
+ * syntax tree by {@link plainTextToHast}.
+ */
+export function PlainTextHastBody({
   className,
   children,
   ...props
 }: {
-  children: string
+  children: Root
 } & Omit<JSX.IntrinsicElements['div'], 'children'>) {
-  const tree = u('root', [u('code', children)])
-
-  const { result } = unified()
-    .use(remarkFromMdast, tree)
-    .use(remarkRehype)
-    .use(rehypeAstro)
-    .use(rehypeAutolinkLiteral)
-    .use(rehypeReact, {
-      Fragment,
-      createElement,
-      components: { a: LinkWrapper, data: AstroData },
-    })
-    .processSync()
-
   return (
     <div {...props} className={classNames(styles.PlainTextBody, className)}>
-      {result}
+      {renderHast(children)}
     </div>
   )
 }
+
+export function MarkdownBody({
+  children,
+  ...props
+}: {
+  children: string
+} & Omit<JSX.IntrinsicElements['div'], 'children'>) {
+  return (
+    <MarkdownHastBody {...props}>{markdownToHast(children)}</MarkdownHastBody>
+  )
+}
+
+export function PlainTextBody({
+  children,
+  ...props
+}: {
+  children: string
+} & Omit<JSX.IntrinsicElements['div'], 'children'>) {
+  return (
+    <PlainTextHastBody {...props}>
+      {plainTextToHast(children)}
+    </PlainTextHastBody>
+  )
+}
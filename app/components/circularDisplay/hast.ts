@@ -0,0 +1,67 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+import { rehypeAstro } from '@nasa-gcn/remark-rehype-astro'
+import type { Root } from 'hast'
+import rehypeClassNames from 'rehype-class-names'
+import remarkGfm from 'remark-gfm'
+import remarkParse from 'remark-parse'
+import remarkRehype from 'remark-rehype'
+import { unified } from 'unified'
+import { u } from 'unist-builder'
+
+import rehypeAutolinkLiteral from './rehypeAutolinkLiteral'
+import type { CircularFormat } from '~/routes/circulars/circulars.lib'
+
+const markdownProcessor = unified()
+  .use(remarkParse)
+  .use(remarkGfm)
+  .use(remarkRehype)
+  .use(rehypeAstro)
+  .use(rehypeClassNames, {
+    ol: 'usa-list',
+    p: 'usa-paragraph',
+    table: 'usa-table',
+    ul: 'usa-list',
+  })
+  .freeze()
+
+const plainTextProcessor = unified()
+  .use(remarkRehype)
+  .use(rehypeAstro)
+  .use(rehypeAutolinkLiteral)
+  .freeze()
+
+/**
+ * Remove source positions, which are not needed for rendering, to make the
+ * tree smaller to store and to send to the client.
+ */
+function removePositions(node: { position?: unknown; children?: unknown[] }) {
+  delete node.position
+  node.children?.forEach((child) => removePositions(child as typeof node))
+}
+
+/** Parse and transform a Markdown circular body to a HTML syntax tree. */
+export function markdownToHast(body: string) {
+  const tree = markdownProcessor.runSync(markdownProcessor.parse(body)) as Root
+  removePositions(tree)
+  return tree
+}
+
+/** Transform a plain text circular body to a HTML syntax tree. */
+export function plainTextToHast(body: string) {
+  const tree = plainTextProcessor.runSync(u('root', [u('code', body)])) as Root
+  removePositions(tree)
+  return tree
+}
+
+/** Transform a circular body in the given format to a HTML syntax tree. */
+export function bodyToHast(body: string, format?: CircularFormat) {
+  return format === 'text/markdown'
+    ? markdownToHast(body)
+    : plainTextToHast(body)
+}
@@ -0,0 +1,103 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+import { throwForStatus } from '~/lib/utils'
+
+/** Must not exceed maxTooltipBatchSize in tooltips.server.ts. */
+const maxBatchSize = 100
+
+/** How long to collect tooltip requests before sending them, in ms. */
+const batchDelay = 10
+
+interface PendingTooltip {
+  className: string
+  value: string
+  resolve: (data: object) => void
+  reject: (reason: unknown) => void
+}
+
+let pending: PendingTooltip[] = []
+let timeout: ReturnType<typeof setTimeout> | undefined
+
+/** Tooltips that have been requested, keyed by class name and value. */
+const requested = new Map<string, Promise<object>>()
+
+function getKey(className: string, value: string) {
+  return JSON.stringify([className, value])
+}
+
+async function fetchBatch(batch: PendingTooltip[]) {
+  // Sort the parameters so that the same set of tooltips has the same URL.
+  const searchParams = new URLSearchParams(
+    batch.map(({ className, value }) => [className, value])
+  )
+  searchParams.sort()
+
+  // The data is null if the object was not found, and missing if the lookup
+  // failed on the server.
+  let tooltips: Record<string, Record<string, object | null> | undefined>
+  try {
+    const response = await fetch(`/api/tooltips?${searchParams}`)
+    throwForStatus(response)
+    tooltips = await response.json()
+  } catch (e) {
+    for (const { className, value, reject } of batch) {
+      // Let the tooltip be requested again later.
+      requested.delete(getKey(className, value))
+      reject(e)
+    }
+    return
+  }
+
+  for (const { className, value, resolve, reject } of batch) {
+    const byValue = tooltips[className]
+    const data =
+      byValue && Object.hasOwn(byValue, value) ? byValue[value] : undefined
+    if (data) {
+      resolve(data)
+    } else if (data === null) {
+      reject(new Error('Not found'))
+    } else {
+      // Let the tooltip be requested again later.
+      requested.delete(getKey(className, value))
+      reject(new Error('Failed to load'))
+    }
+  }
+}
+
+function flush() {
+  timeout = undefined
+  const batch = pending
+  pending = []
+  for (let i = 0; i < batch.length; i += maxBatchSize)
+    fetchBatch(batch.slice(i, i + maxBatchSize))
+}
+
+/**
+ * Load the data for a tooltip.
+ *
+ * Requests that are made at about the same time, such as by all of the
+ * tooltips in a circular when it is rendered, are collected and sent to the
+ * server in a single request. Each tooltip is requested at most once per page
+ * load.
+ */
+export function loadTooltip<T>(
+  className: string,
+  value: JSX.IntrinsicElements['data']['value']
+): Promise<T> {
+  const stringValue = String(value)
+  const key = getKey(className, stringValue)
+  let promise = requested.get(key)
+  if (!promise) {
+    promise = new Promise((resolve, reject) =>
+      pending.push({ className, value: stringValue, resolve, reject })
+    )
+    requested.set(key, promise)
+    timeout ??= setTimeout(flush, batchDelay)
+  }
+  return promise as Promise<T>
+}
@@ -18,6 +18,8 @@ function getPageLink({
   startDate,
   endDate,
   view,
+  sort,
+  cursor,
 }: {
   page: number
   limit?: number
@@ -25,6 +27,8 @@ function getPageLink({
   startDate?: string
   endDate?: string
   view?: string
+  sort?: string
+  cursor?: string
 }) {
   const searchParams = new URLSearchParams()
   if (page > 1) searchParams.set('page', page.toString())
@@ -32,26 +36,108 @@ function getPageLink({
   if (query) searchParams.set('query', query)
   if (startDate) searchParams.set('startDate', startDate)
   if (endDate) searchParams.set('endDate', endDate)
+  if (sort) searchParams.set('sort', sort)
+  if (cursor) searchParams.set('cursor', cursor)
   searchParams.set('view', view || 'index')
 
   const searchString = searchParams.toString()
   return searchString && `?${searchString}`
 }
 
+type QueryStringProps = {
+  limit?: number
+  query?: string
+  startDate?: string
+  endDate?: string
+  sort?: string
+}
+
+function NextCursorLink({
+  page,
+  nextCursor,
+  view,
+  ...queryStringProps
+}: {
+  page: number
+  nextCursor: string
+  view?: string
+} & QueryStringProps) {
+  return (
+    <li className="usa-pagination__item usa-pagination__arrow">
+      <Link
+        to={getPageLink({
+          page: page + 1,
+          cursor: nextCursor,
+          view,
+          ...queryStringProps,
+        })}
+        className="usa-pagination__link usa-pagination__next-page"
+        aria-label="Next page"
+      >
+        <Icon.NavigateNext role="presentation" />
+        <span className="usa-pagination__link-text">Next</span>
+      </Link>
+    </li>
+  )
+}
+
+/**
+ * Pagination for results past the depth that can be reached by page number.
+ *
+ * Results are fetched with an opaque cursor, so the only navigation that is
+ * possible is back to the first page or forward to the next page.
+ */
+export function CursorPagination({
+  page,
+  nextCursor,
+  view,
+  ...queryStringProps
+}: {
+  page: number
+  nextCursor?: string
+  view?: string
+} & QueryStringProps) {
+  return (
+    <nav aria-label="Pagination" className="usa-pagination">
+      <ul className="usa-pagination__list">
+        <li className="usa-pagination__item usa-pagination__arrow">
+          <Link
+            to={getPageLink({ page: 1, view, ...queryStringProps })}
+            className="usa-pagination__link usa-pagination__previous-page"
+            aria-label="First page"
+          >
+            <Icon.FirstPage role="presentation" />
+            <span className="usa-pagination__link-text">First</span>
+          </Link>
+        </li>
+        <li className="usa-pagination__item usa-pagination__page-no">
+          <span className="usa-pagination__button usa-current">{page}</span>
+        </li>
+        {nextCursor && (
+          <NextCursorLink
+            page={page}
+            nextCursor={nextCursor}
+            view={view}
+            {...queryStringProps}
+          />
+        )}
+      </ul>
+    </nav>
+  )
+}
+
 export default function Pagination({
   page,
   totalPages,
   view,
+  nextCursor,
   ...queryStringProps
 }: {
   page: number
   totalPages: number
-  limit?: number
-  query?: string
-  startDate?: string
-  endDate?: string
   view?: string
-}) {
+  nextCursor?: string
+} & QueryStringProps) {
   const pages = usePagination({ currentPage: page, totalPages })
 
   return (
@@ -148,6 +234,14 @@ export default function Pagination({
               )
           }
         })}
+        {nextCursor && page >= totalPages && (
+          <NextCursorLink
+            page={page}
+            nextCursor={nextCursor}
+            view={view}
+            {...queryStringProps}
+          />
+        )}
       </ul>
     </nav>
   )
@@ -8,22 +8,32 @@
 import { useSubmit } from '@remix-run/react'
 import { Select } from '@trussworks/react-uswds'
 
-import Pagination from './Pagination'
+import Pagination, { CursorPagination } from './Pagination'
 
 export default function PaginationSelectionFooter({
   page,
   totalPages,
   limit,
   query,
+  startDate,
+  endDate,
   form,
   view,
+  sort,
+  cursor,
+  nextCursor,
 }: {
   page: number
   totalPages: number
   limit?: number
   query?: string
+  startDate?: string
+  endDate?: string
   form: string
   view?: string
+  sort?: string
+  cursor?: string
+  nextCursor?: string
 }) {
   const submit = useSubmit()
 
@@ -51,14 +61,31 @@ export default function PaginationSelectionFooter({
         </div>
       </div>
       <div className="display-flex flex-fill">
-        {totalPages > 1 && (
-          <Pagination
+        {cursor ? (
+          <CursorPagination
             query={query}
+            startDate={startDate}
+            endDate={endDate}
             page={page}
             limit={limit}
-            totalPages={totalPages}
             view={view}
+            sort={sort}
+            nextCursor={nextCursor}
           />
+        ) : (
+          (totalPages > 1 || nextCursor) && (
+            <Pagination
+              query={query}
+              startDate={startDate}
+              endDate={endDate}
+              page={page}
+              limit={limit}
+              totalPages={totalPages}
+              view={view}
+              sort={sort}
+              nextCursor={nextCursor}
+            />
+          )
         )}
       </div>
     </div>
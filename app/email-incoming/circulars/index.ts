@@ -19,11 +19,7 @@ import {
   getReplyToAddresses,
   parseEmailContentFromSource,
 } from './parse'
-import {
-  extractAttribute,
-  extractAttributeRequired,
-  listUsersInGroup,
-} from '~/lib/cognito.server'
+import { getGroupMemberByEmail } from '~/lib/cognito.server'
 import { sendEmail } from '~/lib/email.server'
 import { hostname, origin } from '~/lib/env.server'
 import { putRaw, submitterGroup } from '~/routes/circulars/circulars.server'
@@ -50,6 +46,7 @@ interface EmailProps {
 const fromName = 'GCN Circulars'
 
 export const handler = createEmailIncomingMessageHandler(
+  'circulars',
   async ({ content }) => {
     const parsed = await parseEmailContentFromSource(content)
     const userEmail = getFromAddress(parsed.from)
@@ -122,17 +119,13 @@ export const handler = createEmailIncomingMessageHandler(
 async function getCognitoUserData(
   userEmail: string
 ): Promise<UserData | undefined> {
-  const users = await listUsersInGroup(submitterGroup)
-  const Attributes = users.find(
-    ({ Attributes }) =>
-      extractAttributeRequired(Attributes, 'email') == userEmail
-  )?.Attributes
+  const member = await getGroupMemberByEmail(submitterGroup, userEmail)
   return (
-    Attributes && {
-      sub: extractAttributeRequired(Attributes, 'sub'),
-      email: extractAttributeRequired(Attributes, 'email'),
-      name: extractAttribute(Attributes, 'name'),
-      affiliation: extractAttribute(Attributes, 'custom:affiliation'),
+    member && {
+      sub: member.sub,
+      email: member.email,
+      name: member.name,
+      affiliation: member.affiliation,
       submit: true,
     }
   )
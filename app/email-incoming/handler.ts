@@ -16,31 +16,44 @@ interface SESMessageWithContent extends SESMessage {
   content: Buffer
 }
 
+// Lambda invokes SNS subscribers asynchronously, with up to 2 retries.
+const maxAttempts = 3
+
 // Check Amazon SES's email authentication verdicts.
 // If they pass, then call the handler.
 export function createEmailIncomingMessageHandler(
+  recipient: string,
   messageHandler: (message: SESMessageWithContent) => Promise<void>
 ) {
-  return createTriggerHandler(async ({ Sns: { Message } }: SNSEventRecord) => {
-    const message: SESMessage = JSON.parse(Message)
-
-    if (message.receipt.spamVerdict.status !== 'PASS')
-      throw new Error('Message failed spam check')
-    if (message.receipt.virusVerdict.status !== 'PASS')
-      throw new Error('Message failed virus check')
-    if (message.receipt.action.type !== 'S3')
-      throw new Error('Action type must be S3')
-
-    const response = await s3.send(
-      new GetObjectCommand({
-        Bucket: message.receipt.action.bucketName,
-        Key: message.receipt.action.objectKey,
-      })
-    )
-    const bytes = await response.Body?.transformToByteArray()
-    if (!bytes) throw new Error('No bytes')
-    const content = Buffer.from(bytes)
-
-    await messageHandler({ content, ...message })
-  })
+  return createTriggerHandler(
+    async ({ Sns: { Message } }: SNSEventRecord) => {
+      const message: SESMessage = JSON.parse(Message)
+
+      if (message.receipt.spamVerdict.status !== 'PASS')
+        throw new Error('Message failed spam check')
+      if (message.receipt.virusVerdict.status !== 'PASS')
+        throw new Error('Message failed virus check')
+      if (message.receipt.action.type !== 'S3')
+        throw new Error('Action type must be S3')
+
+      const response = await s3.send(
+        new GetObjectCommand({
+          Bucket: message.receipt.action.bucketName,
+          Key: message.receipt.action.objectKey,
+        })
+      )
+      const bytes = await response.Body?.transformToByteArray()
+      if (!bytes) throw new Error('No bytes')
+      const content = Buffer.from(bytes)
+
+      await messageHandler({ content, ...message })
+    },
+    {
+      deadLetter: {
+        source: `email-incoming/${recipient}`,
+        getRecordId: ({ Sns: { MessageId } }) => MessageId,
+        maxAttempts,
+      },
+    }
+  )
 }
@@ -35,6 +35,7 @@ const origData = {
  * Forward incoming emails to Zendesk.
  */
 export const handler = createEmailIncomingMessageHandler(
+  'support',
   async ({ content, receipt: { recipients } }) => {
     let data = { recipients, emailData: content.toString(), ...origData }
     data = await transformRecipients(data)
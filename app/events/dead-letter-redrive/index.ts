@@ -0,0 +1,213 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+import { events, tables } from '@architect/functions'
+import type { Context, DynamoDBRecord, SNSEvent } from 'aws-lambda'
+import isEqual from 'lodash/isEqual'
+import { setTimeout } from 'node:timers/promises'
+
+import { deleteDeadLetter, getDeadLetters } from '~/lib/deadLetters.server'
+import type { BatchResponse } from '~/lib/lambdaTrigger.server'
+import { marshallTrigger, unmarshallTrigger } from '~/table-streams/utils'
+
+interface RedriveRequest {
+  /** The source of the dead letters, such as `circulars`. */
+  source: string
+  /** Only log the dead letters that would be replayed. */
+  dryRun?: boolean
+  /** Maximum number of records to replay per second. */
+  rate?: number
+  /**
+   * Only replay dead letters that last failed before this time. Set by the
+   * first invocation, so that records that fail again are not replayed again
+   * when the re-drive continues in a new invocation.
+   */
+  before?: number
+}
+
+interface RedriveSource {
+  /** Load the trigger handler that the records failed in. */
+  getHandler: () => Promise<
+    (event: { Records: any[] }) => Promise<BatchResponse | void>
+  >
+  /**
+   * Number of records to pass to each call of the handler. Handlers that do
+   * not report batch item failures get one record at a time, so that the
+   * failure of one record does not keep the others from being deleted.
+   */
+  batchSize: number
+  /**
+   * Bring a record up to date before it is replayed. Returns undefined if the
+   * record has been superseded by a newer change, in which case its dead
+   * letter is deleted without replaying it.
+   */
+  refresh?: (record: any) => Promise<unknown>
+}
+
+/**
+ * Bring a circulars table stream record up to date with the table, so that
+ * replaying it does not overwrite newer edits in the search index and Kafka
+ * with an old image.
+ *
+ * A modification or removal is superseded if the item has changed since. The
+ * newer change has its own stream record, which either succeeded or is a
+ * dead letter itself. An insertion is not discarded unless the circular was
+ * deleted, because it would never be emailed otherwise. Instead, its new
+ * image is replaced with the current item.
+ */
+async function refreshCircularRecord(record: DynamoDBRecord) {
+  const { eventName, dynamodb } = record
+  const db = await tables()
+  const item = await db.circulars.get(unmarshallTrigger(dynamodb!.Keys))
+  if (eventName === 'REMOVE') return item ? undefined : record
+  if (!item) return undefined
+  if (isEqual(unmarshallTrigger(dynamodb!.NewImage), item)) return record
+  if (eventName === 'INSERT')
+    return {
+      ...record,
+      dynamodb: { ...dynamodb, NewImage: marshallTrigger(item) },
+    }
+  return undefined
+}
+
+// The item identifiers of the table stream handlers' batch item failures are
+// the same as the record IDs of their dead letters.
+const sources: Record<string, RedriveSource> = {
+  circulars: {
+    getHandler: async () => (await import('~/table-streams/circulars')).handler,
+    batchSize: 100,
+    refresh: refreshCircularRecord,
+  },
+  synonyms: {
+    getHandler: async () => (await import('~/table-streams/synonyms')).handler,
+    batchSize: 100,
+  },
+  'email-incoming/circulars': {
+    getHandler: async () =>
+      (await import('~/email-incoming/circulars')).handler,
+    batchSize: 1,
+  },
+  'email-incoming/support': {
+    getHandler: async () => (await import('~/email-incoming/support')).handler,
+    batchSize: 1,
+  },
+}
+
+const defaultRate = 10
+
+/** Stop replaying when there is less than this much time left. */
+const safetyMargin = 60_000
+
+/**
+ * Replay the dead letters of a trigger through its handler.
+ *
+ * Start a re-drive by publishing this event with the name of the source:
+ *
+ * ```
+ * await events.publish({
+ *   name: 'dead-letter-redrive',
+ *   payload: { source: 'circulars', dryRun: true },
+ * })
+ * ```
+ *
+ * Records are replayed in order of their record IDs, in batches, at no more
+ * than `rate` records per second. A dead letter is deleted when its record is
+ * handled successfully; if it fails again, then it is kept with its new
+ * error. Records of sources that can tell are checked against the current
+ * state first, and dead letters that newer changes have superseded are
+ * deleted without being replayed.
+ *
+ * If there is work left when the invocation is close to its time limit, then
+ * it publishes the event again to continue.
+ */
+export async function handler(
+  event: SNSEvent | RedriveRequest,
+  context: Context
+) {
+  const {
+    source,
+    dryRun,
+    rate = defaultRate,
+    before = Date.now(),
+  }: RedriveRequest =
+    'Records' in event ? JSON.parse(event.Records[0].Sns.Message) : event
+  const redriveSource = sources[source]
+  if (!redriveSource)
+    throw new Error(`Cannot re-drive unknown dead letter source: ${source}`)
+  const { getHandler, batchSize, refresh } = redriveSource
+
+  const deadLetters = await getDeadLetters(source, before)
+  console.log(`Found ${deadLetters.length} dead letters from ${source}`)
+  if (dryRun) {
+    for (const { recordId, attempts, deadOn, error } of deadLetters)
+      console.log(
+        JSON.stringify({
+          recordId,
+          attempts,
+          deadOn: new Date(deadOn).toISOString(),
+          error,
+        })
+      )
+    return
+  }
+
+  const recordHandler = await getHandler()
+  const startedOn = Date.now()
+  let replayed = 0
+  let redriven = 0
+  let superseded = 0
+  while (replayed < deadLetters.length) {
+    if (context.getRemainingTimeInMillis() < safetyMargin) {
+      await events.publish({
+        name: 'dead-letter-redrive',
+        payload: { source, rate, before },
+      })
+      break
+    }
+
+    const delay = startedOn + (replayed * 1000) / rate - Date.now()
+    if (delay > 0) await setTimeout(delay)
+
+    const batch = deadLetters.slice(replayed, replayed + batchSize)
+    replayed += batch.length
+    const replayedOn = Date.now()
+    let failed: Set<string>
+    let records: unknown[]
+    try {
+      records = await Promise.all(
+        batch.map(({ record }) => (refresh ? refresh(record) : record))
+      )
+      const current = records.filter((record) => record !== undefined)
+      const result = current.length
+        ? await recordHandler({ Records: current })
+        : undefined
+      failed = new Set(
+        result?.batchItemFailures.map(({ itemIdentifier }) => itemIdentifier)
+      )
+    } catch (e) {
+      console.error(e)
+      continue
+    }
+
+    const deleted = await Promise.all(
+      batch.map(({ recordId }) =>
+        failed.has(recordId)
+          ? false
+          : deleteDeadLetter(source, recordId, replayedOn)
+      )
+    )
+    deleted.forEach((isDeleted, i) => {
+      if (!isDeleted) return
+      if (records[i] === undefined) superseded++
+      else redriven++
+    })
+  }
+
+  console.log(
+    `Re-drove ${redriven} and discarded ${superseded} superseded of ${replayed} dead letters from ${source}`
+  )
+}
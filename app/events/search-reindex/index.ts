@@ -0,0 +1,286 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+import { events, tables } from '@architect/functions'
+import type {
+  BatchGetCommandInput,
+  DynamoDBDocument,
+} from '@aws-sdk/lib-dynamodb'
+import { search as getSearchClient } from '@nasa-gcn/architect-functions-search'
+import type { Context, SNSEvent } from 'aws-lambda'
+import chunk from 'lodash/chunk'
+import { setTimeout } from 'node:timers/promises'
+
+import {
+  type ReindexState,
+  bulkIndex,
+  getReindexState,
+  reindexStateMaxAge,
+} from '~/lib/search.server'
+import type { Circular } from '~/routes/circulars/circulars.lib'
+import type { Synonym } from '~/routes/synonyms/synonyms.lib'
+import {
+  eventIdIsInUse,
+  eventIdsIndexBody,
+  getEventIdDocument,
+  getSynonymGroup,
+  getSynonymsByUuid,
+} from '~/routes/synonyms/synonyms.server'
+
+interface ReindexRequest {
+  alias: string
+  /** Number of parallel scan segments. Only used when starting a reindex. */
+  totalSegments?: number
+}
+
+interface ReindexSource {
+  /** The DynamoDB table to scan. */
+  tableName: string
+  /** Settings and mappings for the new index. */
+  indexBody?: object
+  /** Convert a page of table items to documents keyed by ID. */
+  getDocuments: (items: any[]) => Promise<Map<string, object | undefined>>
+  /** Get the IDs of the documents whose source items no longer exist. */
+  getDeletedIds: (ids: string[]) => Promise<string[]>
+}
+
+/** Get the IDs of the circulars that no longer exist in the table. */
+async function getDeletedCircularIds(ids: string[]) {
+  const db = await tables()
+  const client = db._doc as unknown as DynamoDBDocument
+  const TableName = db.name('circulars')
+  const existing = new Set<string>()
+  for (const batch of chunk(ids, 100)) {
+    let RequestItems: BatchGetCommandInput['RequestItems'] = {
+      [TableName]: {
+        Keys: batch.map((id) => ({ circularId: parseFloat(id) })),
+        ProjectionExpression: 'circularId',
+      },
+    }
+    while (RequestItems && Object.keys(RequestItems).length) {
+      const { Responses, UnprocessedKeys } = await client.batchGet({
+        RequestItems,
+      })
+      for (const { circularId } of Responses?.[TableName] ?? [])
+        existing.add(circularId.toString())
+      RequestItems = UnprocessedKeys
+    }
+  }
+  return ids.filter((id) => !existing.has(id))
+}
+
+async function filterAsync<T>(
+  items: T[],
+  predicate: (item: T) => Promise<boolean>
+) {
+  const results = await Promise.all(items.map(predicate))
+  return items.filter((_, i) => results[i])
+}
+
+const sources: Record<string, ReindexSource> = {
+  circulars: {
+    tableName: 'circulars',
+    async getDocuments(items: Circular[]) {
+      return new Map(
+        items.map((circular) => [circular.circularId.toString(), circular])
+      )
+    },
+    getDeletedIds: getDeletedCircularIds,
+  },
+  'event-ids': {
+    tableName: 'circulars',
+    indexBody: eventIdsIndexBody,
+    async getDocuments(items: Circular[]) {
+      const eventIds = new Set(items.flatMap(({ eventId }) => eventId || []))
+      return new Map(
+        [...eventIds].map((eventId) => [eventId, getEventIdDocument(eventId)])
+      )
+    },
+    async getDeletedIds(eventIds) {
+      return await filterAsync(
+        eventIds,
+        async (eventId) => !(await eventIdIsInUse(eventId))
+      )
+    },
+  },
+  'synonym-groups': {
+    tableName: 'synonyms',
+    async getDocuments(items: Synonym[]) {
+      const synonymIds = [...new Set(items.map(({ synonymId }) => synonymId))]
+      const groups = await Promise.all(synonymIds.map(getSynonymGroup))
+      return new Map(synonymIds.map((synonymId, i) => [synonymId, groups[i]]))
+    },
+    async getDeletedIds(synonymIds) {
+      return await filterAsync(
+        synonymIds,
+        async (synonymId) => !(await getSynonymsByUuid(synonymId)).length
+      )
+    },
+  },
+}
+
+const defaultTotalSegments = 4
+
+/** Stop scanning when there is less than this much time left. */
+const safetyMargin = 60_000
+
+async function startReindex(
+  alias: string,
+  { indexBody }: ReindexSource,
+  totalSegments: number
+) {
+  const state: ReindexState = {
+    alias,
+    target: `${alias}-${Date.now()}`,
+    startedOn: Date.now(),
+    segments: Array.from({ length: totalSegments }, () => ({ done: false })),
+  }
+  const client = await getSearchClient()
+  await client.indices.create({ index: state.target, body: indexBody })
+
+  const db = await tables()
+  await db.search_reindex.put(state)
+  return state
+}
+
+async function scanSegment(
+  state: ReindexState,
+  segment: number,
+  { tableName, getDocuments, getDeletedIds }: ReindexSource,
+  context: Context
+) {
+  const db = await tables()
+  const client = db._doc as unknown as DynamoDBDocument
+  const TableName = db.name(tableName)
+  let { done, lastEvaluatedKey } = state.segments[segment]
+
+  while (!done && context.getRemainingTimeInMillis() > safetyMargin) {
+    const { Items, LastEvaluatedKey } = await client.scan({
+      TableName,
+      Segment: segment,
+      TotalSegments: state.segments.length,
+      ExclusiveStartKey: lastEvaluatedKey,
+    })
+
+    // Only create documents that are absent, so that we do not overwrite
+    // newer versions that were written by the table stream handlers.
+    const documents = await getDocuments(Items ?? [])
+    const errors = await bulkIndex(state.target, documents, {
+      onlyIfAbsent: true,
+    })
+    if (errors.size) throw new AggregateError(errors.values())
+
+    // If an item was deleted after we scanned it, then the table stream
+    // handler may have deleted its document from the new index before we
+    // created it. Check that the items still exist now that the documents
+    // do. An item that is deleted after this check is deleted from the new
+    // index by the table stream handler.
+    const deletedIds = await getDeletedIds(
+      [...documents]
+        .filter(([, document]) => document !== undefined)
+        .map(([id]) => id)
+    )
+    const deleteErrors = await bulkIndex(
+      state.target,
+      new Map(deletedIds.map((id) => [id, undefined]))
+    )
+    if (deleteErrors.size) throw new AggregateError(deleteErrors.values())
+
+    lastEvaluatedKey = LastEvaluatedKey
+    done = !lastEvaluatedKey
+    state.segments[segment] = done ? { done } : { done, lastEvaluatedKey }
+    await db.search_reindex.update({
+      Key: { alias: state.alias },
+      UpdateExpression: `SET #segments[${segment}] = :segment`,
+      ExpressionAttributeNames: { '#segments': 'segments' },
+      ExpressionAttributeValues: { ':segment': state.segments[segment] },
+    })
+  }
+}
+
+/** Atomically point the alias at the new index, and delete the old index. */
+async function finishReindex({ alias, target }: ReindexState) {
+  const client = await getSearchClient()
+  await client.indices.refresh({ index: target })
+
+  const { body: aliasExists } = await client.indices.existsAlias({
+    name: alias,
+  })
+  const previous = aliasExists
+    ? Object.keys((await client.indices.getAlias({ name: alias })).body)
+    : []
+  // Before the first reindex, the alias name is a concrete index.
+  const indexExists =
+    !aliasExists && (await client.indices.exists({ index: alias })).body
+
+  await client.indices.updateAliases({
+    body: {
+      actions: [
+        ...previous.map((index) => ({ remove: { index, alias } })),
+        ...(indexExists ? [{ remove_index: { index: alias } }] : []),
+        { add: { index: target, alias } },
+      ],
+    },
+  })
+
+  const stale = previous.filter((index) => index !== target)
+  if (stale.length) await client.indices.delete({ index: stale.join(',') })
+
+  const db = await tables()
+  await db.search_reindex.delete({ alias })
+}
+
+/**
+ * A full reindex, from a DynamoDB table to the OpenSearch index behind an
+ * alias.
+ *
+ * Start a reindex by publishing this event with the name of the alias:
+ *
+ * ```
+ * await events.publish({
+ *   name: 'search-reindex',
+ *   payload: { alias: 'circulars' },
+ * })
+ * ```
+ *
+ * Each invocation scans the table segments in parallel until it is close to
+ * its time limit, checkpointing after every page. If there is work left, then
+ * it publishes the event again to resume where it left off. When all segments
+ * are done, it atomically points the alias at the new index and deletes the
+ * old index.
+ */
+export async function handler(
+  event: SNSEvent | ReindexRequest,
+  context: Context
+) {
+  const { alias, totalSegments = defaultTotalSegments }: ReindexRequest =
+    'Records' in event ? JSON.parse(event.Records[0].Sns.Message) : event
+  const source = sources[alias]
+  if (!source) throw new Error(`Cannot reindex unknown alias: ${alias}`)
+
+  const state =
+    (await getReindexState(alias)) ??
+    (await startReindex(alias, source, totalSegments))
+
+  // Give the table stream handlers time to notice that the reindex has
+  // started, so that they write new updates to the new index before we start
+  // copying.
+  const delay = state.startedOn + reindexStateMaxAge + 1000 - Date.now()
+  if (delay > 0) await setTimeout(delay)
+
+  await Promise.all(
+    state.segments.map((_, segment) =>
+      scanSegment(state, segment, source, context)
+    )
+  )
+
+  if (state.segments.every(({ done }) => done)) {
+    await finishReindex(state)
+  } else {
+    await events.publish({ name: 'search-reindex', payload: { alias } })
+  }
+}
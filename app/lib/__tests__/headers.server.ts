@@ -5,7 +5,7 @@
  *
  * SPDX-License-Identifier: Apache-2.0
  */
-import { getBasicAuthHeaders } from '../headers.server'
+import { getBasicAuthHeaders, getETag, isNotModified } from '../headers.server'
 
 describe('getBasicAuthHeaders', () => {
   test('forbids colons in the username', () => {
@@ -19,3 +19,61 @@ describe('getBasicAuthHeaders', () => {
     })
   })
 })
+
+describe('isNotModified', () => {
+  const etag = getETag('example body')
+  const lastModified = 'Wed, 01 May 2024 00:00:00 GMT'
+  const responseHeaders = new Headers({
+    ETag: etag,
+    'Last-Modified': lastModified,
+  })
+
+  test('matches If-None-Match against the ETag', () => {
+    expect(
+      isNotModified(new Headers({ 'If-None-Match': etag }), responseHeaders)
+    ).toBe(true)
+    expect(
+      isNotModified(
+        new Headers({ 'If-None-Match': `"other", W/${etag}` }),
+        responseHeaders
+      )
+    ).toBe(true)
+    expect(
+      isNotModified(
+        new Headers({ 'If-None-Match': getETag('other body') }),
+        responseHeaders
+      )
+    ).toBe(false)
+  })
+
+  test('prefers If-None-Match to If-Modified-Since', () => {
+    expect(
+      isNotModified(
+        new Headers({
+          'If-None-Match': '"other"',
+          'If-Modified-Since': lastModified,
+        }),
+        responseHeaders
+      )
+    ).toBe(false)
+  })
+
+  test('compares If-Modified-Since with Last-Modified', () => {
+    expect(
+      isNotModified(
+        new Headers({ 'If-Modified-Since': lastModified }),
+        responseHeaders
+      )
+    ).toBe(true)
+    expect(
+      isNotModified(
+        new Headers({ 'If-Modified-Since': 'Tue, 30 Apr 2024 00:00:00 GMT' }),
+        responseHeaders
+      )
+    ).toBe(false)
+  })
+
+  test('is false for unconditional requests', () => {
+    expect(isNotModified(new Headers(), responseHeaders)).toBe(false)
+  })
+})
@@ -5,6 +5,7 @@
  *
  * SPDX-License-Identifier: Apache-2.0
  */
+import { tables } from '@architect/functions'
 import type {
   AttributeType,
   CognitoIdentityProviderServiceException,
@@ -26,6 +27,7 @@ import {
   paginateListUsers,
   paginateListUsersInGroup,
 } from '@aws-sdk/client-cognito-identity-provider'
+import { type DynamoDBDocument, paginateQuery } from '@aws-sdk/lib-dynamodb'
 
 import type { User } from '~/routes/_auth/user.server'
 
@@ -126,10 +128,14 @@ export async function listUsers(filterString: string) {
   return users
 }
 
+/**
+ * List all of the users in a Cognito group.
+ *
+ * This pages through the whole group, so it is slow for large groups. Use
+ * {@link listGroupMembers} instead, which reads the mirror of group membership
+ * in DynamoDB. This is only for reconciling the mirror with Cognito.
+ */
 export async function listUsersInGroup(GroupName: string) {
-  console.warn(
-    'using a paginator; replace with alternative API calls that avoid large result sets'
-  )
   const pages = paginateListUsersInGroup(
     { client: cognito },
     { GroupName, UserPoolId }
@@ -142,6 +148,127 @@ export async function listUsersInGroup(GroupName: string) {
   return users
 }
 
+/**
+ * A user's membership in a group, mirrored from Cognito in the group_members
+ * table so that it can be looked up by group and sub or by email.
+ */
+export interface GroupMember {
+  groupName: string
+  sub: string
+  email: string
+  name?: string
+  affiliation?: string
+}
+
+export function getGroupMemberFromUser(
+  groupName: string,
+  { Attributes }: UserType
+): GroupMember {
+  const name = extractAttribute(Attributes, 'name')
+  const affiliation = extractAttribute(Attributes, 'custom:affiliation')
+  return {
+    groupName,
+    sub: extractAttributeRequired(Attributes, 'sub'),
+    email: extractAttributeRequired(Attributes, 'email'),
+    ...(name ? { name } : {}),
+    ...(affiliation ? { affiliation } : {}),
+  }
+}
+
+/** Get a member of a group by sub, or undefined if they are not a member. */
+export async function getGroupMember(groupName: string, sub: string) {
+  const db = await tables()
+  return (await db.group_members.get({ groupName, sub })) as
+    | GroupMember
+    | undefined
+}
+
+/** Get a member of a group by email, or undefined if they are not a member. */
+export async function getGroupMemberByEmail(groupName: string, email: string) {
+  const db = await tables()
+  const { Items } = await db.group_members.query({
+    IndexName: 'groupMembersByEmail',
+    KeyConditionExpression: 'email = :email AND groupName = :groupName',
+    ExpressionAttributeValues: {
+      ':email': email,
+      ':groupName': groupName,
+    },
+  })
+  return Items[0] as GroupMember | undefined
+}
+
+export async function listGroupMembers(groupName: string) {
+  const db = await tables()
+  const client = db._doc as unknown as DynamoDBDocument
+  const pages = paginateQuery(
+    { client },
+    {
+      TableName: db.name('group_members'),
+      KeyConditionExpression: 'groupName = :groupName',
+      ExpressionAttributeValues: { ':groupName': groupName },
+    }
+  )
+  const members: GroupMember[] = []
+  for await (const page of pages) {
+    const nextMembers = page.Items as GroupMember[] | undefined
+    if (nextMembers) members.push(...nextMembers)
+  }
+  return members
+}
+
+/**
+ * Update the name and affiliation of a user in all of the groups that they
+ * are a member of.
+ *
+ * Empty attributes are removed rather than stored as empty strings, just as
+ * {@link getGroupMemberFromUser} omits them, so that the groups job finds the
+ * members up to date.
+ */
+export async function updateGroupMemberAttributes(
+  sub: string,
+  { name, affiliation }: Pick<GroupMember, 'name' | 'affiliation'>
+) {
+  const set: string[] = []
+  const remove: string[] = []
+  const values: Record<string, string> = {}
+  for (const [key, value] of Object.entries({ name, affiliation })) {
+    if (value) {
+      set.push(`#${key} = :${key}`)
+      values[`:${key}`] = value
+    } else {
+      remove.push(`#${key}`)
+    }
+  }
+  const UpdateExpression = [
+    ...(set.length ? [`SET ${set.join(', ')}`] : []),
+    ...(remove.length ? [`REMOVE ${remove.join(', ')}`] : []),
+  ].join(' ')
+
+  const db = await tables()
+  const { Items } = await db.group_members.query({
+    IndexName: 'groupMembersBySub',
+    KeyConditionExpression: '#sub = :sub',
+    ExpressionAttributeNames: { '#sub': 'sub' },
+    ExpressionAttributeValues: { ':sub': sub },
+    ProjectionExpression: 'groupName',
+  })
+  await Promise.all(
+    (Items as Pick<GroupMember, 'groupName'>[]).map(({ groupName }) =>
+      db.group_members.update({
+        Key: { groupName, sub },
+        UpdateExpression,
+        ConditionExpression: 'attribute_exists(groupName)',
+        ExpressionAttributeNames: {
+          '#name': 'name',
+          '#affiliation': 'affiliation',
+        },
+        // DynamoDB rejects an empty map of values.
+        ...(set.length ? { ExpressionAttributeValues: values } : {}),
+      })
+    )
+  )
+}
+
 export function maybeThrow(e: any, warning: string) {
   const errorsAllowedInDev = [
     'ExpiredTokenException',
@@ -215,13 +342,16 @@ export async function deleteGroup(GroupName: string) {
 }
 
 export async function addUserToGroup(sub: string, GroupName: string) {
-  const { Username } = await getCognitoUserFromSub(sub)
+  const user = await getCognitoUserFromSub(sub)
   const command = new AdminAddUserToGroupCommand({
     UserPoolId,
-    Username,
+    Username: user.Username,
     GroupName,
   })
   await cognito.send(command)
+
+  const db = await tables()
+  await db.group_members.put(getGroupMemberFromUser(GroupName, user))
 }
 
 export async function listGroupsForUser(sub: string) {
@@ -266,4 +396,7 @@ export async function removeUserFromGroup(sub: string, GroupName: string) {
     GroupName,
   })
   await cognito.send(command)
+
+  const db = await tables()
+  await db.group_members.delete({ groupName: GroupName, sub })
 }
@@ -0,0 +1,135 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+import { tables } from '@architect/functions'
+import { ConditionalCheckFailedException } from '@aws-sdk/client-dynamodb'
+import { type DynamoDBDocument, paginateQuery } from '@aws-sdk/lib-dynamodb'
+
+/**
+ * Records that a Lambda trigger failed to handle.
+ *
+ * There is one item per source (the trigger that received the record) and
+ * record. The item counts the failed attempts to handle the record and keeps
+ * the record and its last error. While the record is still being retried,
+ * the item expires after a week. Once the record has failed too many times,
+ * it becomes a dead letter, which is kept until it is re-driven.
+ */
+export interface DeadLetter {
+  source: string
+  recordId: string
+  record: unknown
+  error: string
+  attempts: number
+  firstFailedOn: number
+  lastFailedOn: number
+  deadOn: number
+}
+
+/** How long to count the failures of a record that is not dead yet. */
+const failureMaxAge = 7 * 24 * 60 * 60
+
+function formatError(error: unknown) {
+  if (error instanceof Error) return error.stack ?? error.message
+  return JSON.stringify(error) ?? String(error)
+}
+
+/**
+ * Count a failed attempt to handle a record. Returns true if the record has
+ * now failed at least `maxAttempts` times and has been kept as a dead letter.
+ */
+export async function putFailedRecord(
+  source: string,
+  recordId: string,
+  record: unknown,
+  error: unknown,
+  maxAttempts: number
+) {
+  const db = await tables()
+  const now = Date.now()
+  const Key = { source, recordId }
+  const { Attributes } = await db.dead_letters.update({
+    Key,
+    UpdateExpression:
+      'SET #record = :record, #error = :error, lastFailedOn = :now, firstFailedOn = if_not_exists(firstFailedOn, :now), #ttl = :ttl ADD attempts :one',
+    ExpressionAttributeNames: {
+      '#record': 'record',
+      '#error': 'error',
+      '#ttl': '_ttl',
+    },
+    ExpressionAttributeValues: {
+      ':record': JSON.stringify(record),
+      ':error': formatError(error),
+      ':now': now,
+      ':ttl': Math.round(now / 1000) + failureMaxAge,
+      ':one': 1,
+    },
+    ReturnValues: 'ALL_NEW',
+  })
+  if (Attributes.attempts < maxAttempts) return false
+
+  await db.dead_letters.update({
+    Key,
+    UpdateExpression: 'SET deadOn = if_not_exists(deadOn, :now) REMOVE #ttl',
+    ExpressionAttributeNames: { '#ttl': '_ttl' },
+    ExpressionAttributeValues: { ':now': now },
+  })
+  return true
+}
+
+/**
+ * Get the dead letters of a source that last failed before the given time,
+ * in order of their record IDs.
+ */
+export async function getDeadLetters(source: string, before: number) {
+  const db = await tables()
+  const client = db._doc as unknown as DynamoDBDocument
+  const TableName = db.name('dead_letters')
+  const pages = paginateQuery(
+    { client },
+    {
+      KeyConditionExpression: '#source = :source',
+      FilterExpression: 'attribute_exists(deadOn) AND lastFailedOn < :before',
+      ExpressionAttributeNames: { '#source': 'source' },
+      ExpressionAttributeValues: { ':source': source, ':before': before },
+      TableName,
+    }
+  )
+  const deadLetters: DeadLetter[] = []
+  for await (const { Items } of pages) {
+    for (const item of Items ?? [])
+      deadLetters.push({
+        ...item,
+        record: JSON.parse(item.record),
+      } as DeadLetter)
+  }
+  return deadLetters
+}
+
+/**
+ * Delete a dead letter, unless it failed again at or after the given time.
+ * Returns true if it was deleted.
+ */
+export async function deleteDeadLetter(
+  source: string,
+  recordId: string,
+  before: number
+) {
+  const db = await tables()
+  const client = db._doc as unknown as DynamoDBDocument
+  try {
+    await client.delete({
+      TableName: db.name('dead_letters'),
+      Key: { source, recordId },
+      ConditionExpression: 'lastFailedOn < :before',
+      ExpressionAttributeValues: { ':before': before },
+    })
+  } catch (e) {
+    if (e instanceof ConditionalCheckFailedException) return false
+    throw e
+  }
+  return true
+}
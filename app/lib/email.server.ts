@@ -5,19 +5,26 @@
  *
  * SPDX-License-Identifier: Apache-2.0
  */
-import { services } from '@architect/functions'
+import { queues, services, tables } from '@architect/functions'
+import { ConditionalCheckFailedException } from '@aws-sdk/client-dynamodb'
 import type {
   BulkEmailEntry,
+  BulkEmailEntryResult,
+  BulkEmailStatus,
   SendBulkEmailCommandInput,
   SendEmailCommandInput,
 } from '@aws-sdk/client-sesv2'
 import {
+  GetAccountCommand,
   SESv2Client,
   SESv2ServiceException,
   SendBulkEmailCommand,
   SendEmailCommand,
 } from '@aws-sdk/client-sesv2'
+import type { DynamoDBDocument } from '@aws-sdk/lib-dynamodb'
 import chunk from 'lodash/chunk'
+import memoizee from 'memoizee'
+import invariant from 'tiny-invariant'
 
 import { hostname } from './env.server'
 import { getEnvBannerHeaderAndDescription } from './utils'
@@ -27,6 +34,16 @@ const client = new SESv2Client({})
 // https://docs.aws.amazon.com/ses/latest/dg/quotas.html
 const maxRecipientsPerMessage = 50
 
+/** How long to keep records of bulk email jobs, in seconds. */
+const bulkEmailJobRetention = 7 * 24 * 3600
+
+/** Per-recipient statuses of SendBulkEmail that are worth retrying. */
+const retryableBulkEmailStatuses: BulkEmailStatus[] = [
+  'ACCOUNT_THROTTLED',
+  'FAILED',
+  'TRANSIENT_FAILURE',
+]
+
 interface MessageProps {
   /** The name to show in the From: address. */
   fromName: string
@@ -43,6 +60,37 @@ interface MessageProps {
 interface BulkMessageProps extends MessageProps {
   /** The topic key (for unsubscribing). */
   topic: string
+  /**
+   * An idempotency key. Sending again with the same key, for example when a
+   * table stream record is retried, does not change the message or send it
+   * again to recipients who have already received it. Messages with different
+   * content must have different keys.
+   */
+  key?: string
+}
+
+export type BulkEmailJob = Omit<BulkMessageProps, 'to' | 'key'> & {
+  jobId: string
+  createdOn: number
+}
+
+export interface BulkEmailChunk {
+  jobId: string
+  chunk: number
+  /** The recipients that have not been sent to yet. */
+  addresses: string[]
+  status: 'pending' | 'sending' | 'sent' | 'failed'
+  /** The number of attempts that failed for some of the recipients. */
+  attempts: number
+  /**
+   * The number of attempts that failed as a whole because SES was throttling
+   * or unavailable. These do not count toward the limit on attempts.
+   */
+  throttles?: number
+  /** While pending after a failure, the time before which not to retry. */
+  retryAfter?: number
+  /** While sending, the time after which another sender may take over. */
+  leaseExpiresOn?: number
 }
 
 function getBody(body: string) {
@@ -60,34 +108,154 @@ function getFrom(fromName: string) {
   return `${fromName} <no-reply@${hostname}>`
 }
 
+/**
+ * Check whether an error is due to missing SES credentials outside of
+ * production, and if so, log a warning.
+ */
+function isIgnorableError(e: unknown) {
+  if (
+    e instanceof SESv2ServiceException &&
+    ['InvalidClientTokenId', 'UnrecognizedClientException'].includes(e.name) &&
+    process.env.NODE_ENV !== 'production'
+  ) {
+    console.warn(`SES threw ${e.name}. This would be an error in production.`)
+    return true
+  } else {
+    return false
+  }
+}
+
+/**
+ * Check whether a failed SES request is worth retrying later, because SES was
+ * throttling, unavailable, or unreachable.
+ */
+export function isTransientEmailError(e: unknown) {
+  if (e instanceof SESv2ServiceException)
+    return (
+      e.$fault === 'server' ||
+      Boolean(e.$retryable) ||
+      ['TooManyRequestsException', 'LimitExceededException'].includes(e.name)
+    )
+  return (
+    e instanceof Error &&
+    (e.name === 'TimeoutError' ||
+      (e as NodeJS.ErrnoException).code === 'ECONNRESET')
+  )
+}
+
 async function send(sendCommandInput: SendEmailCommandInput) {
   const command = new SendEmailCommand(sendCommandInput)
   try {
     await client.send(command)
   } catch (e) {
-    if (
-      !(
-        e instanceof SESv2ServiceException &&
-        ['InvalidClientTokenId', 'UnrecognizedClientException'].includes(e.name)
-      ) ||
-      process.env.NODE_ENV === 'production'
-    ) {
-      throw e
-    } else {
-      console.warn(`SES threw ${e.name}. This would be an error in production.`)
-    }
+    if (!isIgnorableError(e)) throw e
   }
 }
 
-/** Send an email to many recipients in parallel. */
+/**
+ * Get the maximum number of recipients per second that SES allows. Outside
+ * of production without SES credentials, assume the default for a new
+ * production account.
+ */
+export async function getMaxSendRate() {
+  try {
+    const { SendQuota } = await client.send(new GetAccountCommand({}))
+    invariant(SendQuota?.MaxSendRate)
+    return SendQuota.MaxSendRate
+  } catch (e) {
+    if (isIgnorableError(e)) return 14
+    throw e
+  }
+}
+
+/**
+ * Get the per-recipient template data for a bulk email, which contains a
+ * signed unsubscribe link.
+ *
+ * Signing a token for every recipient of every bulk email is expensive, so
+ * the result is cached for each address and topic. The cache lifetime is
+ * much shorter than the maximum age of an unsubscribe token, so a cached
+ * link is still valid for days after the email is delivered.
+ */
+export const getReplacementTemplateData = memoizee(
+  async (email: string, topic: string) =>
+    JSON.stringify({
+      perUserBody: `\n---\nTo unsubscribe, open this link in a web browser:\n${await encodeToURL(
+        { email, topics: [topic] }
+      )}`,
+    }),
+  { promise: true, primitive: true, maxAge: 24 * 3600 * 1000, max: 100_000 }
+)
+
+/**
+ * Send an email to many recipients.
+ *
+ * The recipients are split into chunks of up to 50 addresses and handed off
+ * to the email-outgoing queue, which sends the chunks within the SES rate
+ * limit and retries failed recipients.
+ */
 export async function sendEmailBulk({
+  key = crypto.randomUUID(),
   to,
-  fromName,
-  replyTo,
-  subject,
-  body,
-  topic,
+  ...props
 }: BulkMessageProps) {
+  const db = await tables()
+  const client = db._doc as unknown as DynamoDBDocument
+  const createdOn = Date.now()
+  const _ttl = Math.round(createdOn / 1000) + bulkEmailJobRetention
+
+  // Do not overwrite a job or chunks that already exist, because they may
+  // already have been sent.
+  try {
+    await client.put({
+      TableName: db.name('email_outgoing_jobs'),
+      Item: {
+        jobId: key,
+        createdOn,
+        _ttl,
+        ...props,
+      } satisfies BulkEmailJob & { _ttl: number },
+      ConditionExpression: 'attribute_not_exists(jobId)',
+    })
+  } catch (e) {
+    if (!(e instanceof ConditionalCheckFailedException)) throw e
+  }
+
+  const TableName = db.name('email_outgoing_chunks')
+  await Promise.all(
+    chunk(to, maxRecipientsPerMessage).map(async (addresses, i) => {
+      try {
+        await client.put({
+          TableName,
+          Item: {
+            jobId: key,
+            chunk: i,
+            addresses,
+            status: 'pending',
+            attempts: 0,
+            _ttl,
+          } satisfies BulkEmailChunk & { _ttl: number },
+          ConditionExpression: 'attribute_not_exists(jobId)',
+        })
+      } catch (e) {
+        if (!(e instanceof ConditionalCheckFailedException)) throw e
+      }
+    })
+  )
+
+  await queues.publish({ name: 'email-outgoing', payload: { jobId: key } })
+}
+
+/**
+ * Send one chunk of a bulk email with a single SendBulkEmail request.
+ *
+ * @returns The addresses that failed with an error that is worth retrying.
+ */
+export async function sendEmailBulkChunk(
+  { fromName, replyTo, subject, body, topic }: BulkEmailJob,
+  addresses: string[]
+) {
+  invariant(addresses.length <= maxRecipientsPerMessage)
   const s = await services()
   const message: Omit<SendBulkEmailCommandInput, 'BulkEmailEntries'> = {
     FromEmailAddress: getFrom(fromName),
@@ -102,27 +270,42 @@ export async function sendEmailBulk({
       },
     },
   }
-  await Promise.all(
-    chunk(to, maxRecipientsPerMessage).map(async (addresses) => {
-      const BulkEmailEntries: BulkEmailEntry[] = await Promise.all(
-        addresses.map(async (address) => ({
-          Destination: { ToAddresses: [address] },
-          ReplacementEmailContent: {
-            ReplacementTemplate: {
-              ReplacementTemplateData: JSON.stringify({
-                perUserBody: `\n---\nTo unsubscribe, open this link in a web browser:\n${await encodeToURL(
-                  { email: address, topics: [topic] }
-                )}`,
-              }),
-            },
-          },
-        }))
-      )
-      await client.send(
-        new SendBulkEmailCommand({ BulkEmailEntries, ...message })
-      )
-    })
+  const BulkEmailEntries: BulkEmailEntry[] = await Promise.all(
+    addresses.map(async (address) => ({
+      Destination: { ToAddresses: [address] },
+      ReplacementEmailContent: {
+        ReplacementTemplate: {
+          ReplacementTemplateData: await getReplacementTemplateData(
+            address,
+            topic
+          ),
+        },
+      },
+    }))
   )
+
+  let results: BulkEmailEntryResult[] | undefined
+  try {
+    const response = await client.send(
+      new SendBulkEmailCommand({ BulkEmailEntries, ...message })
+    )
+    results = response.BulkEmailEntryResults
+  } catch (e) {
+    if (isIgnorableError(e)) return []
+    throw e
+  }
+
+  return addresses.filter((address, i) => {
+    const result = results?.[i]
+    if (result?.Status === 'SUCCESS') return false
+    const retryable =
+      !result?.Status || retryableBulkEmailStatuses.includes(result.Status)
+    if (!retryable)
+      console.error(
+        `Failed to send email to ${address}: ${result?.Status}: ${result?.Error}`
+      )
+    return retryable
+  })
 }
 
 /** Send an email to one To: recipient. */
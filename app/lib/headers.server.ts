@@ -5,6 +5,7 @@
  *
  * SPDX-License-Identifier: Apache-2.0
  */
+import { createHash } from 'crypto'
 
 /**
  * HTTP headers for static, long-lived data.
@@ -20,6 +21,79 @@ export const publicStaticShortTermCacheControlHeaders = {
   'Cache-Control': 'public, max-age=86400',
 }
 
+/**
+ * HTTP headers for data that rarely changes at its URL, such as a specific
+ * version of a circular. It can still be deleted or corrected, and nothing
+ * purges it from the CDN, so browsers may keep it for an hour and the CDN for
+ * a day. After that, they revalidate it with a conditional request.
+ */
+export const publicVersionedCacheControlHeaders = {
+  'Cache-Control': 'public, max-age=3600, s-maxage=86400',
+}
+
+/**
+ * HTTP headers for data that may change at any time, such as the latest
+ * version of a circular. Caches may store it, but must revalidate it with a
+ * conditional request before every use.
+ */
+export const publicRevalidateCacheControlHeaders = {
+  'Cache-Control': 'public, no-cache',
+}
+
+/**
+ * The name of the header that a route uses to declare its cache policy for
+ * requests from users who are not signed in. The server removes it from the
+ * response and, if the request has no session cookie, uses it as the
+ * Cache-Control header. Otherwise, the response is not cached.
+ */
+export const anonymousCacheControlHeader = 'X-Anonymous-Cache-Control'
+
+/**
+ * HTTP headers for pages that are the same for everyone who is not signed in.
+ * The CDN may serve them for a short time, and for a while longer while it
+ * fetches a fresh copy in the background. Browsers must always revalidate, so
+ * that a user who has just signed in or out does not see a stale page.
+ */
+export const anonymousCacheControlHeaders = {
+  [anonymousCacheControlHeader]:
+    'public, max-age=0, s-maxage=60, stale-while-revalidate=600',
+}
+
+/** Get a strong entity tag for a response body. */
+export function getETag(body: string) {
+  return `"${createHash('sha1').update(body).digest('base64url')}"`
+}
+
+function stripWeak(etag: string) {
+  return etag.trim().replace(/^W\//, '')
+}
+
+/**
+ * Determine whether a response may be replaced by 304 Not Modified, given the
+ * conditional headers of the request.
+ *
+ * @see https://www.rfc-editor.org/rfc/rfc9110#section-13.2.2
+ */
+export function isNotModified(
+  requestHeaders: Headers,
+  responseHeaders: Headers
+) {
+  const ifNoneMatch = requestHeaders.get('If-None-Match')
+  if (ifNoneMatch !== null) {
+    const etag = responseHeaders.get('ETag')
+    if (!etag) return false
+    return ifNoneMatch
+      .split(',')
+      .some((tag) => tag.trim() === '*' || stripWeak(tag) === stripWeak(etag))
+  }
+
+  const ifModifiedSince = requestHeaders.get('If-Modified-Since')
+  const lastModified = responseHeaders.get('Last-Modified')
+  if (ifModifiedSince && lastModified)
+    return Date.parse(lastModified) <= Date.parse(ifModifiedSince)
+  return false
+}
+
 /**
  * Get HTTP headers for declaring the canonical URL to search engines.
  *
@@ -6,6 +6,7 @@
  * SPDX-License-Identifier: Apache-2.0
  */
 import { Kafka } from 'gcn-kafka'
+import { CompressionTypes, type Producer } from 'kafkajs'
 import memoizee from 'memoizee'
 import { custom } from 'openid-client'
 
@@ -25,7 +26,32 @@ function setOidcHttpOptions() {
   custom.setHttpOptionsDefaults({ timeout: 10_000 })
 }
 
-export let send: (topic: string, value: string) => Promise<void>
+export interface KafkaMessage {
+  /**
+   * The message key. Messages with the same key go to the same partition, so
+   * consumers receive them in order, and log compaction keeps the latest.
+   */
+  key?: string
+  value: string
+}
+
+/**
+ * Send several messages to a topic in one compressed batch. Does nothing if
+ * there are no messages.
+ */
+export let send: (topic: string, messages: KafkaMessage[]) => Promise<void>
+
+async function sendWithProducer(
+  producer: Producer,
+  topic: string,
+  messages: KafkaMessage[]
+) {
+  await producer.send({
+    topic,
+    messages,
+    compression: CompressionTypes.GZIP,
+  })
+}
 
 // FIXME: A single AWS Lambda execution environment can handle multiple
 // invocations; AWS sends the runtime SIGTERM when it is time to shut down.
@@ -41,14 +67,16 @@ export let send: (topic: string, value: string) => Promise<void>
 // multiple invocations and we register a beforeExit event handler to close it
 // when the runtime is gracefully shutting down. However, until the above issue
 // is fixed in @architect/sandbox, we need a separate code path for local
-// testing.
+// testing. Callers should send all of the messages from an invocation in one
+// batch, so that there is only one connection per invocation.
 if (process.env.ARC_SANDBOX) {
-  send = async (topic, value) => {
+  send = async (topic, messages) => {
+    if (!messages.length) return
     setOidcHttpOptions()
     const producer = kafka.producer()
     await producer.connect()
     try {
-      await producer.send({ topic, messages: [{ value }] })
+      await sendWithProducer(producer, topic, messages)
     } finally {
       await producer.disconnect()
     }
@@ -72,8 +100,8 @@ if (process.env.ARC_SANDBOX) {
     { promise: true }
   )
 
-  send = async (topic, value) => {
-    const producer = await getProducer()
-    await producer.send({ topic, messages: [{ value }] })
+  send = async (topic, messages) => {
+    if (!messages.length) return
+    await sendWithProducer(await getProducer(), topic, messages)
   }
 }
@@ -5,22 +5,148 @@
  *
  * SPDX-License-Identifier: Apache-2.0
  */
+import { putFailedRecord } from './deadLetters.server'
 
 // Type guarding to get around an error when trying to access `reason`
 const isRejected = (
   input: PromiseSettledResult<unknown>
 ): input is PromiseRejectedResult => input.status === 'rejected'
 
+export interface TriggerHandlerOptions<T> {
+  /** The maximum number of records to handle at once. Default: no limit. */
+  concurrency?: number
+  /**
+   * Get the identifier of a record for reporting partial batch failures.
+   *
+   * If this is provided, then the handler does not throw when records fail.
+   * Instead, it returns the failed records as `batchItemFailures`, so that
+   * only they are retried. The event source mapping must have the
+   * ReportBatchItemFailures function response type.
+   */
+  getItemIdentifier?: (record: T) => string
+  /**
+   * Keep records that fail repeatedly in the dead_letters table.
+   *
+   * Every failure of a record is counted. When a record has failed
+   * `maxAttempts` times, it is stored with its last error and then treated
+   * as handled, so that it no longer blocks the records after it. Dead
+   * letters can be replayed with the dead-letter-redrive event.
+   */
+  deadLetter?: DeadLetterOptions<T>
+}
+
+export interface DeadLetterOptions<T> {
+  /** The name of the trigger, which the re-drive uses to find its handler. */
+  source: string
+  /** Get a unique identifier of a record that stays the same on retries. */
+  getRecordId: (record: T) => string
+  /** The number of failures after which a record is dead. Default: 10. */
+  maxAttempts?: number
+}
+
+export interface BatchResponse {
+  batchItemFailures: { itemIdentifier: string }[]
+}
+
 /**
  * Create a Lambda trigger handler that handles event records concurrently,
  * asynchronously.
  */
 export function createTriggerHandler<T>(
-  recordHandler: (record: T) => Promise<void>
+  recordHandler: (record: T) => Promise<void>,
+  {
+    concurrency = Infinity,
+    getItemIdentifier,
+    deadLetter,
+  }: TriggerHandlerOptions<T> = {}
+) {
+  return async (event: { Records: T[] }): Promise<BatchResponse | void> => {
+    const results = await allSettledWithConcurrency(
+      event.Records,
+      recordHandler,
+      concurrency
+    )
+    if (deadLetter) await putDeadLetters(event.Records, results, deadLetter)
+    if (!getItemIdentifier) {
+      const rejections = results.filter(isRejected).map(({ reason }) => reason)
+      if (rejections.length) throw rejections
+      return
+    }
+
+    const batchItemFailures: BatchResponse['batchItemFailures'] = []
+    results.forEach((result, i) => {
+      if (isRejected(result)) {
+        console.error(result.reason)
+        batchItemFailures.push({
+          itemIdentifier: getItemIdentifier(event.Records[i]),
+        })
+      }
+    })
+    return { batchItemFailures }
+  }
+}
+
+/**
+ * Count the failures of the rejected records, and mark the records that have
+ * become dead letters as fulfilled. If a failure cannot be stored, then the
+ * record stays rejected so that it is retried.
+ */
+async function putDeadLetters<T>(
+  records: T[],
+  results: PromiseSettledResult<void>[],
+  { source, getRecordId, maxAttempts = 10 }: DeadLetterOptions<T>
+) {
+  await Promise.all(
+    results.map(async (result, i) => {
+      if (!isRejected(result)) return
+      const recordId = getRecordId(records[i])
+      let dead
+      try {
+        dead = await putFailedRecord(
+          source,
+          recordId,
+          records[i],
+          result.reason,
+          maxAttempts
+        )
+      } catch (e) {
+        console.error(e)
+        return
+      }
+      if (dead) {
+        console.error(`Record ${recordId} from ${source} is a dead letter`)
+        console.error(result.reason)
+        results[i] = { status: 'fulfilled', value: undefined }
+      }
+    })
+  )
+}
+
+/**
+ * Like Promise.allSettled(items.map(func)), but call func on at most
+ * `concurrency` items at a time.
+ */
+async function allSettledWithConcurrency<T, R>(
+  items: T[],
+  func: (item: T) => Promise<R>,
+  concurrency: number
 ) {
-  return async (event: { Records: T[] }) => {
-    await allSettledOrRaise(event.Records.map(recordHandler))
+  const results: PromiseSettledResult<R>[] = new Array(items.length)
+  let next = 0
+  async function worker() {
+    while (next < items.length) {
+      const i = next++
+      try {
+        results[i] = { status: 'fulfilled', value: await func(items[i]) }
+      } catch (reason) {
+        results[i] = { status: 'rejected', reason }
+      }
+    }
   }
+  await Promise.all(
+    Array.from({ length: Math.min(concurrency, items.length) }, worker)
+  )
+  return results
 }
 
 /**
@@ -0,0 +1,273 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+import { tables } from '@architect/functions'
+import { ConditionalCheckFailedException } from '@aws-sdk/client-dynamodb'
+import {
+  type DynamoDBDocument,
+  paginateQuery,
+  paginateScan,
+} from '@aws-sdk/lib-dynamodb'
+
+/**
+ * The materialized list of email recipients for each topic.
+ *
+ * There is one item per topic and normalized email address. Its `sources`
+ * attribute is the set of reasons that the address receives the topic:
+ * `sub:<sub>` for a subscription by a signed-in user, or `legacy` for a
+ * legacy user. An address is removed when it has no sources left.
+ *
+ * The normalized address is only used to deduplicate recipients. The
+ * `addresses` attribute is the set of addresses as they are spelled in the
+ * source tables, which are keyed by the exact address. Mail is sent to one of
+ * them, and unsubscribing removes the source rows of all of them.
+ */
+export type RecipientTopic = 'circulars' | 'announcements'
+
+export type RecipientSources = {
+  sources: Set<string>
+  addresses: Set<string>
+}
+
+export const legacyRecipientSource = 'legacy'
+
+/**
+ * The sort key of an item that marks the list for a topic as complete. The
+ * recipients job writes it after it has reconciled the list for the first
+ * time. Until then, recipients are read from the source tables instead.
+ */
+const materializedMarker = '#materialized'
+
+/** The tables that the recipients of each topic are derived from. */
+const recipientSourceTables: Record<
+  RecipientTopic,
+  {
+    subscriptionsTable: string
+    legacyIndexName: string
+    legacyAttribute: string
+  }
+> = {
+  circulars: {
+    subscriptionsTable: 'circulars_subscriptions',
+    legacyIndexName: 'legacyReceivers',
+    legacyAttribute: 'receive',
+  },
+  announcements: {
+    subscriptionsTable: 'announcement_subscriptions',
+    legacyIndexName: 'legacyAnnouncementReceivers',
+    legacyAttribute: 'receiveAnnouncements',
+  },
+}
+
+export function getSubscriptionRecipientSource(sub: string) {
+  return `sub:${sub}`
+}
+
+export function normalizeEmail(email: string) {
+  return email.trim().toLowerCase()
+}
+
+export async function addRecipient(
+  topic: RecipientTopic,
+  email: string,
+  source: string
+) {
+  const db = await tables()
+  await db.email_recipients.update({
+    Key: { topic, email: normalizeEmail(email) },
+    UpdateExpression: 'ADD #sources :sources, #addresses :addresses',
+    ExpressionAttributeNames: {
+      '#sources': 'sources',
+      '#addresses': 'addresses',
+    },
+    ExpressionAttributeValues: {
+      ':sources': new Set([source]),
+      ':addresses': new Set([email]),
+    },
+  })
+}
+
+export async function removeRecipient(
+  topic: RecipientTopic,
+  email: string,
+  source: string
+) {
+  const db = await tables()
+  const Key = { topic, email: normalizeEmail(email) }
+  const { Attributes } = await db.email_recipients.update({
+    Key,
+    UpdateExpression: 'DELETE #sources :sources',
+    ExpressionAttributeNames: { '#sources': 'sources' },
+    ExpressionAttributeValues: { ':sources': new Set([source]) },
+    ReturnValues: 'ALL_NEW',
+  })
+  if (Attributes?.sources?.size) return
+
+  // Delete the item, unless a source was added back in the meantime.
+  const client = db._doc as unknown as DynamoDBDocument
+  try {
+    await client.delete({
+      TableName: db.name('email_recipients'),
+      Key,
+      ConditionExpression: 'attribute_not_exists(#sources)',
+      ExpressionAttributeNames: { '#sources': 'sources' },
+    })
+  } catch (e) {
+    if (!(e instanceof ConditionalCheckFailedException)) throw e
+  }
+}
+
+/** Stop sending a topic to an address, whatever its sources. */
+export async function deleteRecipient(topic: RecipientTopic, email: string) {
+  const db = await tables()
+  await db.email_recipients.delete({ topic, email: normalizeEmail(email) })
+}
+
+/**
+ * Get all of the spellings of an address that receive a topic, as they appear
+ * in the source tables, including the given one.
+ */
+export async function getRecipientAddresses(
+  topic: RecipientTopic,
+  email: string
+) {
+  const db = await tables()
+  const item = await db.email_recipients.get({
+    topic,
+    email: normalizeEmail(email),
+  })
+  return [...new Set<string>([email, ...(item?.addresses ?? [])])]
+}
+
+/** Pick the address to send mail to from the spellings of an address. */
+function getDeliveryAddress(email: string, addresses?: Set<string>) {
+  return addresses?.size ? [...addresses].sort()[0] : email
+}
+
+/**
+ * Get the deduplicated email addresses of all recipients of a topic.
+ *
+ * If the list for the topic has not been materialized yet, for example right
+ * after the first deploy or in the sandbox, then the recipients are read from
+ * the source tables instead.
+ */
+export async function getRecipients(topic: RecipientTopic) {
+  const db = await tables()
+  const client = db._doc as unknown as DynamoDBDocument
+  const TableName = db.name('email_recipients')
+  const pages = paginateQuery(
+    { client },
+    {
+      KeyConditionExpression: '#topic = :topic',
+      ExpressionAttributeNames: {
+        '#topic': 'topic',
+        '#email': 'email',
+        '#addresses': 'addresses',
+      },
+      ExpressionAttributeValues: { ':topic': topic },
+      ProjectionExpression: '#email, #addresses',
+      TableName,
+    }
+  )
+  const emails: string[] = []
+  let materialized = false
+  for await (const page of pages) {
+    for (const { email, addresses } of page.Items ?? []) {
+      if (email === materializedMarker) materialized = true
+      else emails.push(getDeliveryAddress(email, addresses))
+    }
+  }
+  if (materialized) return emails
+
+  console.warn(
+    `Recipients of ${topic} have not been materialized; reading source tables`
+  )
+  return [...(await getSourceRecipientSources(topic))].map(
+    ([email, { addresses }]) => getDeliveryAddress(email, addresses)
+  )
+}
+
+/** Get the recipients of a topic, with their sources. */
+export async function getRecipientSources(topic: RecipientTopic) {
+  const db = await tables()
+  const client = db._doc as unknown as DynamoDBDocument
+  const TableName = db.name('email_recipients')
+  const pages = paginateQuery(
+    { client },
+    {
+      KeyConditionExpression: '#topic = :topic',
+      ExpressionAttributeNames: { '#topic': 'topic' },
+      ExpressionAttributeValues: { ':topic': topic },
+      TableName,
+    }
+  )
+  const result = new Map<string, RecipientSources>()
+  for await (const page of pages) {
+    for (const { email, sources, addresses } of page.Items ?? [])
+      if (email !== materializedMarker)
+        result.set(email, { sources, addresses: addresses ?? new Set() })
+  }
+  return result
+}
+
+/**
+ * Get the recipients of a topic, with their sources, from the subscriptions
+ * and legacy users that the materialized list is derived from.
+ */
+export async function getSourceRecipientSources(topic: RecipientTopic) {
+  const { subscriptionsTable, legacyIndexName, legacyAttribute } =
+    recipientSourceTables[topic]
+  const db = await tables()
+  const client = db._doc as unknown as DynamoDBDocument
+  const result = new Map<string, RecipientSources>()
+  function addSource(address: string, source: string) {
+    const email = normalizeEmail(address)
+    let entry = result.get(email)
+    if (!entry) {
+      entry = { sources: new Set(), addresses: new Set() }
+      result.set(email, entry)
+    }
+    entry.sources.add(source)
+    entry.addresses.add(address)
+  }
+
+  for await (const { Items } of paginateScan(
+    { client },
+    {
+      TableName: db.name(subscriptionsTable),
+      ProjectionExpression: 'email, #sub',
+      ExpressionAttributeNames: { '#sub': 'sub' },
+    }
+  ))
+    for (const { email, sub } of Items ?? [])
+      addSource(email, getSubscriptionRecipientSource(sub))
+
+  for await (const { Items } of paginateQuery(
+    { client },
+    {
+      TableName: db.name('legacy_users'),
+      IndexName: legacyIndexName,
+      KeyConditionExpression: '#attribute = :one',
+      ExpressionAttributeNames: { '#attribute': legacyAttribute },
+      ExpressionAttributeValues: { ':one': 1 },
+      ProjectionExpression: 'email',
+    }
+  ))
+    for (const { email } of Items ?? []) addSource(email, legacyRecipientSource)
+
+  return result
+}
+
+/** Record that the list of recipients of a topic is complete. */
+export async function markRecipientsMaterialized(topic: RecipientTopic) {
+  const db = await tables()
+  await db.email_recipients.put({
+    topic,
+    email: materializedMarker,
+    materializedOn: Date.now(),
+  })
+}
@@ -0,0 +1,139 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+import { tables } from '@architect/functions'
+import { search as getSearchClient } from '@nasa-gcn/architect-functions-search'
+import memoizee from 'memoizee'
+
+interface BulkResponseItem {
+  _id: string
+  status: number
+  error?: { type: string; reason: string }
+}
+
+/** Fields to update in an existing document, for {@link bulkIndex}. */
+export class PartialUpdate {
+  constructor(readonly fields: object) {}
+}
+
+/**
+ * Index or delete many documents with a single OpenSearch _bulk request.
+ *
+ * @param indices - The name of the index, or of several indices that should
+ *   all receive the same writes.
+ * @param documents - A map from document IDs to document bodies. A body of
+ *   `undefined` means that the document should be deleted. A
+ *   {@link PartialUpdate} means that only some fields of an existing document
+ *   should be updated. Since each ID appears only once, the caller can
+ *   collapse repeated writes to the same document so that the last write
+ *   wins.
+ * @param onlyIfAbsent - If true, then create documents only if they do not
+ *   already exist, and leave existing documents untouched.
+ * @param version - If given, then write the documents with this external
+ *   version, and leave any document that already has a higher version
+ *   untouched. Writers that derive the same documents from separate reads
+ *   use the time of the read, so that an older snapshot never overwrites a
+ *   newer one. Not supported for partial updates.
+ * @returns A map from document IDs to errors, for any documents that failed.
+ *   Deleting a document that does not exist is not an error, and neither is
+ *   partially updating one. Callers send partial updates only when no
+ *   reindex is in progress, and a reindex writes every document in full.
+ */
+export async function bulkIndex(
+  indices: string | string[],
+  documents: Map<string, object | undefined>,
+  {
+    onlyIfAbsent = false,
+    version,
+  }: { onlyIfAbsent?: boolean; version?: number } = {}
+) {
+  const versioning =
+    version === undefined ? {} : { version, version_type: 'external' }
+  const errors = new Map<string, Error>()
+  if (!documents.size) return errors
+
+  const client = await getSearchClient()
+  const {
+    body: { items },
+  } = await client.bulk({
+    body: [indices].flat().flatMap((_index) =>
+      [...documents].flatMap(([_id, document]) =>
+        document === undefined
+          ? [{ delete: { _index, _id, ...versioning } }]
+          : document instanceof PartialUpdate
+            ? [{ update: { _index, _id } }, { doc: document.fields }]
+            : [
+                {
+                  [onlyIfAbsent ? 'create' : 'index']: {
+                    _index,
+                    _id,
+                    ...versioning,
+                  },
+                },
+                document,
+              ]
+      )
+    ),
+  })
+
+  for (const item of items as Record<string, BulkResponseItem>[]) {
+    const [[action, { _id, status, error }]] = Object.entries(item)
+    if (
+      error &&
+      !((onlyIfAbsent || version !== undefined) && status === 409) &&
+      !(action === 'update' && status === 404)
+    )
+      errors.set(
+        _id,
+        new Error(
+          `OpenSearch ${action} of document ${_id} in index ${indices} failed with status ${status}: ${error.reason}`
+        )
+      )
+  }
+  return errors
+}
+
+/** Progress of a full reindex, stored in the search_reindex table. */
+export interface ReindexState {
+  /** The alias that will point to the new index when the reindex is done. */
+  alias: string
+  /** The new index that is being populated. */
+  target: string
+  /** When the reindex started, in milliseconds since the Unix epoch. */
+  startedOn: number
+  /** Scan progress of each segment of the source table. */
+  segments: {
+    done: boolean
+    lastEvaluatedKey?: Record<string, unknown>
+  }[]
+}
+
+export async function getReindexState(alias: string) {
+  const db = await tables()
+  return (await db.search_reindex.get({ alias })) as ReindexState | undefined
+}
+
+/** How long a warm Lambda may use cached reindex state. */
+export const reindexStateMaxAge = 10_000
+
+const getReindexTarget = memoizee(
+  async function (alias: string) {
+    return (await getReindexState(alias))?.target
+  },
+  { promise: true, maxAge: reindexStateMaxAge }
+)
+
+/**
+ * Get the indices that should receive writes for an alias.
+ *
+ * This is the alias itself, plus the new index if a reindex is in progress,
+ * so that updates that arrive during the reindex are not lost.
+ */
+export async function getWriteIndices(alias: string) {
+  const target = await getReindexTarget(alias)
+  return target ? [alias, target] : [alias]
+}
@@ -29,8 +29,19 @@ export function xml(content: string, init?: ResponseInit) {
   })
 }
 
-function sitemapEntry(url: string) {
-  return `<url><loc>${url}</loc><priority>0.7</priority></url>`
+function lastmod(lastModified?: number) {
+  return lastModified === undefined
+    ? ''
+    : `<lastmod>${new Date(lastModified).toISOString()}</lastmod>`
+}
+
+export type SitemapEntryProps = {
+  url: string
+  lastModified?: number
+}
+
+function sitemapEntry({ url, lastModified }: SitemapEntryProps) {
+  return `<url><loc>${url}</loc>${lastmod(lastModified)}<priority>0.7</priority></url>`
 }
 
 /**
@@ -38,27 +49,23 @@ function sitemapEntry(url: string) {
  *
  * See https://www.sitemaps.org/protocol.html#index
  */
-export function sitemap(urls: string[], init?: ResponseInit) {
-  invariant(urls.length <= maxEntriesPerSitemap)
+export function sitemap(entries: SitemapEntryProps[], init?: ResponseInit) {
+  invariant(entries.length <= maxEntriesPerSitemap)
   return xml(
-    `<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">${urls
+    `<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">${entries
       .map(sitemapEntry)
       .join('')}</urlset>`,
     init
   )
 }
 
-type SitemapIndexProps = {
+export type SitemapIndexProps = {
   url: string
   lastModified?: number
 }
 
 function sitemapIndexEntry({ url, lastModified }: SitemapIndexProps) {
-  return `<sitemap><loc>${url}</loc>${
-    lastModified === undefined
-      ? ''
-      : `<lastmod>${new Date(lastModified).toISOString()}</lastmod>`
-  }</sitemap>`
+  return `<sitemap><loc>${url}</loc>${lastmod(lastModified)}</sitemap>`
 }
 
 /**
@@ -0,0 +1,261 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+import { queues, tables } from '@architect/functions'
+import { ConditionalCheckFailedException } from '@aws-sdk/client-dynamodb'
+import { type DynamoDBDocument, paginateQuery } from '@aws-sdk/lib-dynamodb'
+import type { Context, SQSEvent } from 'aws-lambda'
+import memoizee from 'memoizee'
+import { setTimeout } from 'node:timers/promises'
+
+import {
+  type BulkEmailChunk,
+  type BulkEmailJob,
+  getMaxSendRate,
+  isTransientEmailError,
+  sendEmailBulkChunk,
+} from '~/lib/email.server'
+
+/** Maximum number of attempts to send to each recipient. */
+const maxAttempts = 5
+
+/** Delay before retrying a chunk after its first failure, in milliseconds. */
+const minRetryDelay = 30 * 1000
+
+/**
+ * Maximum delay before retrying a chunk, in milliseconds. This is also the
+ * maximum delay of an SQS message.
+ */
+const maxRetryDelay = 15 * 60 * 1000
+
+/** Exponential backoff after a chunk has failed `failures` times in a row. */
+function getRetryDelay(failures: number) {
+  return Math.min(maxRetryDelay, minRetryDelay * 2 ** (failures - 1))
+}
+
+/** How long to wait before resuming a job whose chunks are all leased. */
+const resumeDelay = 60 * 1000
+
+/** How long a chunk stays claimed by a sender, in milliseconds. */
+const leaseDuration = 5 * 60 * 1000
+
+/**
+ * Stop claiming chunks when the Lambda has this much time left, in
+ * milliseconds, and continue in a new invocation.
+ */
+const reserveTime = 60 * 1000
+
+/** A token bucket that limits the rate of sending to recipients. */
+class TokenBucket {
+  private tokens: number
+  private updatedOn = Date.now()
+
+  constructor(readonly rate: number) {
+    this.tokens = rate
+  }
+
+  /** Wait until the bucket has enough tokens, then take them. */
+  async take(count: number) {
+    count = Math.min(count, this.rate)
+    for (;;) {
+      const now = Date.now()
+      this.tokens = Math.min(
+        this.rate,
+        this.tokens + ((now - this.updatedOn) * this.rate) / 1000
+      )
+      this.updatedOn = now
+      if (this.tokens >= count) {
+        this.tokens -= count
+        return
+      }
+      await setTimeout(((count - this.tokens) * 1000) / this.rate)
+    }
+  }
+}
+
+/**
+ * The token bucket is shared by all invocations on a warm instance. This
+ * Lambda has a reserved concurrency of 1, so it is the only sender.
+ */
+const getTokenBucket = memoizee(
+  async () => new TokenBucket(await getMaxSendRate()),
+  { promise: true }
+)
+
+async function getUnsentChunks(jobId: string) {
+  const db = await tables()
+  const client = db._doc as unknown as DynamoDBDocument
+  const pages = paginateQuery(
+    { client },
+    {
+      TableName: db.name('email_outgoing_chunks'),
+      KeyConditionExpression: 'jobId = :jobId',
+      FilterExpression: '#status IN (:pending, :sending)',
+      ExpressionAttributeNames: { '#status': 'status', '#chunk': 'chunk' },
+      ExpressionAttributeValues: {
+        ':jobId': jobId,
+        ':pending': 'pending',
+        ':sending': 'sending',
+      },
+      ProjectionExpression: '#chunk, retryAfter',
+    }
+  )
+  const chunks: Pick<BulkEmailChunk, 'chunk' | 'retryAfter'>[] = []
+  for await (const { Items } of pages)
+    if (Items) chunks.push(...(Items as typeof chunks))
+  return chunks
+}
+
+/**
+ * Claim a chunk for sending. Returns the chunk, or undefined if it has
+ * already been sent, if another sender holds it, or if it is not due for a
+ * retry yet.
+ */
+async function claimChunk(jobId: string, chunk: number) {
+  const db = await tables()
+  const now = Date.now()
+  try {
+    const { Attributes } = await db.email_outgoing_chunks.update({
+      Key: { jobId, chunk },
+      UpdateExpression: 'SET #status = :sending, leaseExpiresOn = :lease',
+      ConditionExpression:
+        '(#status = :pending AND (attribute_not_exists(retryAfter) OR retryAfter <= :now)) OR (#status = :sending AND leaseExpiresOn < :now)',
+      ExpressionAttributeNames: { '#status': 'status' },
+      ExpressionAttributeValues: {
+        ':pending': 'pending',
+        ':sending': 'sending',
+        ':lease': now + leaseDuration,
+        ':now': now,
+      },
+      ReturnValues: 'ALL_NEW',
+    })
+    return Attributes as BulkEmailChunk
+  } catch (e) {
+    if (e instanceof ConditionalCheckFailedException) return undefined
+    throw e
+  }
+}
+
+/**
+ * Record the outcome of sending a chunk. If the whole request failed because
+ * SES was throttling or unavailable, then the attempt does not count toward
+ * the limit. Either way, a chunk that is pending again is retried with
+ * exponential backoff.
+ */
+async function checkpointChunk(
+  { jobId, chunk, attempts, throttles = 0 }: BulkEmailChunk,
+  failedAddresses: string[],
+  throttled: boolean
+) {
+  if (throttled) throttles += 1
+  else attempts += 1
+  let status: BulkEmailChunk['status']
+  let retryAfter = 0
+  if (!failedAddresses.length) {
+    status = 'sent'
+  } else if (attempts < maxAttempts) {
+    status = 'pending'
+    retryAfter = Date.now() + getRetryDelay(attempts + throttles)
+  } else {
+    status = 'failed'
+    console.error(
+      `Giving up on chunk ${chunk} of ${jobId} after ${attempts} attempts: ${failedAddresses.join(', ')}`
+    )
+  }
+  const db = await tables()
+  await db.email_outgoing_chunks.update({
+    Key: { jobId, chunk },
+    UpdateExpression:
+      'SET #status = :status, addresses = :addresses, attempts = :attempts, throttles = :throttles, retryAfter = :retryAfter REMOVE leaseExpiresOn',
+    ExpressionAttributeNames: { '#status': 'status' },
+    ExpressionAttributeValues: {
+      ':status': status,
+      ':addresses': failedAddresses,
+      ':attempts': attempts,
+      ':throttles': throttles,
+      ':retryAfter': retryAfter,
+    },
+  })
+}
+
+/**
+ * Send the chunks of a bulk email job until they are all sent, until the
+ * Lambda is about to time out, or until the remaining chunks are waiting to
+ * be retried. Returns the number of milliseconds after which to resume the
+ * job, or undefined if the job is done.
+ */
+async function processJob(jobId: string, context: Context) {
+  const db = await tables()
+  const job: BulkEmailJob | undefined = await db.email_outgoing_jobs.get({
+    jobId,
+  })
+  if (!job) {
+    console.error(`Bulk email job ${jobId} does not exist`)
+    return undefined
+  }
+  const tokenBucket = await getTokenBucket()
+
+  for (;;) {
+    const chunks = await getUnsentChunks(jobId)
+    if (!chunks.length) return undefined
+
+    let claimedAny = false
+    let leased = false
+    let nextRetry = Infinity
+    for (const { chunk: chunkId, retryAfter = 0 } of chunks) {
+      if (context.getRemainingTimeInMillis() < reserveTime) return 0
+      if (retryAfter > Date.now()) {
+        nextRetry = Math.min(nextRetry, retryAfter)
+        continue
+      }
+      const chunk = await claimChunk(jobId, chunkId)
+      if (!chunk) {
+        leased = true
+        continue
+      }
+      claimedAny = true
+
+      await tokenBucket.take(chunk.addresses.length)
+      let failedAddresses
+      let throttled = false
+      try {
+        failedAddresses = await sendEmailBulkChunk(job, chunk.addresses)
+      } catch (e) {
+        console.error(e)
+        failedAddresses = chunk.addresses
+        throttled = isTransientEmailError(e)
+      }
+      await checkpointChunk(chunk, failedAddresses, throttled)
+    }
+
+    // The remaining chunks are waiting to be retried, or are held by a
+    // sender that timed out; wait for their leases to expire.
+    if (!claimedAny)
+      return leased ? resumeDelay : Math.max(0, nextRetry - Date.now())
+  }
+}
+
+/**
+ * Send bulk emails that were queued by sendEmailBulk.
+ *
+ * Each message names a job. The job's recipients are stored in chunks in the
+ * email_outgoing_chunks table, each of which is claimed, sent, and then
+ * checkpointed, so that a retried or resumed job only sends the chunks and
+ * recipients that have not succeeded yet.
+ */
+export async function handler(event: SQSEvent, context: Context) {
+  for (const { body } of event.Records) {
+    const { jobId }: { jobId: string } = JSON.parse(body)
+    const delay = await processJob(jobId, context)
+    if (delay !== undefined)
+      await queues.publish({
+        name: 'email-outgoing',
+        payload: { jobId },
+        delaySeconds: Math.ceil(delay / 1000),
+      })
+  }
+}
@@ -11,10 +11,13 @@ import { Issuer } from 'openid-client'
 
 import { getEnvOrDie, sessionSecret } from '~/lib/env.server'
 
+/** The name of the cookie that holds the session ID. */
+export const sessionCookieName = 'session'
+
 // Short-lived session for storing the OIDC state and PKCE code verifier
 export const oidcStorage = createArcTableSessionStorage({
   cookie: {
-    name: 'session',
+    name: sessionCookieName,
     // normally you want this to be `secure: true`
     // but that doesn't work on localhost for Safari
     // https://web.dev/when-to-use-local-https/
@@ -33,7 +36,7 @@ export const oidcStorage = createArcTableSessionStorage({
 // session, so the cookie replaces it (with a longer expiration time).
 export const storage = createArcTableSessionStorage({
   cookie: {
-    name: 'session',
+    name: sessionCookieName,
     // normally you want this to be `secure: true`
     // but that doesn't work on localhost for Safari
     // https://web.dev/when-to-use-local-https/
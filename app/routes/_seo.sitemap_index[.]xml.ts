@@ -6,18 +6,43 @@
  * SPDX-License-Identifier: Apache-2.0
  */
 import { ListObjectsV2Command } from '@aws-sdk/client-s3'
+import memoizee from 'memoizee'
 
 import { staticBucket as Bucket, origin } from '~/lib/env.server'
 import { sitemapIndex } from '~/lib/sitemap.server'
-import { Prefix } from '~/scheduled/circulars/actions/sitemap'
+import {
+  Prefix,
+  getManifest,
+  manifestKey,
+} from '~/scheduled/circulars/actions/sitemap'
 import { s3 } from '~/scheduled/circulars/storage'
 
+/**
+ * Get the circulars sitemaps from the manifest that the scheduled job writes,
+ * or undefined if it has not written one yet. The manifest changes at most
+ * once a day, so it is fetched at most once an hour per warm Lambda instance.
+ */
+const getManifestSitemapEntries = memoizee(
+  async () =>
+    (await getManifest())?.sitemaps.map(({ key, lastModified }) => ({
+      url: `${origin}/_static/${key}`,
+      lastModified,
+    })),
+  { promise: true, maxAge: 3600 * 1000 }
+)
+
 async function getCircularsSitemapEntries() {
+  const entries = await getManifestSitemapEntries()
+  if (entries) return entries
+
+  // Until the scheduled job has written the manifest, list the sitemaps in
+  // the bucket, and do not remember that the manifest was missing.
+  getManifestSitemapEntries.clear()
   const response = await s3.send(new ListObjectsV2Command({ Bucket, Prefix }))
   return (
-    response.Contents?.map(({ Key }) => ({
-      url: `${origin}/_static/${Key}`,
-    })) ?? []
+    response.Contents?.filter(({ Key }) => Key !== manifestKey).map(
+      ({ Key }) => ({ url: `${origin}/_static/${Key}` })
+    ) ?? []
   )
 }
 
@@ -8,14 +8,12 @@
 import { type LoaderFunctionArgs, json } from '@remix-run/node'
 import invariant from 'tiny-invariant'
 
-import { get } from './circulars/circulars.server'
+import { getCircularTooltip } from './tooltips/tooltips.server'
 import { publicStaticShortTermCacheControlHeaders } from '~/lib/headers.server'
 
 export async function loader({ params: { '*': value } }: LoaderFunctionArgs) {
   invariant(value)
-  const { subject, submitter } = await get(parseFloat(value))
-  return json(
-    { subject, submitter },
-    { headers: publicStaticShortTermCacheControlHeaders }
-  )
+  return json(await getCircularTooltip(value), {
+    headers: publicStaticShortTermCacheControlHeaders,
+  })
 }
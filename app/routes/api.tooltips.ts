@@ -0,0 +1,29 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+import { type LoaderFunctionArgs, json } from '@remix-run/node'
+
+import { getTooltips } from './tooltips/tooltips.server'
+import { publicStaticShortTermCacheControlHeaders } from '~/lib/headers.server'
+
+/**
+ * Get the data for many tooltips at once.
+ *
+ * The query string has one parameter per tooltip, named by the tooltip's
+ * data class, such as `?arxiv=2101.00001&circular=12345&tns=2024abc`. The
+ * client sorts the parameters so that the same set of tooltips has the same
+ * URL and can be cached by the CDN.
+ */
+export async function loader({ request }: LoaderFunctionArgs) {
+  const { searchParams } = new URL(request.url)
+  const { tooltips, failed } = await getTooltips([...searchParams])
+  return json(tooltips, {
+    headers: failed
+      ? { 'Cache-Control': 'no-store' }
+      : publicStaticShortTermCacheControlHeaders,
+  })
+}
@@ -6,8 +6,8 @@ import { submitterGroup } from './circulars/circulars.server'
 import type { UserLookup } from '~/components/UserLookup'
 import {
   checkUserIsVerified,
+  listGroupMembers,
   listUsers,
-  listUsersInGroup,
 } from '~/lib/cognito.server'
 import { getFormDataString } from '~/lib/utils'
 
@@ -29,16 +29,13 @@ export async function action({ request }: ActionFunctionArgs) {
       ((filterableGroups.includes(groupFilter) && userIsVerified) ||
         userIsAdmin)
     ) {
-      users = (await listUsersInGroup(groupFilter))
-        .map((x) => {
-          return {
-            sub: x.Attributes?.find((x) => x.Name == 'sub')?.Value,
-            email: x.Attributes?.find((x) => x.Name == 'email')?.Value ?? '',
-            name: x.Attributes?.find((x) => x.Name == 'name')?.Value,
-            affiliation: x.Attributes?.find((x) => x.Name == 'affilitation')
-              ?.Value,
-          }
-        })
+      users = (await listGroupMembers(groupFilter))
+        .map(({ sub, email, name, affiliation }) => ({
+          sub,
+          email,
+          name,
+          affiliation,
+        }))
         .filter(
           ({ name, email }) =>
             email !== undefined &&
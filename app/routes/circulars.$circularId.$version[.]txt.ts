@@ -10,6 +10,7 @@ import invariant from 'tiny-invariant'
 
 import { formatCircularText } from './circulars/circulars.lib'
 import { get } from './circulars/circulars.server'
+import { getCircularCacheHeaders } from './circulars/headers.server'
 import { origin } from '~/lib/env.server'
 import { getCanonicalUrlHeaders } from '~/lib/headers.server'
 
@@ -20,8 +21,12 @@ export async function loader({
   invariant(version)
   const result = await get(parseFloat(circularId), parseFloat(version))
   return new Response(formatCircularText(result), {
-    headers: getCanonicalUrlHeaders(
-      new URL(`/circulars/${circularId}`, origin)
-    ),
+    headers: {
+      ...getCanonicalUrlHeaders(new URL(`/circulars/${circularId}`, origin)),
+      ...getCircularCacheHeaders(result, {
+        versioned: true,
+        withBibcode: false,
+      }),
+    },
   })
 }
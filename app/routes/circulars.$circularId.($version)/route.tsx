@@ -9,19 +9,29 @@ import type { HeadersFunction, LoaderFunctionArgs } from '@remix-run/node'
 import { json } from '@remix-run/node'
 import { Link, useLoaderData, useRouteLoaderData } from '@remix-run/react'
 import { Button, ButtonGroup, CardBody, Icon } from '@trussworks/react-uswds'
+import type { Root } from 'hast'
 import { useRef, useState } from 'react'
 import invariant from 'tiny-invariant'
 import { useOnClickOutside } from 'usehooks-ts'
 
 import type { loader as parentLoader } from '../circulars.$circularId/route'
+import { getCircularBodyHast } from '../circulars/body.server'
 import { get } from '../circulars/circulars.server'
+import { getCircularCacheHeaders } from '../circulars/headers.server'
 import DetailsDropdownButton from '~/components/DetailsDropdownButton'
 import DetailsDropdownContent from '~/components/DetailsDropdownContent'
 import { ToolbarButtonGroup } from '~/components/ToolbarButtonGroup'
-import { MarkdownBody, PlainTextBody } from '~/components/circularDisplay/Body'
+import {
+  MarkdownHastBody,
+  PlainTextHastBody,
+} from '~/components/circularDisplay/Body'
 import { FrontMatter } from '~/components/circularDisplay/FrontMatter'
 import { origin } from '~/lib/env.server'
-import { getCanonicalUrlHeaders, pickHeaders } from '~/lib/headers.server'
+import {
+  anonymousCacheControlHeaders,
+  getCanonicalUrlHeaders,
+  pickHeaders,
+} from '~/lib/headers.server'
 import { useSearchString } from '~/lib/utils'
 import { useModStatus, useSubmitterStatus } from '~/root'
 import type { BreadcrumbHandle } from '~/root/Title'
@@ -39,30 +49,45 @@ export async function loader({
   params: { circularId, version },
 }: LoaderFunctionArgs) {
   invariant(circularId)
-  const result = await get(
+  const circular = await get(
     parseFloat(circularId),
     version ? parseFloat(version) : undefined
   )
+  // Send the rendered body instead of the source, so that neither the server
+  // nor the client has to parse it.
+  const { body, ...result } = circular
+  const hast = await getCircularBodyHast(circular)
 
-  return json(result, {
-    headers: {
-      ...getCanonicalUrlHeaders(new URL(`/circulars/${circularId}`, origin)),
-    },
-  })
+  return json(
+    { ...result, hast },
+    {
+      headers: {
+        ...getCanonicalUrlHeaders(new URL(`/circulars/${circularId}`, origin)),
+        // Only used by data requests. Documents depend on the signed-in user,
+        // so they are only cached for anonymous requests.
+        ...getCircularCacheHeaders(circular, {
+          versioned: Boolean(version),
+          withBibcode: true,
+        }),
+      },
+    }
+  )
 }
 
 export function shouldRevalidate() {
   return true
 }
 
-export const headers: HeadersFunction = ({ loaderHeaders }) =>
-  pickHeaders(loaderHeaders, ['Link'])
+export const headers: HeadersFunction = ({ loaderHeaders }) => ({
+  ...Object.fromEntries(pickHeaders(loaderHeaders, ['Link'])),
+  ...anonymousCacheControlHeaders,
+})
 
 export default function () {
-  const { circularId, body, bibcode, version, format, ...frontMatter } =
+  const { circularId, hast, bibcode, version, format, ...frontMatter } =
     useLoaderData<typeof loader>()
   const searchString = useSearchString()
-  const Body = format === 'text/markdown' ? MarkdownBody : PlainTextBody
+  const Body = format === 'text/markdown' ? MarkdownHastBody : PlainTextHastBody
 
   const result = useRouteLoaderData<typeof parentLoader>(
     'routes/circulars.$circularId'
@@ -143,7 +168,7 @@ export default function () {
       </ToolbarButtonGroup>
       <h1 className="margin-bottom-0">GCN Circular {circularId}</h1>
       <FrontMatter {...frontMatter} />
-      <Body className="margin-y-2">{body}</Body>
+      <Body className="margin-y-2">{hast as Root}</Body>
     </>
   )
 }
@@ -10,6 +10,7 @@ import invariant from 'tiny-invariant'
 
 import { formatCircularJson } from './circulars/circulars.lib'
 import { get } from './circulars/circulars.server'
+import { getCircularCacheHeaders } from './circulars/headers.server'
 import { origin } from '~/lib/env.server'
 import { getCanonicalUrlHeaders } from '~/lib/headers.server'
 
@@ -20,6 +21,10 @@ export async function loader({ params: { circularId } }: LoaderFunctionArgs) {
     headers: {
       'Content-Type': 'application/json; charset=utf-8',
       ...getCanonicalUrlHeaders(new URL(`/circulars/${circularId}`, origin)),
+      ...getCircularCacheHeaders(result, {
+        versioned: false,
+        withBibcode: true,
+      }),
     },
   })
 }
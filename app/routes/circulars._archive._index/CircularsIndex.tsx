@@ -13,17 +13,20 @@ export default function ({
   allItems,
   searchString,
   totalItems,
+  totalIsApproximate,
   query,
 }: {
   allItems: CircularMetadata[]
   searchString: string
   totalItems: number
+  totalIsApproximate?: boolean
   query?: string
 }) {
   return (
     <>
       {query && (
         <h3>
+          {totalIsApproximate && 'More than '}
           {totalItems} result{totalItems != 1 && 's'} found.
         </h3>
       )}
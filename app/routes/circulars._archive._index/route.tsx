@@ -5,7 +5,11 @@
  *
  * SPDX-License-Identifier: Apache-2.0
  */
-import type { ActionFunctionArgs, LoaderFunctionArgs } from '@remix-run/node'
+import type {
+  ActionFunctionArgs,
+  HeadersFunction,
+  LoaderFunctionArgs,
+} from '@remix-run/node'
 import {
   Form,
   Link,
@@ -23,7 +27,7 @@ import {
   createChangeRequest,
   get,
   getChangeRequest,
-  getChangeRequests,
+  getChangeRequestCount,
   moderatorGroup,
   put,
   putVersion,
@@ -39,6 +43,7 @@ import Hint from '~/components/Hint'
 import { ToolbarButtonGroup } from '~/components/ToolbarButtonGroup'
 import PaginationSelectionFooter from '~/components/pagination/PaginationSelectionFooter'
 import { feature, origin } from '~/lib/env.server'
+import { anonymousCacheControlHeaders } from '~/lib/headers.server'
 import { getFormDataString } from '~/lib/utils'
 import { postZendeskRequest } from '~/lib/zendesk.server'
 import { useFeature, useModStatus } from '~/root'
@@ -69,19 +74,25 @@ export async function loader({ request: { url } }: LoaderFunctionArgs) {
   const page = parseInt(searchParams.get('page') || '1')
   const limit = clamp(parseInt(searchParams.get('limit') || '100'), 1, 100)
   const sort = searchParams.get('sort') || 'circularId'
-  const searchFunction = view != 'group' ? search : groupMembersByEventId
-  const results = await searchFunction({
-    query,
-    page: page - 1,
-    limit,
-    startDate,
-    endDate,
-    sort,
-  })
-  const requestedChangeCount = (await getChangeRequests()).length
+  const cursor = searchParams.get('cursor') || undefined
+  const results = isGroupView
+    ? await groupMembersByEventId({ query, page: page - 1, limit })
+    : await search({
+        query,
+        page: page - 1,
+        limit,
+        startDate,
+        endDate,
+        sort,
+        cursor,
+      })
+  const requestedChangeCount = await getChangeRequestCount()
 
   return {
     page,
+    cursor,
+    nextCursor: undefined,
+    totalIsApproximate: false,
     ...results,
     requestedChangeCount,
     limit,
@@ -89,6 +100,10 @@ export async function loader({ request: { url } }: LoaderFunctionArgs) {
   }
 }
 
+// The loader does not depend on the user. Moderators see more controls, but
+// they are signed in, so their pages are not cached.
+export const headers: HeadersFunction = () => anonymousCacheControlHeaders
+
 export async function action({ request }: ActionFunctionArgs) {
   const data = await request.formData()
   const body = getFormDataString(data, 'body')
@@ -187,8 +202,11 @@ export default function () {
   const {
     items,
     page,
+    cursor,
+    nextCursor,
     totalPages,
     totalItems,
+    totalIsApproximate,
     requestedChangeCount,
     limit,
     isGroupView,
@@ -335,17 +353,23 @@ export default function () {
               allItems={allItems as CircularMetadata[]}
               searchString={searchString}
               totalItems={totalItems}
+              totalIsApproximate={totalIsApproximate}
               query={query}
             />
           )}
 
           <PaginationSelectionFooter
             query={query}
+            startDate={startDate}
+            endDate={endDate}
             page={page}
             limit={limit}
             totalPages={totalPages}
             form={formId}
             view={view}
+            sort={searchParams.get('sort') || undefined}
+            cursor={cursor}
+            nextCursor={totalIsApproximate || cursor ? nextCursor : undefined}
           />
         </>
       )}
@@ -8,15 +8,17 @@
 import type { LoaderFunctionArgs } from '@remix-run/node'
 import { Link, useLoaderData, useSearchParams } from '@remix-run/react'
 import { Icon } from '@trussworks/react-uswds'
+import type { Root } from 'hast'
 import invariant from 'tiny-invariant'
 
+import { getCircularBodyHast } from './circulars/body.server'
 import type { Synonym } from './synonyms/synonyms.lib'
 import {
   getAllSynonymMembers,
   getSynonymsBySlug,
 } from './synonyms/synonyms.server'
 import { ToolbarButtonGroup } from '~/components/ToolbarButtonGroup'
-import { PlainTextBody } from '~/components/circularDisplay/Body'
+import { PlainTextHastBody } from '~/components/circularDisplay/Body'
 import { FrontMatter } from '~/components/circularDisplay/FrontMatter'
 import { feature } from '~/lib/env.server'
 import type { BreadcrumbHandle } from '~/root/Title'
@@ -33,7 +35,13 @@ export async function loader({ params: { slug } }: LoaderFunctionArgs) {
   const eventIds = synonyms.map((synonym: Synonym) => {
     return synonym.eventId
   })
-  const members = await getAllSynonymMembers(eventIds)
+  const members = await Promise.all(
+    (await getAllSynonymMembers(eventIds)).map(async (circular) => {
+      const { body, ...member } = circular
+      const hast = await getCircularBodyHast(circular, 'text/plain')
+      return { ...member, hast }
+    })
+  )
 
   return { members, eventIds }
 }
@@ -74,7 +82,10 @@ export default function Group() {
               editedOn={circular.editedOn}
             />
           </div>
-          <PlainTextBody className="margin-2" children={circular.body} />
+          <PlainTextHastBody
+            className="margin-2"
+            children={circular.hast as Root}
+          />
           <hr />
         </div>
       ))}
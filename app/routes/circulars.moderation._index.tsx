@@ -7,7 +7,7 @@
  */
 import type { SEOHandle } from '@nasa-gcn/remix-seo'
 import type { ActionFunctionArgs, LoaderFunctionArgs } from '@remix-run/node'
-import { Form, Link, useLoaderData } from '@remix-run/react'
+import { Form, Link, useLoaderData, useSearchParams } from '@remix-run/react'
 import { Button, Checkbox, Grid } from '@trussworks/react-uswds'
 import { useState } from 'react'
 
@@ -22,6 +22,7 @@ import {
   moderatorGroup,
 } from './circulars/circulars.server'
 import SegmentedCards from '~/components/SegmentedCards'
+import { CursorPagination } from '~/components/pagination/Pagination'
 import { ToolbarButtonGroup } from '~/components/ToolbarButtonGroup'
 import type { BreadcrumbHandle } from '~/root/Title'
 
@@ -33,9 +34,14 @@ export async function loader({ request }: LoaderFunctionArgs) {
   const user = await getUser(request)
   if (!user || !user.groups.includes(moderatorGroup))
     throw new Response(null, { status: 403 })
-  const changeRequests = await getChangeRequests()
+  const { searchParams } = new URL(request.url)
+  const cursor = searchParams.get('cursor') || undefined
+  const { items: changeRequests, nextCursor } = await getChangeRequests({
+    cursor,
+  })
   return {
     changeRequests,
+    nextCursor,
   }
 }
 
@@ -59,7 +65,9 @@ export async function action({ request }: ActionFunctionArgs) {
 }
 
 export default function () {
-  const { changeRequests } = useLoaderData<typeof loader>()
+  const { changeRequests, nextCursor } = useLoaderData<typeof loader>()
+  const [searchParams] = useSearchParams()
+  const page = parseInt(searchParams.get('page') || '1')
   const [selectedCount, setSelectedCount] = useState(0)
 
   function checkboxOnChange(checked: boolean) {
@@ -92,6 +100,9 @@ export default function () {
           ))}
         </SegmentedCards>
       </Form>
+      {(page > 1 || nextCursor) && (
+        <CursorPagination page={page} nextCursor={nextCursor} />
+      )}
     </>
   )
 }
@@ -100,7 +111,10 @@ function CircularChangeRequestRow({
   changeRequest,
   checkboxOnChange,
 }: {
-  changeRequest: CircularChangeRequest
+  changeRequest: Pick<
+    CircularChangeRequest,
+    'circularId' | 'requestorSub' | 'requestor'
+  >
   checkboxOnChange: (checked: boolean) => void
 }) {
   return (
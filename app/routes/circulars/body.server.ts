@@ -0,0 +1,111 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+import {
+  GetObjectCommand,
+  NoSuchKey,
+  PutObjectCommand,
+} from '@aws-sdk/client-s3'
+import type { Root } from 'hast'
+import memoizee from 'memoizee'
+
+import type { Circular, CircularFormat } from './circulars.lib'
+import { bodyToHast } from '~/components/circularDisplay/hast'
+import { Prefix, putParams, s3 } from '~/scheduled/circulars/storage'
+
+/**
+ * Rendered circular bodies.
+ *
+ * A version of a circular never changes, so its body is transformed to a HTML
+ * syntax tree once per circular ID, version, and format. The trees are kept
+ * in an in-memory LRU cache in front of S3, and the circulars table stream
+ * handler writes them to S3 when circulars are created or edited.
+ */
+
+function getKey(circularId: number, version: number, format: CircularFormat) {
+  const extension = format === 'text/markdown' ? 'md' : 'txt'
+  return `${Prefix}/body/${circularId}/${version}.${extension}.json`
+}
+
+async function getStoredBodyHast(Key: string) {
+  try {
+    const { Body } = await s3.send(
+      new GetObjectCommand({ Bucket: putParams.Bucket, Key })
+    )
+    return JSON.parse(await Body!.transformToString()) as Root
+  } catch (e) {
+    if (!(e instanceof NoSuchKey)) console.error(e)
+    return undefined
+  }
+}
+
+async function putStoredBodyHast(Key: string, hast: Root) {
+  await s3.send(
+    new PutObjectCommand({
+      ...putParams,
+      Key,
+      Body: JSON.stringify(hast),
+      ContentType: 'application/json',
+    })
+  )
+}
+
+const getCachedBodyHast = memoizee(
+  async (
+    circularId: number,
+    version: number,
+    format: CircularFormat,
+    body: string
+  ) => {
+    const Key = getKey(circularId, version, format)
+    const stored = await getStoredBodyHast(Key)
+    if (stored) return stored
+
+    const hast = bodyToHast(body, format)
+    try {
+      await putStoredBodyHast(Key, hast)
+    } catch (e) {
+      console.error(e)
+    }
+    return hast
+  },
+  // The body is not part of the key: it is determined by the other arguments.
+  { promise: true, length: 3, primitive: true, max: 1000 }
+)
+
+/**
+ * Get the body of a circular, transformed to a HTML syntax tree for display
+ * in the given format, which defaults to the circular's own format.
+ */
+export async function getCircularBodyHast(
+  { circularId, version = 1, body, ...circular }: Circular,
+  format: CircularFormat = circular.format ?? 'text/plain'
+) {
+  return await getCachedBodyHast(circularId, version, format, body)
+}
+
+/**
+ * Transform the body of a new version of a circular and store it, in all of
+ * the formats in which it may be displayed, so that the first page view does
+ * not have to.
+ */
+export async function putCircularBodyHast({
+  circularId,
+  version = 1,
+  format = 'text/plain',
+  body,
+}: Circular) {
+  const formats = new Set<CircularFormat>([format, 'text/plain'])
+  await Promise.all(
+    [...formats].map((format) =>
+      putStoredBodyHast(
+        getKey(circularId, version, format),
+        bodyToHast(body, format)
+      )
+    )
+  )
+}
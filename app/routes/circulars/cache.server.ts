@@ -0,0 +1,83 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+import { tables } from '@architect/functions'
+import crypto from 'crypto'
+import memoizee from 'memoizee'
+
+import { feature } from '~/lib/env.server'
+
+/**
+ * The key of the item in the circulars_search_cache table that holds the
+ * current cache version. Every cache key includes the version, so bumping it
+ * invalidates all existing entries at once.
+ */
+const versionKey = 'version'
+
+/** How long a warm Lambda may use a cache version before checking again. */
+const versionMaxAge = 10_000
+
+/** How long entries in the shared cache tier live, in seconds. */
+const sharedTtl = 3600
+
+/** Get the current search cache version. */
+export const getSearchCacheVersion = memoizee(
+  async function () {
+    const db = await tables()
+    const item = await db.circulars_search_cache.get({ cacheKey: versionKey })
+    return (item?.version as number | undefined) ?? 0
+  },
+  { promise: true, maxAge: versionMaxAge }
+)
+
+/**
+ * Invalidate all cached search results.
+ *
+ * This is called by the circulars table stream handler whenever a circular is
+ * inserted, modified, or removed.
+ */
+export async function bumpSearchCacheVersion() {
+  const db = await tables()
+  await db.circulars_search_cache.update({
+    Key: { cacheKey: versionKey },
+    UpdateExpression: 'ADD #version :one',
+    ExpressionAttributeNames: { '#version': 'version' },
+    ExpressionAttributeValues: { ':one': 1 },
+  })
+}
+
+function getSharedCacheKey(key: string) {
+  return crypto.createHash('sha256').update(key).digest('base64url')
+}
+
+/**
+ * Look up a value in the shared cache tier, or compute and store it.
+ *
+ * The shared tier is a DynamoDB table that is visible to all Lambda instances.
+ * It is enabled by the CIRCULARS_SEARCH_SHARED_CACHE feature flag; if it is
+ * disabled, then the value is always computed.
+ */
+export async function withSharedCache<T>(
+  key: string,
+  compute: () => Promise<T>
+): Promise<T> {
+  if (!feature('CIRCULARS_SEARCH_SHARED_CACHE')) return await compute()
+
+  const db = await tables()
+  const cacheKey = getSharedCacheKey(key)
+  const item = await db.circulars_search_cache.get({ cacheKey })
+  // DynamoDB may not delete expired items right away, so check the TTL.
+  if (item && item._ttl * 1000 > Date.now()) return JSON.parse(item.result)
+
+  const result = await compute()
+  await db.circulars_search_cache.put({
+    cacheKey,
+    result: JSON.stringify(result),
+    _ttl: Math.ceil(Date.now() / 1000) + sharedTtl,
+  })
+  return result
+}
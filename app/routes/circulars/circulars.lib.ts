@@ -40,6 +40,10 @@ export interface CircularChangeRequest extends CircularMetadata {
   submitter: string
   createdOn: number
   zendeskTicketId: number
+  /** Always 1. Partition key of the queue of pending change requests. */
+  pending?: 1
+  /** When the change request was submitted, in ms since the Unix epoch. */
+  requestedOn?: number
 }
 
 export interface CircularChangeRequestKeys {
@@ -6,12 +6,12 @@
  * SPDX-License-Identifier: Apache-2.0
  */
 import { tables } from '@architect/functions'
-import type { DynamoDB } from '@aws-sdk/client-dynamodb'
 import {
-  type DynamoDBDocument,
-  paginateQuery,
-  paginateScan,
-} from '@aws-sdk/lib-dynamodb'
+  ConditionalCheckFailedException,
+  type DynamoDB,
+  TransactionCanceledException,
+} from '@aws-sdk/client-dynamodb'
+import { type DynamoDBDocument, paginateScan } from '@aws-sdk/lib-dynamodb'
 import { search as getSearch } from '@nasa-gcn/architect-functions-search'
 import {
   DynamoDBAutoIncrement,
@@ -23,6 +23,7 @@ import { dedent } from 'ts-dedent'
 
 import { type User, getUser } from '../_auth/user.server'
 import { tryInitSynonym } from '../synonyms/synonyms.server'
+import { getSearchCacheVersion, withSharedCache } from './cache.server'
 import {
   bodyIsValid,
   formatAuthor,
@@ -39,6 +40,7 @@ import type {
 } from './circulars.lib'
 import { sendEmail, sendEmailBulk } from '~/lib/email.server'
 import { feature, origin } from '~/lib/env.server'
+import { getRecipients } from '~/lib/recipients.server'
 import { closeZendeskTicket } from '~/lib/zendesk.server'
 
 // A type with certain keys required.
@@ -98,9 +100,18 @@ function parseDate(date?: string) {
   return date ? new Date(date).getTime() : NaN
 }
 
+/**
+ * Resolution of relative times such as "1 hour ago."
+ *
+ * Relative times are rounded to this resolution so that repeated searches with
+ * the same fuzzy date range produce the same query, and can share cached
+ * results.
+ */
+const fuzzyTimeResolution = 60_000
+
 /** take input string and return start/end times based on string value */
 function fuzzyTimeRange(fuzzyTime?: string) {
-  const now = Date.now()
+  const now = Math.ceil(Date.now() / fuzzyTimeResolution) * fuzzyTimeResolution
   switch (fuzzyTime) {
     case 'now': // current time
       return now
@@ -135,6 +146,66 @@ function getValidDates(startDate?: string, endDate?: string) {
   return [startTimestamp, endTimestamp]
 }
 
+/**
+ * Maximum number of hits to count exactly.
+ *
+ * This is also the deepest result that may be reached by page number.
+ * Results past this depth may only be reached with a cursor, and the reported
+ * total is a lower bound.
+ */
+export const maxTrackedHits = 10_000
+
+/** Encode the sort values of the last hit as an opaque cursor token. */
+function encodeCursor(sortValues: unknown[]) {
+  return Buffer.from(JSON.stringify(sortValues)).toString('base64url')
+}
+
+/** Decode a cursor token, or throw an HTTP error if it is invalid. */
+function decodeCursor(cursor: string, length: number) {
+  let sortValues
+  try {
+    sortValues = JSON.parse(Buffer.from(cursor, 'base64url').toString())
+  } catch {
+    throw new Response('cursor is invalid', { status: 400 })
+  }
+  if (!Array.isArray(sortValues) || sortValues.length !== length)
+    throw new Response('cursor is invalid', { status: 400 })
+  return sortValues
+}
+
+interface SearchParams {
+  query?: string
+  page?: number
+  limit?: number
+  startTime: number
+  endTime: number
+  sortByRelevance: boolean
+  cursor?: string
+}
+
+interface SearchResults {
+  items: CircularMetadata[]
+  totalPages: number
+  totalItems: number
+  totalIsApproximate: boolean
+  nextCursor?: string
+}
+
+/**
+ * Search results, cached by normalized search parameters.
+ *
+ * The argument is the JSON-serialized cache version and search parameters.
+ * Concurrent identical searches share a single request to OpenSearch.
+ */
+const searchCached = memoizee(
+  async function (key: string) {
+    const { version, ...params }: SearchParams & { version: number } =
+      JSON.parse(key)
+    return await withSharedCache(key, () => searchUncached(params))
+  },
+  { promise: true, primitive: true, max: 256 }
+)
+
 export async function search({
   query,
   page,
@@ -142,6 +213,8 @@ export async function search({
   startDate,
   endDate,
   sort,
+  cursor,
+  cache = true,
 }: {
   query?: string
   page?: number
@@ -149,23 +222,60 @@ export async function search({
   startDate?: string
   endDate?: string
   sort?: string
-}): Promise<{
-  items: CircularMetadata[]
-  totalPages: number
-  totalItems: number
-}> {
+  cursor?: string
+  /** Set to false to bypass the result cache. */
+  cache?: boolean
+}): Promise<SearchResults> {
+  const [startTime, endTime] = getValidDates(startDate, endDate)
+  query = query?.trim() || undefined
+  const params: SearchParams = {
+    query,
+    page: cursor ? undefined : page || undefined,
+    limit,
+    startTime,
+    endTime,
+    sortByRelevance: Boolean(sort === 'relevance' && query),
+    cursor,
+  }
+  if (!cache) return await searchUncached(params)
+  const version = await getSearchCacheVersion()
+  return await searchCached(JSON.stringify({ version, ...params }))
+}
+
+async function searchUncached({
+  query,
+  page,
+  limit,
+  startTime,
+  endTime,
+  sortByRelevance,
+  cursor,
+}: SearchParams): Promise<SearchResults> {
   const client = await getSearch()
 
-  const [startTime, endTime] = getValidDates(startDate, endDate)
+  // Always end with circularId, which is unique, so that the sort order is
+  // stable and the sort values of the last hit identify a position for
+  // search_after.
+  const sortObj = [
+    ...(sortByRelevance ? ['_score'] : []),
+    {
+      circularId: {
+        order: 'desc',
+      },
+    },
+  ]
 
-  const sortObj =
-    sort === 'relevance' && query
-      ? {}
-      : {
-          circularId: {
-            order: 'desc',
-          },
-        }
+  let from
+  let searchAfter
+  if (cursor) {
+    searchAfter = decodeCursor(cursor, sortObj.length)
+  } else {
+    from = page && limit && page * limit
+    if ((from ?? 0) + (limit ?? 10) > maxTrackedHits)
+      throw new Response('page is too deep; use a cursor instead', {
+        status: 400,
+      })
+  }
 
   const queryObj = query
     ? feature('CIRCULARS_LUCENE')
@@ -186,7 +296,7 @@ export async function search({
   const {
     body: {
       hits: {
-        total: { value: totalItems },
+        total: { value: totalItems, relation },
         hits,
       },
     },
@@ -209,9 +319,10 @@ export async function search({
       fields: ['subject'],
       _source: false,
       sort: sortObj,
-      from: page && limit && page * limit,
+      from,
+      search_after: searchAfter,
       size: limit,
-      track_total_hits: true,
+      track_total_hits: maxTrackedHits,
     },
   })
 
@@ -231,8 +342,14 @@ export async function search({
   )
 
   const totalPages = limit ? Math.ceil(totalItems / limit) : 1
-
-  return { items, totalPages, totalItems }
+  const totalIsApproximate = relation === 'gte'
+  const lastHit = hits.at(-1)
+  const nextCursor =
+    lastHit && (!limit || hits.length === limit)
+      ? encodeCursor(lastHit.sort)
+      : undefined
+
+  return { items, totalPages, totalItems, totalIsApproximate, nextCursor }
 }
 
 /** Get a circular by ID. */
@@ -413,13 +530,17 @@ export async function createChangeRequest(
   const circular = (await db.circulars.get({
     circularId: item.circularId,
   })) as Circular
-  await db.circulars_change_requests.put({
-    ...item,
-    requestorSub: user.sub,
-    requestorEmail: user.email,
-    requestor,
-    createdOn: item.createdOn ?? circular.createdOn,
-    submitter: item.submitter ?? circular.submitter,
+  await transactChangeRequest({
+    Put: {
+      ...item,
+      requestorSub: user.sub,
+      requestorEmail: user.email,
+      requestor,
+      createdOn: item.createdOn ?? circular.createdOn,
+      submitter: item.submitter ?? circular.submitter,
+      pending: 1,
+      requestedOn: Date.now(),
+    },
   })
 
   await sendEmail({
@@ -432,23 +553,181 @@ export async function createChangeRequest(
   })
 }
 
+const changeRequestCountKey = { tableName: 'circulars_change_requests' }
+
 /**
- * Get all pending change requests
- * @returns
+ * Put or delete a change request, and adjust the count of pending change
+ * requests in the same transaction.
+ *
+ * The count is only adjusted if the put creates a new change request or if
+ * the delete removes an existing one. If the count has not been initialized
+ * yet, then the change request is written without it, because
+ * {@link getChangeRequestCount} will count it when it initializes the count.
+ */
+async function transactChangeRequest(
+  change:
+    | { Put: CircularChangeRequestKeys & Partial<CircularChangeRequest> }
+    | { Delete: CircularChangeRequestKeys }
+) {
+  const db = await tables()
+  const client = db._doc as unknown as DynamoDBDocument
+  const TableName = db.name('circulars_change_requests')
+
+  try {
+    await client.transactWrite({
+      TransactItems: [
+        'Put' in change
+          ? {
+              Put: {
+                TableName,
+                Item: change.Put,
+                ConditionExpression: 'attribute_not_exists(circularId)',
+              },
+            }
+          : {
+              Delete: {
+                TableName,
+                Key: change.Delete,
+                ConditionExpression: 'attribute_exists(circularId)',
+              },
+            },
+        {
+          Update: {
+            TableName: db.name('auto_increment_metadata'),
+            Key: changeRequestCountKey,
+            UpdateExpression: 'ADD pendingCount :delta',
+            ConditionExpression: 'attribute_exists(pendingCount)',
+            ExpressionAttributeValues: { ':delta': 'Put' in change ? 1 : -1 },
+          },
+        },
+      ],
+    })
+  } catch (e) {
+    if (
+      !(
+        e instanceof TransactionCanceledException &&
+        e.CancellationReasons?.every(({ Code }) =>
+          ['None', 'ConditionalCheckFailed'].includes(Code!)
+        )
+      )
+    )
+      throw e
+
+    // The put replaces an existing change request, the delete removes one
+    // that does not exist, or the count is not initialized. In all of these
+    // cases, the count stays the same.
+    if ('Put' in change) {
+      await db.circulars_change_requests.put(change.Put)
+    } else {
+      await db.circulars_change_requests.delete(change.Delete)
+    }
+  }
+}
+
+/**
+ * Get the number of pending change requests.
+ *
+ * The count is kept in the auto_increment_metadata table and updated along
+ * with the change requests themselves, so normally this is a single GetItem.
+ * The first time that it is called, it counts the change requests with a full
+ * table scan and stores the result.
  */
-export async function getChangeRequests(): Promise<CircularChangeRequest[]> {
+export async function getChangeRequestCount(): Promise<number> {
   const db = await tables()
+  const { pendingCount } =
+    (await db.auto_increment_metadata.get(changeRequestCountKey)) ?? {}
+  if (pendingCount !== undefined) return pendingCount
+
   const client = db._doc as unknown as DynamoDBDocument
   const TableName = db.name('circulars_change_requests')
+  let count = 0
+  for await (const page of paginateScan({ client }, { TableName })) {
+    const items = (page.Items ?? []) as CircularChangeRequest[]
+    count += items.length
+    // Add the index attributes to change requests that predate them, so that
+    // they appear in the moderation queue.
+    await Promise.all(
+      items
+        .filter(({ requestedOn }) => requestedOn === undefined)
+        .map(({ circularId, requestorSub, createdOn }) =>
+          db.circulars_change_requests.update({
+            Key: { circularId, requestorSub },
+            UpdateExpression:
+              'SET #pending = :pending, requestedOn = :requestedOn',
+            ConditionExpression: 'attribute_exists(circularId)',
+            ExpressionAttributeNames: { '#pending': 'pending' },
+            ExpressionAttributeValues: {
+              ':pending': 1,
+              ':requestedOn': createdOn ?? 0,
+            },
+          })
+        )
+    )
+  }
 
-  const pages = paginateScan({ client }, { TableName })
-  const changeRequests: CircularChangeRequest[] = []
-  for await (const page of pages) {
-    const newRequests = page.Items as CircularChangeRequest[]
-    if (newRequests) changeRequests.push(...newRequests)
+  try {
+    await db.auto_increment_metadata.update({
+      Key: changeRequestCountKey,
+      UpdateExpression: 'SET pendingCount = :count',
+      ConditionExpression: 'attribute_not_exists(pendingCount)',
+      ExpressionAttributeValues: { ':count': count },
+    })
+  } catch (e) {
+    if (!(e instanceof ConditionalCheckFailedException)) throw e
+    // Another request initialized the count first.
   }
+  return count
+}
 
-  return changeRequests
+/**
+ * Get a page of pending change requests, oldest first.
+ *
+ * @param limit - The maximum number of change requests to return.
+ * @param cursor - The nextCursor returned with the previous page.
+ */
+export async function getChangeRequests({
+  limit = 100,
+  cursor,
+}: {
+  limit?: number
+  cursor?: string
+} = {}): Promise<{
+  items: Pick<
+    CircularChangeRequest,
+    'circularId' | 'requestorSub' | 'requestor' | 'requestedOn'
+  >[]
+  nextCursor?: string
+}> {
+  const db = await tables()
+  const client = db._doc as unknown as DynamoDBDocument
+
+  let ExclusiveStartKey
+  if (cursor) {
+    const [requestedOn, circularId, requestorSub] = decodeCursor(cursor, 3)
+    ExclusiveStartKey = { pending: 1, requestedOn, circularId, requestorSub }
+  }
+
+  const { Items, LastEvaluatedKey } = await client.query({
+    TableName: db.name('circulars_change_requests'),
+    IndexName: 'changeRequestsByRequestedOn',
+    KeyConditionExpression: '#pending = :pending',
+    ExpressionAttributeNames: { '#pending': 'pending' },
+    ExpressionAttributeValues: { ':pending': 1 },
+    ProjectionExpression: 'circularId, requestorSub, requestor, requestedOn',
+    Limit: limit,
+    ExclusiveStartKey,
+  })
+
+  return {
+    items: (Items ?? []) as CircularChangeRequest[],
+    nextCursor:
+      LastEvaluatedKey &&
+      encodeCursor([
+        LastEvaluatedKey.requestedOn,
+        LastEvaluatedKey.circularId,
+        LastEvaluatedKey.requestorSub,
+      ]),
+  }
 }
 
 /**
@@ -507,11 +786,7 @@ async function deleteChangeRequestRaw(
   circularId: number,
   requestorSub: string
 ) {
-  const db = await tables()
-  await db.circulars_change_requests.delete({
-    circularId,
-    requestorSub,
-  })
+  await transactChangeRequest({ Delete: { circularId, requestorSub } })
 }
 
 /**
@@ -552,8 +827,9 @@ export async function approveChangeRequest(
     eventId: changeRequest.eventId,
   }
 
+  const version = await autoincrementVersion.put(newVersion)
+
   const promises = [
-    autoincrementVersion.put(newVersion),
     deleteChangeRequestRaw(circularId, requestorSub),
     sendEmail({
       to: [changeRequest.requestorEmail],
@@ -565,7 +841,7 @@ export async function approveChangeRequest(
     }),
   ]
 
-  if (redistribute) promises.push(send(newVersion))
+  if (redistribute) promises.push(send({ ...newVersion, version }))
 
   if (changeRequest.zendeskTicketId)
     promises.push(closeZendeskTicket(changeRequest.zendeskTicketId))
@@ -606,52 +882,8 @@ function validateCircular({
     throw new Response('format is invalid', { status: 400 })
 }
 
-async function getEmails() {
-  const db = await tables()
-  const client = db._doc as unknown as DynamoDBDocument
-  const TableName = db.name('circulars_subscriptions')
-  const pages = paginateScan(
-    { client },
-    { AttributesToGet: ['email'], TableName }
-  )
-  const emails: string[] = []
-  for await (const page of pages) {
-    const newEmails = page.Items?.map(({ email }) => email)
-    if (newEmails) emails.push(...newEmails)
-  }
-  return emails
-}
-
-async function getLegacyEmails() {
-  const db = await tables()
-  const client = db._doc as unknown as DynamoDBDocument
-  const TableName = db.name('legacy_users')
-  const pages = paginateQuery(
-    { client },
-    {
-      IndexName: 'legacyReceivers',
-      KeyConditionExpression: 'receive = :receive',
-      ExpressionAttributeValues: {
-        ':receive': 1,
-      },
-      ProjectionExpression: 'email',
-      TableName,
-    }
-  )
-  const emails: string[] = []
-  for await (const page of pages) {
-    const newEmails = page.Items?.map(({ email }) => email)
-    if (newEmails) emails.push(...newEmails)
-  }
-  return emails
-}
-
 export async function send(circular: Circular) {
-  const [emails, legacyEmails] = await Promise.all([
-    getEmails(),
-    getLegacyEmails(),
-  ])
-  const to = [...emails, ...legacyEmails]
+  const to = await getRecipients('circulars')
   await sendEmailBulk({
     fromName,
     to,
@@ -662,5 +894,8 @@ export async function send(circular: Circular) {
       circular.circularId
     }.`,
     topic: 'circulars',
+    // Each version is a separate message, so that redistributing an edited
+    // Circular does not collide with the original.
+    key: `circular-${circular.circularId}-${circular.version ?? 1}`,
   })
 }
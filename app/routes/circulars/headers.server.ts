@@ -0,0 +1,39 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+import type { Circular } from './circulars.lib'
+import {
+  publicRevalidateCacheControlHeaders,
+  publicVersionedCacheControlHeaders,
+} from '~/lib/headers.server'
+
+/**
+ * Get the caching headers for a representation of a circular.
+ *
+ * A URL that names a version of a circular serves content that seldom
+ * changes, so caches may keep it for a while. It is not immutable: a
+ * moderator may delete the circular, and the ADS sync may add or correct its
+ * bibcode without creating a new version. Other URLs serve the latest
+ * version, which caches must revalidate. Either way, the server answers
+ * revalidation with 304 Not Modified when the ETag or Last-Modified date
+ * matches.
+ */
+export function getCircularCacheHeaders(
+  { createdOn, editedOn }: Circular,
+  { versioned, withBibcode }: { versioned: boolean; withBibcode: boolean }
+) {
+  return {
+    ...(versioned
+      ? publicVersionedCacheControlHeaders
+      : publicRevalidateCacheControlHeaders),
+    // Adding a bibcode does not change editedOn, so only representations
+    // without it have a meaningful modification date.
+    ...(withBibcode
+      ? {}
+      : { 'Last-Modified': new Date(editedOn ?? createdOn).toUTCString() }),
+  }
+}
@@ -5,10 +5,12 @@
  *
  * SPDX-License-Identifier: Apache-2.0
  */
+import type { HeadersFunction } from '@remix-run/node'
 import { Link, NavLink, Outlet } from '@remix-run/react'
 import { GridContainer } from '@trussworks/react-uswds'
 
 import { SideNav, SideNavSub } from '~/components/SideNav'
+import { anonymousCacheControlHeaders } from '~/lib/headers.server'
 import { useFeature } from '~/root'
 import type { BreadcrumbHandle } from '~/root/Title'
 
@@ -16,6 +18,8 @@ export const handle: BreadcrumbHandle = {
   breadcrumb: 'Documentation',
 }
 
+export const headers: HeadersFunction = () => anonymousCacheControlHeaders
+
 export default function () {
   return (
     <GridContainer className="usa-section">
@@ -5,15 +5,19 @@
  *
  * SPDX-License-Identifier: Apache-2.0
  */
+import type { HeadersFunction } from '@remix-run/node'
 import { NavLink, Outlet } from '@remix-run/react'
 import { GridContainer } from '@trussworks/react-uswds'
 
 import { SideNav } from '~/components/SideNav'
+import { anonymousCacheControlHeaders } from '~/lib/headers.server'
 import { useFeature } from '~/root'
 import type { BreadcrumbHandle } from '~/root/Title'
 
 export const handle: BreadcrumbHandle = { breadcrumb: 'Missions' }
 
+export const headers: HeadersFunction = () => anonymousCacheControlHeaders
+
 export default function () {
   return (
     <GridContainer className="usa-section">
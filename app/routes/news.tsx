@@ -5,9 +5,14 @@
  *
  * SPDX-License-Identifier: Apache-2.0
  */
+import type { HeadersFunction } from '@remix-run/node'
 import { Outlet } from '@remix-run/react'
 import { GridContainer } from '@trussworks/react-uswds'
 
+import { anonymousCacheControlHeaders } from '~/lib/headers.server'
+
+export const headers: HeadersFunction = () => anonymousCacheControlHeaders
+
 export default function () {
   return (
     <GridContainer className="usa-section">
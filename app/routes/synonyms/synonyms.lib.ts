@@ -14,13 +14,19 @@ export interface Synonym {
   slug: string
 }
 
-/* Layout of materialized view in OpenSearch */
 export interface SynonymGroup {
   synonymId: string
   eventIds: string[]
   slugs: string[]
 }
 
+/* Summary of a Circular that belongs to a synonym group */
+export type SynonymGroupMember = Pick<
+  Circular,
+  'circularId' | 'subject' | 'createdOn' | 'submitter'
+>
+
+/* Layout of materialized view in OpenSearch */
 export interface SynonymGroupWithMembers extends SynonymGroup {
-  members: Circular[]
+  members: SynonymGroupMember[]
 }
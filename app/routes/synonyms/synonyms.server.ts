@@ -8,13 +8,16 @@
 import { tables } from '@architect/functions'
 import { type DynamoDBDocument } from '@aws-sdk/lib-dynamodb'
 import { search as getSearchClient } from '@nasa-gcn/architect-functions-search'
+import { errors } from '@opensearch-project/opensearch'
 import crypto from 'crypto'
 import { slug } from 'github-slugger'
+import memoizee from 'memoizee'
 
 import type { Circular } from '../circulars/circulars.lib'
 import type {
   Synonym,
   SynonymGroup,
+  SynonymGroupMember,
   SynonymGroupWithMembers,
 } from './synonyms.lib'
 
@@ -31,6 +34,56 @@ export async function getSynonymsByUuid(synonymId: string) {
   return Items as Synonym[]
 }
 
+/**
+ * Get the materialized view of a synonym group for the search index, or
+ * undefined if the group has no members.
+ */
+export async function getSynonymGroup(
+  synonymId: string
+): Promise<SynonymGroupWithMembers | undefined> {
+  const synonyms = await getSynonymsByUuid(synonymId)
+  if (synonyms.length > 0) {
+    const eventIds = synonyms.map((synonym) => synonym.eventId)
+    const members = (
+      await Promise.all(eventIds.map(getSynonymGroupMembers))
+    ).flat()
+    return {
+      synonymId,
+      eventIds,
+      slugs: synonyms.map((synonym) => synonym.slug),
+      members: sortSynonymGroupMembers(members),
+    }
+  }
+}
+
+/** Summarize a circular for the materialized view of its synonym group. */
+export function getSynonymGroupMember({
+  circularId,
+  subject,
+  createdOn,
+  submitter,
+}: Circular): SynonymGroupMember {
+  return { circularId, subject, createdOn, submitter }
+}
+
+/** Sort the members of a synonym group in place, by circular ID. */
+export function sortSynonymGroupMembers(members: SynonymGroupMember[]) {
+  return members.sort((a, b) => a.circularId - b.circularId)
+}
+
+async function getSynonymGroupMembers(eventId: string) {
+  const db = await tables()
+  const { Items } = await db.circulars.query({
+    IndexName: 'circularsByEventId',
+    KeyConditionExpression: 'eventId = :eventId',
+    ExpressionAttributeValues: {
+      ':eventId': eventId,
+    },
+    ProjectionExpression: 'circularId, subject, createdOn, submitter',
+  })
+  return Items as SynonymGroupMember[]
+}
+
 export async function getSynonymsBySlug(slug: string) {
   const db = await tables()
   const { Items } = await db.synonyms.query({
@@ -58,6 +111,20 @@ export async function searchSynonymsByEventId({
   totalPages: number
   page: number
 }> {
+  return await searchSynonymGroups({ limit, page, eventId, members: false })
+}
+
+async function searchSynonymGroups({
+  limit,
+  page,
+  eventId,
+  members,
+}: {
+  limit: number
+  page: number
+  eventId?: string
+  members: boolean
+}) {
   const client = await getSearchClient()
   const query: any = {
     bool: {
@@ -94,21 +161,17 @@ export async function searchSynonymsByEventId({
     size: limit,
     body: {
       query,
+      _source: members ? true : { excludes: ['members'] },
     },
   })
 
   const totalPages: number = Math.ceil(totalItems / limit)
   const results = hits.map(
-    ({
-      _source: body,
-    }: {
-      _source: SynonymGroup
-      fields: { eventIds: string[]; synonymId: string; slugs: string[] }
-    }) => body
+    ({ _source: body }: { _source: SynonymGroupWithMembers }) => body
   )
   return {
-    items: results,
-    totalItems,
+    items: results as SynonymGroupWithMembers[],
+    totalItems: totalItems as number,
     totalPages,
     page,
   }
@@ -261,6 +324,99 @@ export async function deleteSynonyms(synonymId: string) {
   await client.batchWrite(params)
 }
 
+/** The search index of distinct event IDs, for autocompletion. */
+export const eventIdsIndex = 'event-ids'
+
+/** Settings and mappings for the event ID suggestion index. */
+export const eventIdsIndexBody = {
+  settings: {
+    analysis: {
+      char_filter: {
+        eventIdSeparators: {
+          type: 'pattern_replace',
+          pattern: '[\\s_-]+',
+          replacement: ' ',
+        },
+      },
+      analyzer: {
+        eventId: {
+          type: 'custom',
+          tokenizer: 'keyword',
+          char_filter: ['eventIdSeparators'],
+          filter: ['lowercase'],
+        },
+      },
+    },
+  },
+  mappings: {
+    properties: {
+      eventId: { type: 'keyword' },
+      suggest: { type: 'completion', analyzer: 'eventId' },
+    },
+  },
+}
+
+/**
+ * Create the event ID suggestion index if it does not exist yet.
+ *
+ * Writing a document to a missing index creates it with dynamic mappings, in
+ * which `suggest` is not a completion field. So the index must be created
+ * with its mappings before it is first written or queried, both in the
+ * sandbox and after the first deploy.
+ */
+export const ensureEventIdsIndex = memoizee(
+  async () => {
+    const client = await getSearchClient()
+    const { body: exists } = await client.indices.exists({
+      index: eventIdsIndex,
+    })
+    if (exists) return
+    try {
+      await client.indices.create({
+        index: eventIdsIndex,
+        body: eventIdsIndexBody,
+      })
+    } catch (e) {
+      // Another function may have created it in the meantime.
+      if (
+        !(
+          e instanceof errors.ResponseError &&
+          e.body?.error?.type === 'resource_already_exists_exception'
+        )
+      )
+        throw e
+    }
+  },
+  { promise: true }
+)
+
+/**
+ * Get the document for an event ID in the suggestion index.
+ *
+ * The completion suggester only matches prefixes, so there is one input for
+ * every word in the event ID. For example, "GRB 230812A" can be found by
+ * typing either "GRB 2308" or "2308".
+ */
+export function getEventIdDocument(eventId: string) {
+  const words = eventId.split(/[\s_-]+/)
+  return { eventId, suggest: words.map((_, i) => words.slice(i).join(' ')) }
+}
+
+/** Return true if any circulars are associated with the event ID. */
+export async function eventIdIsInUse(eventId: string) {
+  const db = await tables()
+  const { Count } = await db.circulars.query({
+    IndexName: 'circularsByEventId',
+    KeyConditionExpression: 'eventId = :eventId',
+    ExpressionAttributeValues: {
+      ':eventId': eventId,
+    },
+    Select: 'COUNT',
+    Limit: 1,
+  })
+  return Count > 0
+}
+
 export async function autoCompleteEventIds({
   query,
 }: {
@@ -268,47 +424,28 @@ export async function autoCompleteEventIds({
 }): Promise<{
   options: string[]
 }> {
-  const cleanedQuery = query.replace('-', ' ')
+  await ensureEventIdsIndex()
   const client = await getSearchClient()
   const {
     body: {
-      hits: { hits },
+      suggest: {
+        eventIds: [{ options }],
+      },
     },
   } = await client.search({
-    index: 'circulars',
+    index: eventIdsIndex,
     body: {
-      query: {
-        bool: {
-          must: [
-            {
-              query_string: {
-                query: `*${cleanedQuery}*`,
-                fields: ['eventId'],
-                fuzziness: 'AUTO',
-              },
-            },
-          ],
+      _source: false,
+      suggest: {
+        eventIds: {
+          prefix: query,
+          completion: { field: 'suggest', size: 10 },
         },
       },
-      fields: ['eventId'],
-      _source: false,
-      from: 0,
-      size: 10,
-      track_total_hits: true,
     },
   })
-  const options = hits.map(
-    ({
-      fields: {
-        eventId: [eventId],
-      },
-    }: {
-      _id: string
-      fields: { eventId: string }
-    }) => eventId
-  )
 
-  return { options }
+  return { options: options.map(({ _id }: { _id: string }) => _id) }
 }
 
 export async function groupMembersByEventId({
@@ -326,23 +463,13 @@ export async function groupMembersByEventId({
   totalItems: number
   totalPages: number
 }> {
-  const searchTerm = eventId || query
-  const searchResults = await searchSynonymsByEventId({
+  const { items, totalItems, totalPages } = await searchSynonymGroups({
     limit,
     page,
-    eventId: searchTerm,
+    eventId: eventId || query,
+    members: true,
   })
-  const groupedItems = searchResults.items.map(async (group) => {
-    const promises = group.eventIds.map((eventId) => getSynonymMembers(eventId))
-    const members = (await Promise.all(promises)).flat()
-    return { ...group, members }
-  })
-  const items = await Promise.all(groupedItems)
-  return {
-    items,
-    totalItems: searchResults.totalItems,
-    totalPages: searchResults.totalPages,
-  }
+  return { items, totalItems, totalPages }
 }
 
 async function getSynonymMembers(eventId: string) {
@@ -0,0 +1,240 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+import { tables } from '@architect/functions'
+
+import { feature } from '~/lib/env.server'
+
+/**
+ * A cached tooltip lookup. The value is null if the upstream service did not
+ * find the object, so that repeated lookups of missing objects are cached
+ * too.
+ */
+export interface TooltipCacheEntry {
+  value: object | null
+  /** Expiration time in milliseconds since the Unix epoch. */
+  expiresOn: number
+}
+
+/** A place to store cached tooltip lookups. */
+export interface TooltipCacheBackend {
+  get(key: string): Promise<TooltipCacheEntry | undefined>
+  put(key: string, entry: TooltipCacheEntry): Promise<void>
+}
+
+/** A cache backend that lives in the memory of one Lambda instance. */
+export class MemoryTooltipCacheBackend implements TooltipCacheBackend {
+  private entries = new Map<string, TooltipCacheEntry>()
+
+  /** @param max The maximum number of entries. */
+  constructor(readonly max = 10_000) {}
+
+  async get(key: string) {
+    const entry = this.entries.get(key)
+    if (!entry) return undefined
+    this.entries.delete(key)
+    if (entry.expiresOn <= Date.now()) return undefined
+    // Move the entry to the end, so that the least recently used entries are
+    // evicted first.
+    this.entries.set(key, entry)
+    return entry
+  }
+
+  async put(key: string, entry: TooltipCacheEntry) {
+    this.entries.delete(key)
+    this.entries.set(key, entry)
+    if (this.entries.size > this.max)
+      this.entries.delete(this.entries.keys().next().value!)
+  }
+}
+
+/** A cache backend that is shared by all Lambda instances. */
+export const dynamoDBTooltipCacheBackend: TooltipCacheBackend = {
+  async get(cacheKey) {
+    const db = await tables()
+    const item = await db.tooltip_cache.get({ cacheKey })
+    // DynamoDB may not delete expired items right away, so check the TTL.
+    if (item && item._ttl * 1000 > Date.now())
+      return { value: JSON.parse(item.value), expiresOn: item._ttl * 1000 }
+  },
+  async put(cacheKey, { value, expiresOn }) {
+    const db = await tables()
+    await db.tooltip_cache.put({
+      cacheKey,
+      value: JSON.stringify(value),
+      _ttl: Math.ceil(expiresOn / 1000),
+    })
+  },
+}
+
+/**
+ * The shared DynamoDB tier is enabled by the TOOLTIP_SHARED_CACHE feature
+ * flag. Otherwise, each Lambda instance has its own cache.
+ */
+let backend: TooltipCacheBackend = feature('TOOLTIP_SHARED_CACHE')
+  ? dynamoDBTooltipCacheBackend
+  : new MemoryTooltipCacheBackend()
+
+/** Replace the cache backend, for example with a stub in tests. */
+export function setTooltipCacheBackend(newBackend: TooltipCacheBackend) {
+  backend = newBackend
+  inFlight.clear()
+}
+
+export interface TooltipCacheCounters {
+  /** Lookups that were answered from the cache. */
+  hits: number
+  /** Lookups that were answered from the cache as not found. */
+  negativeHits: number
+  /** Lookups that waited for an identical lookup that was in progress. */
+  coalesced: number
+  /** Lookups that called the upstream service. */
+  misses: number
+}
+
+const counters = new Map<string, TooltipCacheCounters>()
+
+/** How often to log the counters, in milliseconds. */
+const countersLogInterval = 60_000
+
+let countersLoggedOn = Date.now()
+
+/**
+ * Get the hit and miss counters of this Lambda instance for each source,
+ * since they were last logged.
+ */
+export function getTooltipCacheCounters() {
+  return Object.fromEntries(counters)
+}
+
+/**
+ * Log the counters for each source and reset them.
+ *
+ * Each line is in the CloudWatch embedded metric format, so that CloudWatch
+ * turns the counters into metrics with the source as a dimension.
+ *
+ * @see https://docs.aws.amazon.com/AmazonCloudWatch/latest/monitoring/CloudWatch_Embedded_Metric_Format_Specification.html
+ */
+export function logTooltipCacheCounters() {
+  const Timestamp = Date.now()
+  for (const [source, sourceCounters] of counters)
+    console.log(
+      JSON.stringify({
+        _aws: {
+          Timestamp,
+          CloudWatchMetrics: [
+            {
+              Namespace: 'TooltipCache',
+              Dimensions: [['source']],
+              Metrics: Object.keys(sourceCounters).map((Name) => ({
+                Name,
+                Unit: 'Count',
+              })),
+            },
+          ],
+        },
+        source,
+        ...sourceCounters,
+      })
+    )
+  counters.clear()
+  countersLoggedOn = Timestamp
+}
+
+function count(source: string, counter: keyof TooltipCacheCounters) {
+  let sourceCounters = counters.get(source)
+  if (!sourceCounters) {
+    sourceCounters = { hits: 0, negativeHits: 0, coalesced: 0, misses: 0 }
+    counters.set(source, sourceCounters)
+  }
+  sourceCounters[counter]++
+  // Lambda instances are frozen between requests, so rather than setting a
+  // timer, log the counters during a lookup once the interval has elapsed.
+  if (Date.now() - countersLoggedOn >= countersLogInterval)
+    logTooltipCacheCounters()
+}
+
+export interface TooltipCacheOptions {
+  /** How long to cache a tooltip, in seconds. */
+  ttl: number
+  /** How long to cache the absence of a tooltip, in seconds. */
+  notFoundTtl: number
+}
+
+/** Lookups that are in progress, so that concurrent lookups can share them. */
+const inFlight = new Map<string, Promise<object | null>>()
+
+function notFound(): never {
+  throw new Response(null, { status: 404 })
+}
+
+async function lookUp<T extends object>(
+  key: string,
+  source: string,
+  compute: () => Promise<T>,
+  { ttl, notFoundTtl }: TooltipCacheOptions
+) {
+  let entry
+  try {
+    entry = await backend.get(key)
+  } catch (e) {
+    console.error(e)
+  }
+  if (entry) {
+    count(source, entry.value ? 'hits' : 'negativeHits')
+    return entry.value
+  }
+
+  count(source, 'misses')
+  let value: T | null
+  try {
+    value = await compute()
+  } catch (e) {
+    if (!(e instanceof Response && e.status === 404)) throw e
+    value = null
+  }
+
+  try {
+    await backend.put(key, {
+      value,
+      expiresOn: Date.now() + (value ? ttl : notFoundTtl) * 1000,
+    })
+  } catch (e) {
+    console.error(e)
+  }
+  return value
+}
+
+/**
+ * Look up a tooltip in the cache, or compute and store it.
+ *
+ * The compute function signals that the object was not found by throwing a
+ * 404 response; that outcome is cached as well. Other errors are not cached.
+ * Concurrent lookups of the same key on the same Lambda instance share one
+ * call of the compute function.
+ */
+export async function withTooltipCache<T extends object>(
+  source: string,
+  id: string,
+  compute: () => Promise<T>,
+  options: TooltipCacheOptions
+): Promise<T> {
+  const key = `${source}:${id}`
+  let promise = inFlight.get(key)
+  if (promise) {
+    count(source, 'coalesced')
+  } else {
+    promise = lookUp(key, source, compute, options)
+    inFlight.set(key, promise)
+    promise
+      .finally(() => inFlight.delete(key))
+      .catch(() => {
+        // The caller handles the error.
+      })
+  }
+  return ((await promise) ?? notFound()) as T
+}
@@ -0,0 +1,251 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+import { DOMParser } from '@xmldom/xmldom'
+import { term } from 'lucene'
+
+import { get as getCircular } from '../circulars/circulars.server'
+import { type TooltipCacheOptions, withTooltipCache } from './cache.server'
+import { getEnvOrDie, getEnvOrDieInProduction } from '~/lib/env.server'
+import { throwForStatus } from '~/lib/utils'
+import { stripTags } from '~/lib/utils.server'
+
+const adsTokenTooltip = getEnvOrDieInProduction('ADS_TOKEN_TOOLTIP')
+
+async function getArxivTooltip(value: string) {
+  const url = new URL('https://export.arxiv.org/api/query')
+  url.searchParams.set('id_list', value)
+  const response = await fetch(url)
+
+  throwForStatus(response)
+
+  const text = await response.text()
+  const entry = new DOMParser()
+    .parseFromString(text, 'text/xml')
+    .getElementsByTagName('entry')[0]
+
+  // If arXiv does not find the article, then it still returns an entyr,
+  // although the entry does not contain much. If the id field is missing, then
+  // we report that it was not found.
+  if (!entry.getElementsByTagName('id').length) {
+    throw new Response(null, { status: 404 })
+  }
+
+  const title = entry.getElementsByTagName('title')[0].textContent
+
+  const published = entry.getElementsByTagName('published')[0].textContent
+  const year = published && new Date(published).getFullYear()
+
+  const authorElements = entry.getElementsByTagName('author')
+  let authors = authorElements[0].getElementsByTagName('name')[0].textContent
+  if (authorElements.length > 1) authors += ' et al.'
+
+  return { title, year, authors }
+}
+
+async function getDoiTooltip(value: string) {
+  const url = new URL('https://api.adsabs.harvard.edu/v1/search/query')
+  url.searchParams.set('q', `doi:"${term.escape(value)}"`)
+  url.searchParams.set(
+    'fl',
+    'bibstem,pub,pub_raw,title,first_author,author_count,year'
+  )
+  url.searchParams.set('rows', '1')
+  const response = await fetch(url, {
+    headers: { Authorization: `Bearer ${adsTokenTooltip}` },
+  })
+
+  throwForStatus(response)
+
+  const item:
+    | {
+        bibstem: string[]
+        pub_raw: string
+        title: string[]
+        first_author: string
+        author_count: number
+        year: string
+      }
+    | undefined = (await response.json()).response.docs[0]
+  if (!item) throw new Response(null, { status: 404 })
+
+  let pub = item.pub_raw
+
+  // Replace journal name with journal abbreviation
+  if (item.bibstem[0])
+    pub = `${item.bibstem[0]}${pub.substring(pub.indexOf(','))}`
+
+  // Some articles' records contain markup like `<NUMPAGES>14</NUMPAGES> pp.`
+  // Strip out such tags.
+  pub = stripTags(pub)
+
+  // Abbreviate some common publishing terms
+  pub = pub.replaceAll(' Volume ', ' Vol. ')
+  pub = pub.replaceAll(' Issue ', ' Iss. ')
+
+  let authors = item.first_author
+  if (item.author_count > 1) authors += ' et al.'
+
+  const year = item.year
+  const title = item.title.join(' ')
+
+  return { pub, year, authors, title }
+}
+
+const splitter = /[:.]/
+
+async function getTnsTooltip(value: string) {
+  const tnsBotName = getEnvOrDie('TNS_BOT_NAME')
+  const tnsBotKey = getEnvOrDie('TNS_BOT_KEY')
+  const tnsBotID = getEnvOrDie('TNS_BOT_ID')
+
+  const url = new URL('https://www.wis-tns.org/api/get/object')
+  const formData = new FormData()
+  formData.set('api_key', tnsBotKey)
+  formData.set('data', JSON.stringify({ objname: value }))
+
+  const response = await fetch(url, {
+    headers: {
+      'User-Agent': `tns_marker${JSON.stringify({ tns_id: tnsBotID, type: 'bot', name: tnsBotName })}`,
+    },
+    method: 'POST',
+    body: formData,
+  })
+
+  throwForStatus(response)
+
+  const {
+    objname,
+    name_prefix,
+    ra,
+    dec,
+    internal_names: names,
+  }: {
+    objname: string
+    name_prefix: string
+    ra?: string
+    dec?: string
+    internal_names?: string
+  } = (await response.json()).data.reply
+
+  if (!(ra && dec)) throw new Response(null, { status: 404 })
+
+  return {
+    ra: ra.split(splitter),
+    dec: dec.split(splitter),
+    // Some TNS events have values of `internal_names` that have an orphaned
+    // leading or trailing comma, such as `', PS24brk'`. Strip them out.
+    names: (names || `${name_prefix}${objname}`)
+      .split(/\s*,\s*/)
+      .filter(Boolean),
+  }
+}
+
+const hour = 3600
+const day = 24 * hour
+
+/**
+ * Tooltip data sources backed by external services, and how long to cache
+ * their responses. Articles do not change once they are published. Transient
+ * positions may be refined, and TNS may register an object that was missing,
+ * so TNS lookups are cached for a shorter time.
+ */
+const tooltipSources = {
+  arxiv: { get: getArxivTooltip, ttl: 7 * day, notFoundTtl: hour },
+  doi: { get: getDoiTooltip, ttl: 7 * day, notFoundTtl: hour },
+  tns: { get: getTnsTooltip, ttl: day, notFoundTtl: hour },
+} satisfies Record<
+  string,
+  TooltipCacheOptions & { get: (value: string) => Promise<object> }
+>
+
+export type TooltipSource = keyof typeof tooltipSources
+
+/**
+ * Get the data for a tooltip from an external service, through the tooltip
+ * cache. Throws a 404 response if the object was not found.
+ */
+export async function getTooltip<S extends TooltipSource>(
+  source: S,
+  value: string
+) {
+  const { get, ...options } = tooltipSources[source]
+  return await withTooltipCache(
+    source,
+    value,
+    () => get(value) as ReturnType<(typeof tooltipSources)[S]['get']>,
+    options
+  )
+}
+
+export async function getCircularTooltip(value: string) {
+  const { subject, submitter } = await getCircular(parseFloat(value))
+  return { subject, submitter }
+}
+
+/** The maximum number of tooltips in a batch. */
+export const maxTooltipBatchSize = 100
+
+const batchTooltipSources = new Map<
+  string,
+  (value: string) => Promise<object>
+>([
+  ['arxiv', (value) => getTooltip('arxiv', value)],
+  ['circular', getCircularTooltip],
+  ['doi', (value) => getTooltip('doi', value)],
+  ['tns', (value) => getTooltip('tns', value)],
+])
+
+/**
+ * Get the data for many tooltips at once, given pairs of data class names and
+ * values, such as `['arxiv', '2101.00001']`.
+ *
+ * Returns the data keyed by class name and then by value. The data is null if
+ * the object was not found, and missing if the lookup failed for another
+ * reason, so that the client can try again later. Also returns whether any
+ * lookup failed, in which case the result should not be cached.
+ */
+export async function getTooltips(requests: [string, string][]) {
+  if (requests.length > maxTooltipBatchSize)
+    throw new Response(`At most ${maxTooltipBatchSize} tooltips are allowed`, {
+      status: 400,
+    })
+  for (const [className] of requests)
+    if (!batchTooltipSources.has(className))
+      throw new Response(`Unknown tooltip class: ${className}`, {
+        status: 400,
+      })
+
+  const results = await Promise.allSettled(
+    requests.map(([className, value]) =>
+      batchTooltipSources.get(className)!(value)
+    )
+  )
+  // Values come from the query string, so use objects without prototypes to
+  // prevent keys like `__proto__` from writing through to Object.prototype.
+  const tooltips: Record<
+    string,
+    Record<string, object | null>
+  > = Object.create(null)
+  let failed = false
+  results.forEach((result, i) => {
+    const [className, value] = requests[i]
+    tooltips[className] ??= Object.create(null)
+    if (result.status === 'fulfilled') {
+      tooltips[className][value] = result.value
+    } else {
+      const { reason } = result
+      if (reason instanceof Response && reason.status === 404) {
+        tooltips[className][value] = null
+      } else {
+        console.error(reason)
+        failed = true
+      }
+    }
+  })
+  return { tooltips, failed }
+}
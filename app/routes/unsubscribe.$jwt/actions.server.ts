@@ -9,6 +9,12 @@ import { tables } from '@architect/functions'
 import { paginateQuery } from '@aws-sdk/lib-dynamodb'
 import { type DynamoDBDocument } from '@aws-sdk/lib-dynamodb'
 
+import {
+  type RecipientTopic,
+  deleteRecipient,
+  getRecipientAddresses,
+} from '~/lib/recipients.server'
+
 async function nukeSubscriptions(
   email: string,
   emailKey: string,
@@ -53,26 +59,47 @@ async function nukeSubscriptions(
   await Promise.all(promises)
 }
 
-export const unsubscribeActions = {
-  async circulars(email: string) {
-    await Promise.all([
-      nukeSubscriptions(
-        email,
-        'email',
-        ['email', 'sub'],
-        'circulars_subscriptions'
-      ),
+/**
+ * Unsubscribe an address from a topic that has a materialized recipient list.
+ *
+ * The source tables are keyed by the exact address, so remove the rows of
+ * every spelling of the address that receives the topic. Otherwise, the
+ * recipients job would add the address back from the rows that are left.
+ */
+async function unsubscribeRecipient(
+  topic: RecipientTopic,
+  email: string,
+  subscriptionsTable: string,
+  legacyAttribute: string
+) {
+  const addresses = await getRecipientAddresses(topic, email)
+  const db = await tables()
+  await Promise.all(
+    addresses.flatMap((address) => [
+      nukeSubscriptions(address, 'email', ['email', 'sub'], subscriptionsTable),
       (async () => {
-        const db = await tables()
-        const item = await db.legacy_users.get({ email })
+        const item = await db.legacy_users.get({ email: address })
         if (item)
           await db.legacy_users.update({
-            Key: { email },
-            UpdateExpression: 'set receive = :receive',
-            ExpressionAttributeValues: { ':receive': 0 },
+            Key: { email: address },
+            UpdateExpression: 'set #attribute = :value',
+            ExpressionAttributeNames: { '#attribute': legacyAttribute },
+            ExpressionAttributeValues: { ':value': 0 },
           })
       })(),
     ])
+  )
+  await deleteRecipient(topic, email)
+}
+
+export const unsubscribeActions = {
+  async circulars(email: string) {
+    await unsubscribeRecipient(
+      'circulars',
+      email,
+      'circulars_subscriptions',
+      'receive'
+    )
   },
   async notices(email: string) {
     await Promise.all([
@@ -93,24 +120,11 @@ export const unsubscribeActions = {
     ])
   },
   async announcements(email: string) {
-    await Promise.all([
-      nukeSubscriptions(
-        email,
-        'email',
-        ['email', 'sub'],
-        'announcement_subscriptions'
-      ),
-      (async () => {
-        const db = await tables()
-        const item = await db.legacy_users.get({ email })
-        if (item)
-          await db.legacy_users.update({
-            Key: { email },
-            UpdateExpression:
-              'set receiveAnnouncements = :receiveAnnouncements',
-            ExpressionAttributeValues: { ':receiveAnnouncements': 0 },
-          })
-      })(),
-    ])
+    await unsubscribeRecipient(
+      'announcements',
+      email,
+      'announcement_subscriptions',
+      'receiveAnnouncements'
+    )
   },
 }
@@ -23,7 +23,11 @@ import { getUser, updateSession } from './_auth/user.server'
 import { formatAuthor } from './circulars/circulars.lib'
 import Hint from '~/components/Hint'
 import Spinner from '~/components/Spinner'
-import { cognito, maybeThrow } from '~/lib/cognito.server'
+import {
+  cognito,
+  maybeThrow,
+  updateGroupMemberAttributes,
+} from '~/lib/cognito.server'
 import { getFormDataString } from '~/lib/utils'
 import type { BreadcrumbHandle } from '~/root/Title'
 
@@ -70,6 +74,7 @@ export async function action({ request }: ActionFunctionArgs) {
   } catch (e) {
     maybeThrow(e, 'not saving name and affiliation permanently')
   }
+  await updateGroupMemberAttributes(user.sub, { name, affiliation })
 
   user.name = name
   user.affiliation = affiliation
@@ -6,14 +6,18 @@
  * SPDX-License-Identifier: Apache-2.0
  */
 import { tables } from '@architect/functions'
-import type { DynamoDBDocument } from '@aws-sdk/lib-dynamodb'
-import { paginateQuery, paginateScan } from '@aws-sdk/lib-dynamodb'
 import { dedent } from 'ts-dedent'
 
 import type { User } from '../_auth/user.server'
 import { moderatorGroup } from '../circulars/circulars.server'
 import { announcementAppendedText } from './email_announcements'
 import { sendEmailBulk } from '~/lib/email.server'
+import {
+  addRecipient,
+  getRecipients,
+  getSubscriptionRecipientSource,
+  removeRecipient,
+} from '~/lib/recipients.server'
 
 export async function createAnnouncementSubsciption(
   sub: string,
@@ -26,6 +30,11 @@ export async function createAnnouncementSubsciption(
     email,
     created,
   })
+  await addRecipient(
+    'announcements',
+    email,
+    getSubscriptionRecipientSource(sub)
+  )
 }
 
 export async function getAnnouncementSubscription(sub: string) {
@@ -55,6 +64,11 @@ export async function deleteAnnouncementSubscription(
     sub,
     email,
   })
+  await removeRecipient(
+    'announcements',
+    email,
+    getSubscriptionRecipientSource(sub)
+  )
 }
 
 export async function sendAnnouncementEmail(
@@ -65,10 +79,7 @@ export async function sendAnnouncementEmail(
   if (!user?.groups.includes(moderatorGroup))
     throw new Response(null, { status: 403 })
 
-  const [emails, legacyEmails] = await Promise.all([
-    getAnnouncementReceiverEmails(),
-    getLegacyAnnouncementReceiverEmails(),
-  ])
+  const to = await getRecipients('announcements')
 
   const formattedBody = dedent`
   ${body}
@@ -79,50 +90,9 @@ export async function sendAnnouncementEmail(
 
   await sendEmailBulk({
     fromName: 'GCN Announcements',
-    to: [...emails, ...legacyEmails],
+    to,
     subject,
     body: formattedBody,
     topic: 'announcements',
   })
 }
-
-async function getAnnouncementReceiverEmails() {
-  const db = await tables()
-  const client = db._doc as unknown as DynamoDBDocument
-  const TableName = db.name('announcement_subscriptions')
-
-  const pages = paginateScan(
-    { client },
-    { AttributesToGet: ['email'], TableName }
-  )
-  const emails: string[] = []
-  for await (const page of pages) {
-    const newEmails = page.Items?.map(({ email }) => email)
-    if (newEmails) emails.push(...newEmails)
-  }
-  return emails
-}
-
-async function getLegacyAnnouncementReceiverEmails() {
-  const db = await tables()
-  const client = db._doc as unknown as DynamoDBDocument
-  const TableName = db.name('legacy_users')
-  const pages = paginateQuery(
-    { client },
-    {
-      IndexName: 'legacyAnnouncementReceivers',
-      KeyConditionExpression: 'receiveAnnouncements = :receiveAnnouncements',
-      ExpressionAttributeValues: {
-        ':receiveAnnouncements': 1,
-      },
-      ProjectionExpression: 'email',
-      TableName,
-    }
-  )
-  const emails: string[] = []
-  for await (const page of pages) {
-    const newEmails = page.Items?.map(({ email }) => email)
-    if (newEmails) emails.push(...newEmails)
-  }
-  return emails
-}
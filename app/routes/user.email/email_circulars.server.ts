@@ -7,6 +7,12 @@
  */
 import { tables } from '@architect/functions'
 
+import {
+  addRecipient,
+  getSubscriptionRecipientSource,
+  removeRecipient,
+} from '~/lib/recipients.server'
+
 export async function createCircularEmailNotification(
   sub: string,
   email: string
@@ -18,6 +24,7 @@ export async function createCircularEmailNotification(
     email,
     created,
   })
+  await addRecipient('circulars', email, getSubscriptionRecipientSource(sub))
 }
 
 export async function getUsersCircularSubmissionStatus(sub: string) {
@@ -66,4 +73,9 @@ export async function deleteCircularEmailNotification(
     sub,
     email,
   })
+  await removeRecipient(
+    'circulars',
+    email,
+    getSubscriptionRecipientSource(sub)
+  )
 }
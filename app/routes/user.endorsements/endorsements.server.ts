@@ -6,22 +6,15 @@
  * SPDX-License-Identifier: Apache-2.0
  */
 import { tables } from '@architect/functions'
-import {
-  AdminAddUserToGroupCommand,
-  AdminListGroupsForUserCommand,
-} from '@aws-sdk/client-cognito-identity-provider'
 import type { DynamoDBDocument } from '@aws-sdk/lib-dynamodb'
 import { dedent } from 'ts-dedent'
 
 import { clearUserToken, getUser } from '../_auth/user.server'
 import { submitterGroup } from '../circulars/circulars.server'
 import {
-  cognito,
-  extractAttribute,
-  extractAttributeRequired,
-  getCognitoUserFromSub,
-  listUsersInGroup,
-  maybeThrow,
+  addUserToGroup,
+  getGroupMember,
+  listGroupMembers,
 } from '~/lib/cognito.server'
 import { sendEmail } from '~/lib/email.server'
 import { origin } from '~/lib/env.server'
@@ -96,21 +89,13 @@ export class EndorsementsServer {
         }
       )
 
-    const user = await getCognitoUserFromSub(endorserSub)
-
-    const { Groups } = await cognito.send(
-      new AdminListGroupsForUserCommand({
-        Username: user.Username,
-        UserPoolId: process.env.COGNITO_USER_POOL_ID,
-      })
-    )
-
-    if (!Groups?.find(({ GroupName }) => GroupName === submitterGroup))
+    const endorser = await getGroupMember(submitterGroup, endorserSub)
+    if (!endorser)
       throw new Response('User is not in the submitters group', {
         status: 400,
       })
 
-    const endorserEmail = extractAttributeRequired(user.Attributes, 'email')
+    const endorserEmail = endorser.email
 
     const db = await tables()
 
@@ -219,7 +204,7 @@ export class EndorsementsServer {
 
     if (status === 'approved') {
       promiseArray.push(
-        this.#addUserToGroup(requestorSub),
+        addUserToGroup(requestorSub, submitterGroup),
         clearUserToken(requestorSub)
       )
       requestorMessage +=
@@ -346,52 +331,14 @@ export class EndorsementsServer {
 
     return users.filter(({ sub }) => !excludedSubs.has(sub))
   }
-
-  /**
-   * Adds a user to the circulars submitters group
-   *
-   * Throws an HTTP error if:
-   *  - The provided sub does not correspond to an existing user
-   *
-   * @param sub - sub of another user
-   */
-  async #addUserToGroup(sub: string) {
-    const { Username } = await getCognitoUserFromSub(sub)
-
-    await cognito.send(
-      new AdminAddUserToGroupCommand({
-        Username,
-        UserPoolId: process.env.COGNITO_USER_POOL_ID,
-        GroupName: submitterGroup,
-      })
-    )
-  }
 }
 
 async function getUsersInGroup(): Promise<EndorsementUser[]> {
-  let users
-  try {
-    users = await listUsersInGroup(submitterGroup)
-  } catch (error) {
-    maybeThrow(error, 'returning fake users')
-    return [
-      {
-        sub: crypto.randomUUID(),
-        email: 'a.einstein@example.com',
-        name: 'Albert Einstein',
-      },
-      {
-        sub: crypto.randomUUID(),
-        email: 'c.sagan@example.com',
-        name: 'Carl Sagan',
-      },
-    ]
-  }
-
-  return users.map(({ Attributes }) => ({
-    sub: extractAttributeRequired(Attributes, 'sub'),
-    email: extractAttributeRequired(Attributes, 'email'),
-    name: extractAttribute(Attributes, 'name'),
-    affiliation: extractAttribute(Attributes, 'custom:affiliation'),
+  const members = await listGroupMembers(submitterGroup)
+  return members.map(({ sub, email, name, affiliation }) => ({
+    sub,
+    email,
+    name,
+    affiliation,
   }))
 }
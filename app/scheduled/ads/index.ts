@@ -7,6 +7,7 @@
  */
 import { tables } from '@architect/functions'
 import { ConditionalCheckFailedException } from '@aws-sdk/client-dynamodb'
+import { type DynamoDBDocument, paginateScan } from '@aws-sdk/lib-dynamodb'
 
 import { getEnvOrDie } from '~/lib/env.server'
 
@@ -41,8 +42,29 @@ async function* getAdsEntries() {
   } while (length)
 }
 
+/** Get a snapshot of the bibcodes that are already in the database. */
+async function getKnownBibcodes() {
+  const db = await tables()
+  const client = db._doc as unknown as DynamoDBDocument
+  const pages = paginateScan(
+    { client },
+    {
+      TableName: db.name('circulars'),
+      ProjectionExpression: 'circularId, bibcode',
+    }
+  )
+  const bibcodes = new Map<number, string | undefined>()
+  for await (const page of pages) {
+    for (const { circularId, bibcode } of page.Items ?? [])
+      bibcodes.set(circularId, bibcode)
+  }
+  return bibcodes
+}
+
 export async function handler() {
   const db = await tables()
+  const knownBibcodes = await getKnownBibcodes()
+  const counts = { added: 0, changed: 0, unchanged: 0, missing: 0 }
   const seenCircularIds = new Set<number>()
   for await (const entries of getAdsEntries()) {
     await Promise.all(
@@ -56,20 +78,44 @@ export async function handler() {
           return result
         })
         .map(async ({ bibcode, circularId }) => {
+          const knownBibcode = knownBibcodes.get(circularId)
+          if (!knownBibcodes.has(circularId)) {
+            console.error(
+              `Attempted to update Circular ${circularId}, which does not exist in DynamoDB`
+            )
+            counts.missing++
+            return
+          } else if (knownBibcode === bibcode) {
+            counts.unchanged++
+            return
+          }
+
+          // Only write if the bibcode is new or different, because every
+          // write triggers the circulars table stream.
           try {
             await db.circulars.update({
-              ConditionExpression: 'attribute_exists(circularId)',
+              ConditionExpression:
+                'attribute_exists(circularId) AND (attribute_not_exists(bibcode) OR bibcode <> :bibcode)',
               ExpressionAttributeValues: {
                 ':bibcode': bibcode,
               },
               Key: { circularId },
               UpdateExpression: 'set bibcode = :bibcode',
+              ReturnValuesOnConditionCheckFailure: 'ALL_OLD',
             })
+            counts[knownBibcode ? 'changed' : 'added']++
           } catch (e) {
             if (e instanceof ConditionalCheckFailedException) {
-              console.error(
-                `Attempted to update Circular ${circularId}, which does not exist in DynamoDB`
-              )
+              // The circular was deleted or was given this bibcode since we
+              // took the snapshot.
+              if (e.Item) {
+                counts.unchanged++
+              } else {
+                console.error(
+                  `Attempted to update Circular ${circularId}, which does not exist in DynamoDB`
+                )
+                counts.missing++
+              }
             } else {
               throw e
             }
@@ -77,4 +123,8 @@ export async function handler() {
         })
     )
   }
+  console.log(
+    `Bibcodes added: ${counts.added}, changed: ${counts.changed}, unchanged: ${counts.unchanged}, missing circulars: ${counts.missing}`
+  )
+  return counts
 }
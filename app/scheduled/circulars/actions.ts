@@ -6,36 +6,143 @@
  * SPDX-License-Identifier: Apache-2.0
  */
 import { tables } from '@architect/functions'
-import type { DynamoDBDocument } from '@aws-sdk/lib-dynamodb'
+import type {
+  BatchGetCommandInput,
+  DynamoDBDocument,
+} from '@aws-sdk/lib-dynamodb'
 import { paginateScan } from '@aws-sdk/lib-dynamodb'
+import chunk from 'lodash/chunk'
+import sortBy from 'lodash/sortBy'
 
 import type { Circular } from '~/routes/circulars/circulars.lib'
 
 export interface CircularAction<T = any> {
   initialize: () => T | Promise<T>
+  /**
+   * Process a page of circulars. Pages arrive in no particular order, but
+   * calls for the same action never overlap. The action must not modify the
+   * array, because it is shared with the other actions.
+   */
   action: (circulars: Circular[], context: T) => void | Promise<void>
   finalize: (context: T) => void | Promise<void>
 }
 
+/** Number of scan segments to read concurrently. */
+const totalSegments = 8
+
+/**
+ * Number of pages that each segment may read ahead of the slowest action
+ * before it waits.
+ */
+const readAhead = 2
+
+export interface ScanSegmentMetrics {
+  segment: number
+  pages: number
+  items: number
+  capacityUnits: number
+  milliseconds: number
+}
+
+/**
+ * Run actions on every circular.
+ *
+ * The table is read with a parallel scan of {@link totalSegments} segments.
+ * Each action has its own queue, so a slow action only holds back the
+ * segments once they are {@link readAhead} pages ahead of it.
+ *
+ * @returns Throughput and consumed read capacity for each scan segment.
+ */
 export async function forAllCirculars(...actions: CircularAction[]) {
   const contexts = await Promise.all(
     actions.map((action) => action.initialize())
   )
-  for await (const circulars of getAllRecords()) {
-    await Promise.all(
-      actions.map(({ action }, i) => action(circulars, contexts[i]))
+  const queues = actions.map(() => Promise.resolve())
+
+  function processPage(circulars: Circular[]) {
+    return Promise.all(
+      actions.map(({ action }, i) => {
+        queues[i] = queues[i].then(() => action(circulars, contexts[i]))
+        return queues[i]
+      })
     )
   }
+
+  async function processSegment(segment: number) {
+    const metrics: ScanSegmentMetrics = {
+      segment,
+      pages: 0,
+      items: 0,
+      capacityUnits: 0,
+      milliseconds: 0,
+    }
+    const start = Date.now()
+    const pending: Promise<unknown>[] = []
+    for await (const { Items, ConsumedCapacity } of getSegmentPages(segment)) {
+      const circulars = Items as Circular[]
+      metrics.pages += 1
+      metrics.items += circulars.length
+      metrics.capacityUnits += ConsumedCapacity?.CapacityUnits ?? 0
+      pending.push(processPage(circulars))
+      if (pending.length > readAhead) await pending.shift()
+    }
+    await Promise.all(pending)
+    metrics.milliseconds = Date.now() - start
+    return metrics
+  }
+
+  const metrics = await Promise.all(
+    Array.from({ length: totalSegments }, (_, segment) =>
+      processSegment(segment)
+    )
+  )
   await Promise.all(actions.map(({ finalize }, i) => finalize(contexts[i])))
+
+  for (const segmentMetrics of metrics) {
+    const { segment, pages, items, capacityUnits, milliseconds } =
+      segmentMetrics
+    const rate = Math.round((1000 * items) / Math.max(milliseconds, 1))
+    console.log(
+      `Scan segment ${segment}: ${items} items in ${pages} pages, ${capacityUnits} RCU, ${milliseconds} ms, ${rate} items/s`
+    )
+  }
+  return metrics
+}
+
+async function* getSegmentPages(Segment: number) {
+  const db = await tables()
+  const client = db._doc as unknown as DynamoDBDocument
+  const TableName = db.name('circulars')
+  yield* paginateScan(
+    { client },
+    {
+      TableName,
+      Segment,
+      TotalSegments: totalSegments,
+      ReturnConsumedCapacity: 'TOTAL',
+    }
+  )
 }
 
-async function* getAllRecords() {
+/** Get circulars by ID, sorted by ID. Missing circulars are skipped. */
+export async function getCircularsById(circularIds: number[]) {
   const db = await tables()
   const client = db._doc as unknown as DynamoDBDocument
   const TableName = db.name('circulars')
-  const pages = paginateScan({ client }, { TableName })
+  const circulars: Circular[] = []
 
-  for await (const page of pages) {
-    yield page.Items as Circular[]
+  for (const ids of chunk(circularIds, 100)) {
+    let RequestItems: BatchGetCommandInput['RequestItems'] = {
+      [TableName]: { Keys: ids.map((circularId) => ({ circularId })) },
+    }
+    while (RequestItems && Object.keys(RequestItems).length) {
+      const { Responses, UnprocessedKeys } = await client.batchGet({
+        RequestItems,
+      })
+      circulars.push(...((Responses?.[TableName] ?? []) as Circular[]))
+      RequestItems = UnprocessedKeys
+    }
   }
+
+  return sortBy(circulars, 'circularId')
 }
@@ -5,52 +5,146 @@
  *
  * SPDX-License-Identifier: Apache-2.0
  */
-import { PutObjectCommand } from '@aws-sdk/client-s3'
+import {
+  DeleteObjectCommand,
+  GetObjectCommand,
+  NoSuchKey,
+  PutObjectCommand,
+} from '@aws-sdk/client-s3'
+import { createHash } from 'node:crypto'
 
 import type { CircularAction } from '../actions'
 import { Prefix as parentPrefix, putParams, s3 } from '../storage'
-import { origin } from '~/lib/env.server'
-import { maxEntriesPerSitemap, sitemap } from '~/lib/sitemap.server'
-import type { Circular } from '~/routes/circulars/circulars.lib'
+import { staticBucket as Bucket, origin } from '~/lib/env.server'
+import { sitemap } from '~/lib/sitemap.server'
 
-type SitemapContext = {
-  items: Circular[]
-  page: number
-}
+/**
+ * Number of consecutive circular IDs in each sitemap. This must not be more
+ * than the maximum number of URLs in a sitemap.
+ */
+const circularsPerSitemap = 10_000
+
+/** A map from sitemap numbers to maps from circular IDs to modified dates. */
+type SitemapContext = Map<number, Map<number, number>>
 
 export const Prefix = `${parentPrefix}/sitemap`
 
-async function flush(context: SitemapContext) {
-  const Key = `${Prefix}/${context.page}.xml`
-  const response = sitemap(
-    context.items.map(({ circularId }) => `${origin}/circulars/${circularId}`)
-  )
-  const Body = await response.text()
-  await s3.send(
-    new PutObjectCommand({
-      Body,
-      Key,
-      ContentType: response.headers.get('Content-Type')!,
-      ...putParams,
-    })
-  )
-  context.items.length = 0
-  context.page += 1
+export const manifestKey = `${Prefix}/manifest.json`
+
+export interface SitemapManifestEntry {
+  key: string
+  /** Hash of the circular IDs and modified dates in the sitemap. */
+  fingerprint: string
+  /** The latest modified date of any circular in the sitemap. */
+  lastModified: number
+}
+
+export interface SitemapManifest {
+  sitemaps: SitemapManifestEntry[]
+}
+
+/** Read the sitemap manifest, or return undefined if there is none yet. */
+export async function getManifest(): Promise<SitemapManifest | undefined> {
+  try {
+    const { Body } = await s3.send(
+      new GetObjectCommand({ Bucket, Key: manifestKey })
+    )
+    return JSON.parse(await Body!.transformToString())
+  } catch (e) {
+    if (e instanceof NoSuchKey) return undefined
+    throw e
+  }
+}
+
+function sortByCircularId(lastModified: Map<number, number>) {
+  return [...lastModified].sort(([a], [b]) => a - b)
 }
 
+function getFingerprint(lastModified: Map<number, number>) {
+  const hash = createHash('sha1')
+  for (const [circularId, date] of sortByCircularId(lastModified))
+    hash.update(`${circularId} ${date}\n`)
+  return hash.digest('hex')
+}
+
+/**
+ * Write sitemaps of the circulars, with one sitemap for each range of
+ * {@link circularsPerSitemap} circular IDs.
+ *
+ * Only sitemaps whose circulars were added, edited, or deleted since the last
+ * run are rewritten. The manifest lists every sitemap and when it was last
+ * modified, so that the sitemap index does not have to list the bucket.
+ */
 export const sitemapAction: CircularAction<SitemapContext> = {
   initialize() {
-    return { items: [], page: 0 }
+    return new Map()
   },
-  async action(newItems, context) {
-    do {
-      const count = maxEntriesPerSitemap - context.items.length
-      context.items.push(...newItems.slice(0, count))
-      newItems.splice(0, count)
-      if (context.items.length >= maxEntriesPerSitemap) await flush(context)
-    } while (newItems.length)
+  action(circulars, context) {
+    for (const { circularId, createdOn, editedOn } of circulars) {
+      const page = Math.floor(circularId / circularsPerSitemap)
+      let lastModified = context.get(page)
+      if (!lastModified) {
+        lastModified = new Map()
+        context.set(page, lastModified)
+      }
+      lastModified.set(circularId, editedOn ?? createdOn)
+    }
   },
   async finalize(context) {
-    if (context.items.length) await flush(context)
+    const oldSitemaps = new Map(
+      ((await getManifest())?.sitemaps ?? []).map((entry) => [entry.key, entry])
+    )
+    const sitemaps: SitemapManifestEntry[] = []
+    let changed = false
+
+    for (const page of [...context.keys()].sort((a, b) => a - b)) {
+      const lastModified = context.get(page)!
+      const Key = `${Prefix}/${page}.xml`
+      const fingerprint = getFingerprint(lastModified)
+      const oldSitemap = oldSitemaps.get(Key)
+      oldSitemaps.delete(Key)
+
+      if (oldSitemap?.fingerprint === fingerprint) {
+        sitemaps.push(oldSitemap)
+        continue
+      }
+
+      const response = sitemap(
+        sortByCircularId(lastModified).map(([circularId, date]) => ({
+          url: `${origin}/circulars/${circularId}`,
+          lastModified: date,
+        }))
+      )
+      await s3.send(
+        new PutObjectCommand({
+          Body: await response.text(),
+          Key,
+          ContentType: response.headers.get('Content-Type')!,
+          ...putParams,
+        })
+      )
+      sitemaps.push({
+        key: Key,
+        fingerprint,
+        lastModified: Math.max(...lastModified.values()),
+      })
+      changed = true
+    }
+
+    // Remove sitemaps whose circulars have all been deleted.
+    for (const { key } of oldSitemaps.values()) {
+      await s3.send(new DeleteObjectCommand({ Bucket, Key: key }))
+      changed = true
+    }
+
+    if (changed)
+      await s3.send(
+        new PutObjectCommand({
+          Body: JSON.stringify({ sitemaps } satisfies SitemapManifest),
+          Key: manifestKey,
+          ContentType: 'application/json',
+          ...putParams,
+        })
+      )
   },
 }
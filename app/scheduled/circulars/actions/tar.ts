@@ -5,14 +5,24 @@
  *
  * SPDX-License-Identifier: Apache-2.0
  */
+import {
+  DeleteObjectCommand,
+  GetObjectCommand,
+  NoSuchKey,
+  PutObjectCommand,
+} from '@aws-sdk/client-s3'
 import { Upload } from '@aws-sdk/lib-storage'
+import { createHash } from 'node:crypto'
 import { basename } from 'node:path'
+import type { Readable } from 'node:stream'
 import { PassThrough } from 'node:stream'
-import { createGzip } from 'node:zlib'
-import type { Pack } from 'tar-stream'
+import { buffer } from 'node:stream/consumers'
+import { pipeline } from 'node:stream/promises'
+import { gzipSync } from 'node:zlib'
 import { pack as tarPack } from 'tar-stream'
 
 import type { CircularAction } from '../actions'
+import { getCircularsById } from '../actions'
 import { Prefix, putParams, s3 } from '../storage'
 import { staticBucket as Bucket, region } from '~/lib/env.server'
 import type { Circular } from '~/routes/circulars/circulars.lib'
@@ -23,6 +33,15 @@ import {
 
 const archiveSuffix = '.tar.gz'
 
+/** Number of consecutive circular IDs in each shard of the archive. */
+const shardSize = 1000
+
+/**
+ * The end-of-archive marker of a tarball (two empty 512-byte records), as a
+ * gzip member of its own.
+ */
+const endOfArchive = gzipSync(Buffer.alloc(1024))
+
 export function getBucketKey(suffix: string) {
   return `${Prefix}/archive.${suffix}${archiveSuffix}`
 }
@@ -35,39 +54,201 @@ export function getArchiveURL(suffix: string) {
   return getBucketUrl(region, Bucket, getBucketKey(suffix))
 }
 
+export function getManifestKey(suffix: string) {
+  return `${Prefix}/archive.${suffix}/manifest.json`
+}
+
+function getShardKey(suffix: string, first: number, last: number) {
+  return `${Prefix}/archive.${suffix}/${first}-${last}${archiveSuffix}`
+}
+
+/**
+ * A tarball containing the circulars with IDs from `first` to `last`.
+ *
+ * Each shard is stored as two gzip members: the first holds the tar entries,
+ * and the second holds the end-of-archive marker. The combined archive is
+ * the concatenation of the first member of every shard, followed by one
+ * end-of-archive marker, so it can be assembled without recompressing.
+ */
+export interface ArchiveShard {
+  key: string
+  first: number
+  last: number
+  count: number
+  /** Hash of the formatted contents of all of the circulars in the shard. */
+  fingerprint: string
+  /** Size in bytes of the shard's first gzip member. */
+  entriesSize: number
+  updatedOn: number
+}
+
+export interface ArchiveManifest {
+  /** The shards, sorted by circular ID. */
+  shards: ArchiveShard[]
+}
+
+async function getManifest(Key: string): Promise<ArchiveManifest> {
+  try {
+    const { Body } = await s3.send(new GetObjectCommand({ Bucket, Key }))
+    return JSON.parse(await Body!.transformToString())
+  } catch (e) {
+    if (e instanceof NoSuchKey) return { shards: [] }
+    throw e
+  }
+}
+
+function hash(data: string) {
+  return createHash('sha1').update(data).digest('hex')
+}
+
+/** Get the combined hash of a map from circular IDs to content hashes. */
+function getFingerprint(hashes: Map<number, string>) {
+  return hash(
+    [...hashes]
+      .sort(([a], [b]) => a - b)
+      .map(([circularId, digest]) => `${circularId} ${digest}\n`)
+      .join('')
+  )
+}
+
+/** Create the tar entries of a shard, without the end-of-archive marker. */
+async function packEntries(
+  tarDir: string,
+  suffix: string,
+  formatter: (circular: Circular) => string,
+  circulars: Circular[]
+) {
+  const pack = tarPack()
+  for (const circular of circulars) {
+    const name = `${tarDir}/${circular.circularId}.${suffix}`
+    pack.entry({ name }, formatter(circular)).end()
+  }
+  pack.finalize()
+  const tar = await buffer(pack)
+  return gzipSync(tar.subarray(0, tar.length - 1024))
+}
+
+/**
+ * Upload the combined archive by concatenating the tar entries of each
+ * shard, which are already compressed.
+ */
+async function uploadCombinedArchive(Key: string, shards: ArchiveShard[]) {
+  const Body = new PassThrough()
+  const promise = new Upload({
+    client: s3,
+    params: {
+      Body,
+      Key,
+      ContentType: 'application/gzip',
+      ...putParams,
+    },
+  }).done()
+  for (const { key, entriesSize } of shards) {
+    const { Body: shardBody } = await s3.send(
+      new GetObjectCommand({
+        Bucket,
+        Key: key,
+        Range: `bytes=0-${entriesSize - 1}`,
+      })
+    )
+    await pipeline(shardBody as Readable, Body, { end: false })
+  }
+  Body.end(endOfArchive)
+  await promise
+}
+
+/**
+ * Keep an archive of all circulars as a tarball, as well as sharded by
+ * ranges of circular IDs.
+ *
+ * While scanning the table, this only hashes the formatted circulars. Shards
+ * whose hashes have not changed since the last run are left untouched. The
+ * others are rebuilt from the table, and then the combined archive is
+ * reassembled from the shards.
+ */
 function createUploadAction(
   suffix: string,
   formatter: (circular: Circular) => string
-): CircularAction<{ pack: Pack; promise: Promise<any> }> {
+): CircularAction<Map<number, Map<number, string>>> {
   const Key = getBucketKey(suffix)
+  const manifestKey = getManifestKey(suffix)
   const tarDir = basename(Key, archiveSuffix)
 
   return {
     initialize() {
-      const pack = tarPack()
-      const gzip = createGzip()
-      const Body = new PassThrough()
-      pack.pipe(gzip).pipe(Body)
-      const promise = new Upload({
-        client: s3,
-        params: {
-          Body,
-          Key,
-          ContentType: 'application/gzip',
-          ...putParams,
-        },
-      }).done()
-      return { pack, promise }
+      return new Map()
     },
-    action(circulars, { pack }) {
+    action(circulars, hashesByShard) {
       for (const circular of circulars) {
-        const name = `${tarDir}/${circular.circularId}.${suffix}`
-        pack.entry({ name }, formatter(circular)).end()
+        const shard = Math.floor(circular.circularId / shardSize)
+        let hashes = hashesByShard.get(shard)
+        if (!hashes) {
+          hashes = new Map()
+          hashesByShard.set(shard, hashes)
+        }
+        hashes.set(circular.circularId, hash(formatter(circular)))
       }
     },
-    async finalize({ pack, promise }) {
-      pack.finalize()
-      await promise
+    async finalize(hashesByShard) {
+      const oldManifest = await getManifest(manifestKey)
+      const oldShards = new Map(
+        oldManifest.shards.map((shard) => [shard.key, shard])
+      )
+      const shards: ArchiveShard[] = []
+      let changed = oldManifest.shards.length === 0
+
+      for (const shard of [...hashesByShard.keys()].sort((a, b) => a - b)) {
+        const hashes = hashesByShard.get(shard)!
+        const first = shard * shardSize
+        const last = first + shardSize - 1
+        const key = getShardKey(suffix, first, last)
+        const fingerprint = getFingerprint(hashes)
+        const oldShard = oldShards.get(key)
+        oldShards.delete(key)
+
+        if (oldShard?.fingerprint === fingerprint) {
+          shards.push(oldShard)
+          continue
+        }
+
+        const circulars = await getCircularsById([...hashes.keys()])
+        const entries = await packEntries(tarDir, suffix, formatter, circulars)
+        await s3.send(
+          new PutObjectCommand({
+            Body: Buffer.concat([entries, endOfArchive]),
+            Key: key,
+            ContentType: 'application/gzip',
+            ...putParams,
+          })
+        )
+        shards.push({
+          key,
+          first,
+          last,
+          count: circulars.length,
+          fingerprint,
+          entriesSize: entries.length,
+          updatedOn: Date.now(),
+        })
+        changed = true
+      }
+
+      // Remove shards whose circulars have all been deleted.
+      for (const { key } of oldShards.values()) {
+        await s3.send(new DeleteObjectCommand({ Bucket, Key: key }))
+        changed = true
+      }
+
+      if (!changed) return
+      await uploadCombinedArchive(Key, shards)
+      await s3.send(
+        new PutObjectCommand({
+          Body: JSON.stringify({ shards } satisfies ArchiveManifest),
+          Key: manifestKey,
+          ContentType: 'application/json',
+          ...putParams,
+        })
+      )
     },
   }
 }
@@ -0,0 +1,50 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+import { tables } from '@architect/functions'
+import isEqual from 'lodash/isEqual'
+
+import {
+  getGroupMemberFromUser,
+  getGroups,
+  listGroupMembers,
+  listUsersInGroup,
+} from '~/lib/cognito.server'
+
+/**
+ * Reconcile the mirror of group membership in DynamoDB with Cognito.
+ *
+ * The mirror is updated whenever the app adds or removes users from groups,
+ * but users may also be added or removed from groups outside of the app, or
+ * may update their names or affiliations.
+ */
+async function reconcileGroup(groupName: string) {
+  // Read the mirror before Cognito, so that a user who is added in between
+  // is not removed from the mirror.
+  const mirrored = new Map(
+    (await listGroupMembers(groupName)).map((member) => [member.sub, member])
+  )
+  const members = (await listUsersInGroup(groupName)).map((user) =>
+    getGroupMemberFromUser(groupName, user)
+  )
+  const subs = new Set(members.map(({ sub }) => sub))
+
+  const db = await tables()
+  await Promise.all([
+    ...members
+      .filter((member) => !isEqual(member, mirrored.get(member.sub)))
+      .map((member) => db.group_members.put(member)),
+    ...[...mirrored.keys()]
+      .filter((sub) => !subs.has(sub))
+      .map((sub) => db.group_members.delete({ groupName, sub })),
+  ])
+}
+
+export async function handler() {
+  const groups = await getGroups()
+  for (const { GroupName } of groups) await reconcileGroup(GroupName!)
+}
@@ -0,0 +1,66 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+import { tables } from '@architect/functions'
+import type {
+  BatchWriteCommandInput,
+  DynamoDBDocument,
+} from '@aws-sdk/lib-dynamodb'
+import chunk from 'lodash/chunk'
+import isEqual from 'lodash/isEqual'
+
+import {
+  type RecipientTopic,
+  getRecipientSources,
+  getSourceRecipientSources,
+  markRecipientsMaterialized,
+} from '~/lib/recipients.server'
+
+const topics: RecipientTopic[] = ['circulars', 'announcements']
+
+/**
+ * Reconcile the materialized list of recipients of a topic with the
+ * subscriptions and legacy users that it is derived from.
+ *
+ * The list is updated whenever users subscribe or unsubscribe in the app, but
+ * legacy users are imported from outside of the app.
+ */
+async function reconcileTopic(topic: RecipientTopic) {
+  // Read the materialized list first, so that a recipient who subscribes in
+  // between is not removed from it.
+  const materialized = await getRecipientSources(topic)
+  const expected = await getSourceRecipientSources(topic)
+
+  const db = await tables()
+  const client = db._doc as unknown as DynamoDBDocument
+  const TableName = db.name('email_recipients')
+  const requests = [
+    ...[...expected]
+      .filter(([email, entry]) => !isEqual(entry, materialized.get(email)))
+      .map(([email, { sources, addresses }]) => ({
+        PutRequest: { Item: { topic, email, sources, addresses } },
+      })),
+    ...[...materialized.keys()]
+      .filter((email) => !expected.has(email))
+      .map((email) => ({ DeleteRequest: { Key: { topic, email } } })),
+  ]
+  for (const batch of chunk(requests, 25)) {
+    let RequestItems: BatchWriteCommandInput['RequestItems'] = {
+      [TableName]: batch,
+    }
+    while (RequestItems && Object.keys(RequestItems).length)
+      ({ UnprocessedItems: RequestItems } = await client.batchWrite({
+        RequestItems,
+      }))
+  }
+  await markRecipientsMaterialized(topic)
+  console.log(`Recipients of ${topic}: ${requests.length} updated`)
+}
+
+export async function handler() {
+  for (const topic of topics) await reconcileTopic(topic)
+}
@@ -0,0 +1,60 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+import type { DynamoDBRecord } from 'aws-lambda'
+import isEqual from 'lodash/isEqual'
+
+import { unmarshallTrigger } from '../utils'
+
+/**
+ * Fields that are not part of the published content of a circular, so
+ * changing them does not require republishing it.
+ */
+export const internalFields = ['sub', 'bibcode']
+
+export interface CircularDiff {
+  /**
+   * - insert: the circular was created
+   * - remove: the circular was deleted
+   * - content: published fields of the circular changed
+   * - internal: only {@link internalFields} changed
+   * - none: the old and new images are identical
+   */
+  kind: 'insert' | 'remove' | 'content' | 'internal' | 'none'
+  /** Names of the fields that were added, changed, or removed. */
+  changedFields: string[]
+}
+
+/** Classify the change that a circulars table stream record represents. */
+export function diffCircularRecord({
+  eventName,
+  dynamodb,
+}: DynamoDBRecord): CircularDiff {
+  const oldImage: Record<string, unknown> = dynamodb?.OldImage
+    ? unmarshallTrigger(dynamodb.OldImage)
+    : {}
+  const newImage: Record<string, unknown> = dynamodb?.NewImage
+    ? unmarshallTrigger(dynamodb.NewImage)
+    : {}
+  const changedFields = [
+    ...new Set([...Object.keys(oldImage), ...Object.keys(newImage)]),
+  ].filter((key) => !isEqual(oldImage[key], newImage[key]))
+
+  let kind: CircularDiff['kind']
+  if (eventName === 'INSERT') {
+    kind = 'insert'
+  } else if (eventName === 'REMOVE') {
+    kind = 'remove'
+  } else if (!changedFields.length) {
+    kind = 'none'
+  } else if (changedFields.every((key) => internalFields.includes(key))) {
+    kind = 'internal'
+  } else {
+    kind = 'content'
+  }
+  return { kind, changedFields }
+}
@@ -5,65 +5,294 @@
  *
  * SPDX-License-Identifier: Apache-2.0
  */
-import { search as getSearchClient } from '@nasa-gcn/architect-functions-search'
-import { errors } from '@opensearch-project/opensearch'
+import { tables } from '@architect/functions'
 import type { DynamoDBRecord } from 'aws-lambda'
+import pick from 'lodash/pick'
 
-import { unmarshallTrigger } from '../utils'
+import {
+  getRecordErrors,
+  getSequenceNumber,
+  unmarshallTrigger,
+} from '../utils'
+import { type CircularDiff, diffCircularRecord } from './diff'
 import { send as sendKafka } from '~/lib/kafka.server'
 import { createTriggerHandler } from '~/lib/lambdaTrigger.server'
+import {
+  PartialUpdate,
+  bulkIndex,
+  getWriteIndices,
+} from '~/lib/search.server'
+import { putCircularBodyHast } from '~/routes/circulars/body.server'
+import { bumpSearchCacheVersion } from '~/routes/circulars/cache.server'
 import type { Circular } from '~/routes/circulars/circulars.lib'
 import { send } from '~/routes/circulars/circulars.server'
+import type {
+  Synonym,
+  SynonymGroupWithMembers,
+} from '~/routes/synonyms/synonyms.lib'
+import {
+  ensureEventIdsIndex,
+  eventIdIsInUse,
+  eventIdsIndex,
+  getEventIdDocument,
+  getSynonymGroup,
+  getSynonymGroupMember,
+  sortSynonymGroupMembers,
+} from '~/routes/synonyms/synonyms.server'
 
 import { $id as circularsJsonSchemaId } from '@nasa-gcn/schema/gcn/circulars.schema.json'
 
 const index = 'circulars'
 
-async function removeIndex(id: number) {
-  const client = await getSearchClient()
-  try {
-    await client.delete({ index, id: id.toString() })
-  } catch (e) {
-    if (!(e instanceof errors.ResponseError && e.body.result === 'not_found')) {
-      throw e
+function getCircularId({ dynamodb }: DynamoDBRecord) {
+  return unmarshallTrigger(dynamodb!.Keys).circularId as number
+}
+
+/** Maximum number of new circulars to queue for email at once. */
+const emailConcurrency = 4
+
+/** Fields of a circular that are copied into its synonym group. */
+const synonymGroupFields = ['eventId', 'subject', 'createdOn', 'submitter']
+
+/**
+ * Update the search index for all of the records in one _bulk request.
+ *
+ * If there are several records for the same circular, then the last one wins.
+ * Records that only change internal fields become partial updates, and
+ * records that do not change anything are skipped.
+ *
+ * During a reindex, every write is a full document. The reindex copies
+ * documents into the new index only if they are absent there, so if it had
+ * already copied the old document, a partial update that failed on the new
+ * index would be lost when the alias is swapped.
+ */
+async function updateIndex(
+  records: DynamoDBRecord[],
+  diffs: Map<DynamoDBRecord, CircularDiff>
+) {
+  const indices = await getWriteIndices(index)
+  const reindexing = indices.length > 1
+  const documents = new Map<string, object | undefined>()
+  for (const record of records) {
+    const { kind, changedFields } = diffs.get(record)!
+    const id = getCircularId(record).toString()
+    if (kind === 'none') continue
+    if (kind === 'remove') {
+      documents.set(id, undefined)
+      continue
     }
+
+    const circular = unmarshallTrigger(record.dynamodb!.NewImage) as Circular
+    // A partial update is only enough if it is the only write to the circular
+    // in this batch, and if it does not remove any fields.
+    documents.set(
+      id,
+      kind === 'internal' &&
+        !reindexing &&
+        !documents.has(id) &&
+        changedFields.every((key) => key in circular)
+        ? new PartialUpdate(pick(circular, changedFields))
+        : circular
+    )
+  }
+  return await bulkIndex(indices, documents)
+}
+
+/** Get the event IDs before and after a record, if any. */
+function getEventIds({ dynamodb }: DynamoDBRecord) {
+  return [dynamodb?.OldImage, dynamodb?.NewImage].map(
+    (image) =>
+      image && ((unmarshallTrigger(image) as Circular).eventId || undefined)
+  )
+}
+
+/**
+ * Update the event ID suggestion index for all of the records in one _bulk
+ * request. Returns a map from event IDs to errors.
+ *
+ * An event ID is added when a circular with that event ID is written. It is
+ * removed when the last circular with that event ID is deleted or assigned to
+ * a different event.
+ */
+async function updateEventIdIndex(records: DynamoDBRecord[]) {
+  const added = new Set<string>()
+  const removed = new Set<string>()
+  for (const record of records) {
+    const [oldEventId, newEventId] = getEventIds(record)
+    if (newEventId) added.add(newEventId)
+    if (oldEventId && oldEventId !== newEventId) removed.add(oldEventId)
   }
+
+  const documents = new Map<string, object | undefined>()
+  for (const eventId of added)
+    documents.set(eventId, getEventIdDocument(eventId))
+  await Promise.all(
+    [...removed]
+      .filter((eventId) => !added.has(eventId))
+      .map(async (eventId) => {
+        if (!(await eventIdIsInUse(eventId))) documents.set(eventId, undefined)
+      })
+  )
+  await ensureEventIdsIndex()
+  return await bulkIndex(await getWriteIndices(eventIdsIndex), documents)
 }
 
-async function putIndex(circular: Circular) {
-  const client = await getSearchClient()
-  await client.index({
-    index,
-    id: circular.circularId.toString(),
-    body: circular,
-  })
+/**
+ * Update the member summaries of the synonym groups that the records belong
+ * to, in one _bulk request. Returns a map from event IDs to errors.
+ *
+ * The circularsByEventId index may not reflect the records yet, so the
+ * records themselves are applied on top of the members that it returns.
+ *
+ * The synonyms table stream also writes these documents. Both write them
+ * with the time before their reads as the version, so that an older snapshot
+ * of a group never overwrites a newer one.
+ */
+async function updateSynonymGroupIndex(records: DynamoDBRecord[]) {
+  const version = Date.now()
+  const eventIds = [
+    ...new Set(
+      records.flatMap((record) =>
+        getEventIds(record).filter((eventId) => eventId !== undefined)
+      )
+    ),
+  ]
+  const db = await tables()
+  const synonyms = (
+    await Promise.all(eventIds.map((eventId) => db.synonyms.get({ eventId })))
+  ).filter(Boolean) as Synonym[]
+  const synonymIds = [...new Set(synonyms.map(({ synonymId }) => synonymId))]
+  const groups = await Promise.all(synonymIds.map(getSynonymGroup))
+
+  const documents = new Map<string, SynonymGroupWithMembers>()
+  for (const group of groups) {
+    if (!group) continue
+    for (const record of records) {
+      const circularId = getCircularId(record)
+      group.members = group.members.filter(
+        (member) => member.circularId !== circularId
+      )
+      if (record.eventName === 'REMOVE') continue
+      const circular = unmarshallTrigger(record.dynamodb!.NewImage) as Circular
+      if (circular.eventId && group.eventIds.includes(circular.eventId))
+        group.members.push(getSynonymGroupMember(circular))
+    }
+    sortSynonymGroupMembers(group.members)
+    documents.set(group.synonymId, group)
+  }
+
+  const groupErrors = await bulkIndex(
+    await getWriteIndices('synonym-groups'),
+    documents,
+    { version }
+  )
+  const errors = new Map<string, Error>()
+  for (const { eventId, synonymId } of synonyms) {
+    const error = groupErrors.get(synonymId)
+    if (error) errors.set(eventId, error)
+  }
+  return errors
 }
 
-export const handler = createTriggerHandler(
-  async ({ eventName, dynamodb }: DynamoDBRecord) => {
-    const id = unmarshallTrigger(dynamodb!.Keys).circularId as number
-    const promises = []
-
-    if (eventName === 'REMOVE') {
-      promises.push(removeIndex(id))
-    } /* (eventName === 'INSERT' || eventName === 'MODIFY') */ else {
-      const circular = unmarshallTrigger(dynamodb!.NewImage) as Circular
-      const { sub, ...cleanedCircular } = circular
-      promises.push(
-        putIndex(circular),
-        sendKafka(
-          'gcn.circulars',
-          JSON.stringify({
+export const handler = async (event: { Records: DynamoDBRecord[] }) => {
+  const diffs = new Map(
+    event.Records.map((record) => [record, diffCircularRecord(record)])
+  )
+  const recordsChanging = (fields: string[]) =>
+    event.Records.filter((record) =>
+      diffs.get(record)!.changedFields.some((key) => fields.includes(key))
+    )
+
+  const getCircularIds = (record: DynamoDBRecord) => [
+    getCircularId(record).toString(),
+  ]
+  const recordErrors = await Promise.all([
+    getRecordErrors(
+      event.Records,
+      (records) => updateIndex(records, diffs),
+      getCircularIds
+    ),
+    getRecordErrors(
+      recordsChanging(['eventId']),
+      updateEventIdIndex,
+      getEventIds
+    ),
+    getRecordErrors(
+      recordsChanging(synonymGroupFields),
+      updateSynonymGroupIndex,
+      getEventIds
+    ),
+  ])
+
+  // Invalidate cached search results only after the index has been updated.
+  if ([...diffs.values()].some(({ kind }) => kind !== 'none'))
+    await bumpSearchCacheVersion()
+
+  function getRecordError(record: DynamoDBRecord) {
+    for (const errors of recordErrors) {
+      const error = errors.get(record)
+      if (error) return error
+    }
+  }
+
+  // Only republish circulars whose published content has changed. Publish
+  // them all in one batch, keyed by circular ID.
+  const published = event.Records.filter(
+    (record) =>
+      ['insert', 'content'].includes(diffs.get(record)!.kind) &&
+      !getRecordError(record)
+  )
+  let kafkaError: unknown
+  try {
+    await sendKafka(
+      'gcn.circulars',
+      published.map(({ dynamodb }) => {
+        const { sub, ...cleanedCircular } = unmarshallTrigger(
+          dynamodb!.NewImage
+        ) as Circular
+        return {
+          key: cleanedCircular.circularId.toString(),
+          value: JSON.stringify({
             $schema: circularsJsonSchemaId,
             ...cleanedCircular,
-          })
+          }),
+        }
+      })
+    )
+  } catch (e) {
+    kafkaError = e
+  }
+
+  // Render the bodies of new versions ahead of their first page views. This
+  // is only an optimization, so failures do not fail the records.
+  await Promise.all(
+    event.Records.filter((record) =>
+      ['insert', 'content'].includes(diffs.get(record)!.kind)
+    ).map(async ({ dynamodb }) => {
+      try {
+        await putCircularBodyHast(
+          unmarshallTrigger(dynamodb!.NewImage) as Circular
         )
-      )
-      if (eventName === 'INSERT') {
-        promises.push(send(circular))
+      } catch (e) {
+        console.error(e)
       }
-    }
+    })
+  )
 
-    await Promise.all(promises)
-  }
-)
+  return await createTriggerHandler(
+    async (record: DynamoDBRecord) => {
+      const error =
+        getRecordError(record) ??
+        (published.includes(record) ? kafkaError : undefined)
+      if (error) throw error
+
+      if (diffs.get(record)!.kind === 'insert')
+        await send(unmarshallTrigger(record.dynamodb!.NewImage) as Circular)
+    },
+    {
+      concurrency: emailConcurrency,
+      getItemIdentifier: getSequenceNumber,
+      deadLetter: { source: 'circulars', getRecordId: getSequenceNumber },
+    }
+  )(event)
+}
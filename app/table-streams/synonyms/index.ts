@@ -5,57 +5,73 @@
  *
  * SPDX-License-Identifier: Apache-2.0
  */
-import { search as getSearchClient } from '@nasa-gcn/architect-functions-search'
-import { errors } from '@opensearch-project/opensearch'
 import type { DynamoDBRecord } from 'aws-lambda'
 
-import { unmarshallTrigger } from '../utils'
+import {
+  getRecordErrors,
+  getSequenceNumber,
+  unmarshallTrigger,
+} from '../utils'
 import { createTriggerHandler } from '~/lib/lambdaTrigger.server'
+import { bulkIndex, getWriteIndices } from '~/lib/search.server'
 import type { Synonym, SynonymGroup } from '~/routes/synonyms/synonyms.lib'
-import { getSynonymsByUuid } from '~/routes/synonyms/synonyms.server'
+import { getSynonymGroup } from '~/routes/synonyms/synonyms.server'
 
 const index = 'synonym-groups'
 
-async function removeIndex(id: string) {
-  const client = await getSearchClient()
-
-  try {
-    await client.delete({ index, id })
-  } catch (e) {
-    if (!(e instanceof errors.ResponseError && e.body.result === 'not_found')) {
-      throw e
-    }
-  }
+/** Get the IDs of the synonym groups that a record has touched. */
+function getSynonymIds({ dynamodb }: DynamoDBRecord) {
+  return [dynamodb?.OldImage, dynamodb?.NewImage]
+    .filter((image) => image !== undefined)
+    .map((image) => (unmarshallTrigger(image) as Synonym).synonymId)
 }
 
-async function putIndex(synonymGroup: SynonymGroup) {
-  const client = await getSearchClient()
-  await client.index({
-    index,
-    id: synonymGroup.synonymId,
-    body: synonymGroup,
+/**
+ * Update the search index for all of the records in one _bulk request.
+ *
+ * Each synonym group is looked up and written only once, no matter how many
+ * records touched it. Returns a map from synonym group IDs to errors.
+ *
+ * The circulars table stream also writes these documents. Both write them
+ * with the time before their reads as the version, so that an older snapshot
+ * of a group never overwrites a newer one.
+ */
+async function updateIndex(records: DynamoDBRecord[]) {
+  const version = Date.now()
+  const synonymIds = [...new Set(records.flatMap(getSynonymIds))]
+  const results = await Promise.allSettled(synonymIds.map(getSynonymGroup))
+
+  const errors = new Map<string, unknown>()
+  const documents = new Map<string, SynonymGroup | undefined>()
+  results.forEach((result, i) => {
+    if (result.status === 'fulfilled') {
+      documents.set(synonymIds[i], result.value)
+    } else {
+      errors.set(synonymIds[i], result.reason)
+    }
   })
+
+  const indices = await getWriteIndices(index)
+  const bulkErrors = await bulkIndex(indices, documents, { version })
+  for (const [synonymId, error] of bulkErrors) errors.set(synonymId, error)
+  return errors
 }
 
-export const handler = createTriggerHandler(
-  async ({ eventName, dynamodb }: DynamoDBRecord) => {
-    if (!eventName || !dynamodb) return
-    await Promise.all(
-      [dynamodb.OldImage, dynamodb.NewImage]
-        .filter((image) => image !== undefined)
-        .map(async (image) => {
-          const { synonymId } = unmarshallTrigger(image) as Synonym
-          const synonyms = await getSynonymsByUuid(synonymId)
-          if (synonyms.length > 0) {
-            await putIndex({
-              synonymId,
-              eventIds: synonyms.map((synonym) => synonym.eventId),
-              slugs: synonyms.map((synonym) => synonym.slug),
-            })
-          } else {
-            await removeIndex(synonymId)
-          }
-        })
-    )
-  }
-)
+export const handler = async (event: { Records: DynamoDBRecord[] }) => {
+  const errors = await getRecordErrors(
+    event.Records,
+    updateIndex,
+    getSynonymIds
+  )
+
+  return await createTriggerHandler(
+    async (record: DynamoDBRecord) => {
+      const error = errors.get(record)
+      if (error) throw error
+    },
+    {
+      getItemIdentifier: getSequenceNumber,
+      deadLetter: { source: 'synonyms', getRecordId: getSequenceNumber },
+    }
+  )(event)
+}
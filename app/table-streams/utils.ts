@@ -6,11 +6,57 @@
  * SPDX-License-Identifier: Apache-2.0
  */
 import type { AttributeValue } from '@aws-sdk/client-dynamodb'
-import { unmarshall } from '@aws-sdk/util-dynamodb'
-import type { AttributeValue as LambdaTriggerAttributeValue } from 'aws-lambda'
+import { marshall, unmarshall } from '@aws-sdk/util-dynamodb'
+import type {
+  AttributeValue as LambdaTriggerAttributeValue,
+  DynamoDBRecord,
+} from 'aws-lambda'
 
 export function unmarshallTrigger(
   item?: Record<string, LambdaTriggerAttributeValue>
 ) {
   return unmarshall(item as Record<string, AttributeValue>)
 }
+
+export function marshallTrigger(item: Record<string, unknown>) {
+  return marshall(item) as Record<string, LambdaTriggerAttributeValue>
+}
+
+/** Identify a record when reporting partial batch failures. */
+export function getSequenceNumber({ dynamodb }: DynamoDBRecord) {
+  return dynamodb!.SequenceNumber!
+}
+
+/**
+ * Run an update for a batch of records, and map the errors that it returns
+ * for each key to the records that have those keys.
+ *
+ * If the update fails as a whole, for example because OpenSearch is
+ * unavailable, then every record fails with its error. That way, the records
+ * are retried and eventually kept as dead letters, just like records that
+ * failed individually.
+ */
+export async function getRecordErrors<T>(
+  records: T[],
+  update: (records: T[]) => Promise<Map<string, unknown>>,
+  getKeys: (record: T) => (string | undefined)[]
+) {
+  const recordErrors = new Map<T, unknown>()
+  let errors
+  try {
+    errors = await update(records)
+  } catch (e) {
+    for (const record of records) recordErrors.set(record, e)
+    return recordErrors
+  }
+  for (const record of records) {
+    for (const key of getKeys(record)) {
+      const error = key === undefined ? undefined : errors.get(key)
+      if (error) {
+        recordErrors.set(record, error)
+        break
+      }
+    }
+  }
+  return recordErrors
+}
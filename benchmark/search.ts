@@ -0,0 +1,296 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+
+/**
+ * Search latency and throughput benchmark.
+ *
+ * Seeds the local sandbox search with synthetic corpora of circulars and
+ * synonym groups built from sandbox-seed.json, runs a fixed mix of queries
+ * against each corpus, and prints latency percentiles and throughput as JSON.
+ *
+ * Start the local sandbox in another terminal with `npm run dev`, then run:
+ *
+ * ```
+ * npm run benchmark -- --sizes 10000,50000,200000 --output results.json
+ * ```
+ *
+ * WARNING: this replaces the contents of the sandbox's circulars,
+ * synonym-groups, and event-ids indices. Restart the sandbox to restore the
+ * seed data.
+ */
+import groupBy from 'lodash/groupBy'
+import { execSync } from 'node:child_process'
+import { readFile, writeFile } from 'node:fs/promises'
+import { performance } from 'node:perf_hooks'
+import { parseArgs } from 'node:util'
+
+import type { Circular } from '~/routes/circulars/circulars.lib'
+
+const { values: args } = parseArgs({
+  options: {
+    sizes: { type: 'string', default: '10000,50000,200000' },
+    iterations: { type: 'string', default: '50' },
+    concurrency: { type: 'string', default: '8' },
+    output: { type: 'string' },
+  },
+})
+const sizes = args.sizes.split(',').map(Number)
+const iterations = Number(args.iterations)
+const concurrency = Number(args.concurrency)
+
+// The app modules read their configuration from the environment when they are
+// loaded, so provide defaults for the local sandbox before importing them.
+process.env.ARC_ENV ??= 'testing'
+process.env.ARC_SANDBOX ??= JSON.stringify({
+  ports: { http: 3333, events: 4444, tables: 5555, _arc: 2222 },
+})
+process.env.ARC_STATIC_BUCKET ??= 'sandbox-bucket'
+process.env.AWS_REGION ??= 'us-east-1'
+
+const circularsServer = import('~/routes/circulars/circulars.server')
+const synonymsServer = import('~/routes/synonyms/synonyms.server')
+
+const indices = ['circulars', 'synonym-groups', 'event-ids']
+const batchSize = 2000
+
+/** Replace the search indices with a synthetic corpus of the given size. */
+async function seed(size: number) {
+  const { search: getSearchClient } = await import(
+    '@nasa-gcn/architect-functions-search'
+  )
+  const { eventIdsIndex, eventIdsIndexBody, getEventIdDocument } =
+    await synonymsServer
+  const client = await getSearchClient()
+  const { circulars, synonyms } = JSON.parse(
+    await readFile('sandbox-seed.json', { encoding: 'utf-8' })
+  )
+
+  // Resolve aliases to concrete indices, which are what we can delete.
+  const { body: existing } = await client.indices.get({
+    index: indices.join(','),
+    ignore_unavailable: true,
+  })
+  if (Object.keys(existing).length)
+    await client.indices.delete({ index: Object.keys(existing).join(',') })
+
+  // Create the event ID index with its mappings before writing to it, because
+  // the completion field is not created by dynamic mapping.
+  await client.indices.create({ index: eventIdsIndex, body: eventIdsIndexBody })
+
+  // Spread the circulars evenly in time from the start of the archive.
+  const start = Date.UTC(1997, 0, 1)
+  const end = Date.now()
+  const createdOn = (i: number) =>
+    Math.round(start + ((end - start) * i) / size)
+
+  // Copies of the seed circulars get distinct event IDs, so that the number of
+  // distinct events grows with the corpus.
+  const suffix = (copy: number) => (copy ? `-${copy}` : '')
+
+  const eventIds = new Set<string>()
+  let body = []
+  for (let i = 0; i < size; i++) {
+    const template = circulars[i % circulars.length]
+    const copy = Math.floor(i / circulars.length)
+    const circularId = i + 1
+    const eventId = template.eventId && `${template.eventId}${suffix(copy)}`
+    if (eventId) eventIds.add(eventId)
+    body.push(
+      { index: { _index: 'circulars', _id: circularId.toString() } },
+      { ...template, circularId, createdOn: createdOn(i), eventId }
+    )
+    if (body.length >= 2 * batchSize || i === size - 1) {
+      const {
+        body: { errors },
+      } = await client.bulk({ body })
+      if (errors) throw new Error('Failed to seed circulars')
+      body = []
+    }
+  }
+
+  const groups = Object.entries(
+    groupBy(
+      synonyms as { synonymId: string; eventId: string; slug: string }[],
+      ({ synonymId }) => synonymId
+    )
+  )
+  const copies = Math.ceil(size / circulars.length)
+  for (let copy = 0; copy < copies; copy++) {
+    body = groups.flatMap(([synonymId, values]) => {
+      const eventIds = values.map(({ eventId }) => eventId)
+      return [
+        {
+          index: {
+            _index: 'synonym-groups',
+            _id: `${synonymId}${suffix(copy)}`,
+          },
+        },
+        {
+          synonymId: `${synonymId}${suffix(copy)}`,
+          eventIds: eventIds.map((eventId) => `${eventId}${suffix(copy)}`),
+          slugs: values.map(({ slug }) => `${slug}${suffix(copy)}`),
+          members: circulars.flatMap(
+            ({ eventId, subject, submitter }: Circular, j: number) => {
+              const i = copy * circulars.length + j
+              if (!eventId || !eventIds.includes(eventId) || i >= size)
+                return []
+              return [
+                {
+                  circularId: i + 1,
+                  subject,
+                  submitter,
+                  createdOn: createdOn(i),
+                },
+              ]
+            }
+          ),
+        },
+      ]
+    })
+    const {
+      body: { errors },
+    } = await client.bulk({ body })
+    if (errors) throw new Error('Failed to seed synonym groups')
+  }
+
+  const eventIdDocuments = [...eventIds].flatMap((eventId) => [
+    { index: { _index: eventIdsIndex, _id: eventId } },
+    getEventIdDocument(eventId),
+  ])
+  for (let i = 0; i < eventIdDocuments.length; i += 2 * batchSize) {
+    const {
+      body: { errors },
+    } = await client.bulk({
+      body: eventIdDocuments.slice(i, i + 2 * batchSize),
+    })
+    if (errors) throw new Error('Failed to seed event IDs')
+  }
+
+  await client.indices.refresh({ index: indices.join(',') })
+}
+
+/** Get a cursor that points halfway through the corpus. */
+async function getDeepCursor(size: number) {
+  const { search } = await circularsServer
+  const limit = 100
+  let result = await search({ page: 99, limit, cache: false })
+  for (let depth = 100 * limit; depth < size / 2; depth += limit) {
+    result = await search({ cursor: result.nextCursor, limit, cache: false })
+  }
+  return result.nextCursor
+}
+
+async function getQueries(
+  deepCursor?: string
+): Promise<Record<string, () => Promise<any>>> {
+  const { search } = await circularsServer
+  const {
+    autoCompleteEventIds,
+    groupMembersByEventId,
+    searchSynonymsByEventId,
+  } = await synonymsServer
+  return {
+    'plain text': () =>
+      search({ query: 'GRB optical afterglow', limit: 100, cache: false }),
+    lucene: () =>
+      search({
+        query: 'subject:"Swift" AND body:(optical OR X-ray)',
+        limit: 100,
+        cache: false,
+      }),
+    'date range': () =>
+      search({
+        startDate: '2010-01-01',
+        endDate: '2015-12-31',
+        limit: 100,
+        cache: false,
+      }),
+    'fuzzy date range': () =>
+      search({ startDate: 'year', limit: 100, cache: false }),
+    'deep page': () => search({ page: 99, limit: 100, cache: false }),
+    'deep cursor': () =>
+      search({ cursor: deepCursor, limit: 100, cache: false }),
+    relevance: () =>
+      search({
+        query: 'Fermi GBM',
+        sort: 'relevance',
+        limit: 100,
+        cache: false,
+      }),
+    searchSynonymsByEventId: () =>
+      searchSynonymsByEventId({ page: 0, eventId: 'GRB 230' }),
+    autoCompleteEventIds: () => autoCompleteEventIds({ query: 'GRB 23' }),
+    groupMembersByEventId: () =>
+      groupMembersByEventId({ page: 0, query: 'GRB' }),
+  }
+}
+
+function percentile(sorted: number[], p: number) {
+  return sorted[Math.min(sorted.length - 1, Math.floor(sorted.length * p))]
+}
+
+async function measure(fn: () => Promise<any>) {
+  // Warm up connections and JIT.
+  await fn()
+
+  // Latency: one request at a time.
+  const latencies = []
+  for (let i = 0; i < iterations; i++) {
+    const t0 = performance.now()
+    await fn()
+    latencies.push(performance.now() - t0)
+  }
+  latencies.sort((a, b) => a - b)
+
+  // Throughput: several requests at a time.
+  let remaining = iterations
+  const t0 = performance.now()
+  await Promise.all(
+    Array.from({ length: concurrency }, async () => {
+      while (remaining-- > 0) await fn()
+    })
+  )
+  const seconds = (performance.now() - t0) / 1000
+
+  return {
+    p50: percentile(latencies, 0.5),
+    p95: percentile(latencies, 0.95),
+    p99: percentile(latencies, 0.99),
+    throughput: iterations / seconds,
+  }
+}
+
+async function main() {
+  const results = []
+  for (const size of sizes) {
+    console.error(`Seeding ${size} circulars`)
+    await seed(size)
+    const queries = await getQueries(await getDeepCursor(size))
+    for (const [name, fn] of Object.entries(queries)) {
+      console.error(`Measuring ${name} with ${size} circulars`)
+      results.push({ size, query: name, ...(await measure(fn)) })
+    }
+  }
+
+  const report = JSON.stringify(
+    {
+      commit: execSync('git rev-parse HEAD', { encoding: 'utf-8' }).trim(),
+      date: new Date().toISOString(),
+      iterations,
+      concurrency,
+      units: { latency: 'ms', throughput: 'requests/s' },
+      results,
+    },
+    null,
+    2
+  )
+  if (args.output) await writeFile(args.output, report)
+  console.log(report)
+}
+
+main()
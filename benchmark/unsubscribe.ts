@@ -0,0 +1,109 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+
+/**
+ * Unsubscribe link signing benchmark.
+ *
+ * Measures the time to build the per-recipient template data of a bulk email
+ * for a synthetic list of recipients: signing a fresh unsubscribe token for
+ * every recipient, as sendEmailBulk used to, and using the cache on the first
+ * and on later mailings. Prints the results as JSON.
+ *
+ * ```
+ * npm run benchmark:unsubscribe -- --recipients 10000 --iterations 5
+ * ```
+ */
+import { performance } from 'node:perf_hooks'
+import { parseArgs } from 'node:util'
+
+const { values: args } = parseArgs({
+  options: {
+    recipients: { type: 'string', default: '10000' },
+    iterations: { type: 'string', default: '5' },
+  },
+})
+
+async function time(fn: () => Promise<unknown>) {
+  const start = performance.now()
+  await fn()
+  return performance.now() - start
+}
+
+async function main() {
+  // The modules under test read these at import time.
+  process.env.ORIGIN ??= 'https://gcn.nasa.gov'
+  process.env.ARC_STATIC_BUCKET ??= 'example-bucket'
+  process.env.AWS_REGION ??= 'us-east-1'
+  const { getReplacementTemplateData } = await import('~/lib/email.server')
+  const { encodeToURL } = await import('~/routes/unsubscribe.$jwt/jwt.server')
+
+  const recipients = parseInt(args.recipients)
+  const iterations = parseInt(args.iterations)
+  const topic = 'circulars'
+  const addresses = Array.from(
+    { length: recipients },
+    (_, i) => `user${i}@example.com`
+  )
+
+  const uncached: number[] = []
+  const cachedFirst: number[] = []
+  const cachedRepeat: number[] = []
+  for (let i = 0; i < iterations; i++) {
+    uncached.push(
+      await time(() =>
+        Promise.all(
+          addresses.map(async (email) =>
+            JSON.stringify({
+              perUserBody: `\n---\nTo unsubscribe, open this link in a web browser:\n${await encodeToURL(
+                { email, topics: [topic] }
+              )}`,
+            })
+          )
+        )
+      )
+    )
+    getReplacementTemplateData.clear()
+    cachedFirst.push(
+      await time(() =>
+        Promise.all(
+          addresses.map((email) => getReplacementTemplateData(email, topic))
+        )
+      )
+    )
+    cachedRepeat.push(
+      await time(() =>
+        Promise.all(
+          addresses.map((email) => getReplacementTemplateData(email, topic))
+        )
+      )
+    )
+  }
+
+  const summarize = (values: number[]) => {
+    const median = values.sort((a, b) => a - b)[Math.floor(values.length / 2)]
+    return {
+      medianMilliseconds: median,
+      millisecondsPer10kRecipients: (median * 10_000) / recipients,
+    }
+  }
+  console.log(
+    JSON.stringify(
+      {
+        recipients,
+        iterations,
+        uncached: summarize(uncached),
+        cachedFirstMailing: summarize(cachedFirst),
+        cachedLaterMailing: summarize(cachedRepeat),
+      },
+      null,
+      2
+    )
+  )
+}
+
+main()
@@ -204,6 +204,11 @@ export default {
         },
       },
     },
+    'search-reindex': {
+      circulars: { alias: 'circulars' },
+      'event-ids': { alias: 'event-ids' },
+      'synonym-groups': { alias: 'synonym-groups' },
+    },
   },
   scheduled: {},
   'tables-streams': {
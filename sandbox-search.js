@@ -12,13 +12,25 @@ export default async function () {
   const { circulars, synonyms } = JSON.parse(text)
   const groups = Object.entries(
     Object.groupBy(synonyms, ({ synonymId }) => synonymId)
-  ).flatMap(([synonymId, values]) => [
-    {
-      synonymId,
-      eventIds: values.map(({ eventId }) => eventId),
-      slugs: values.map(({ slug }) => slug),
-    },
-  ])
+  ).flatMap(([synonymId, values]) => {
+    const eventIds = values.map(({ eventId }) => eventId)
+    return [
+      {
+        synonymId,
+        eventIds,
+        slugs: values.map(({ slug }) => slug),
+        members: circulars
+          .filter(({ eventId }) => eventIds.includes(eventId))
+          .map(({ circularId, subject, createdOn, submitter }) => ({
+            circularId,
+            subject,
+            createdOn,
+            submitter,
+          }))
+          .sort((a, b) => a.circularId - b.circularId),
+      },
+    ]
+  })
   return [
     ...circulars.flatMap((item) => [
       { index: { _index: 'circulars', _id: item.circularId.toString() } },
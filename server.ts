@@ -1,8 +1,18 @@
 import { type RequestHandler, createRequestHandler } from '@remix-run/architect'
 import * as build from '@remix-run/dev/server-build'
-import { type APIGatewayProxyStructuredResultV2 } from 'aws-lambda'
+import {
+  type APIGatewayProxyEventV2,
+  type APIGatewayProxyStructuredResultV2,
+} from 'aws-lambda'
 import sourceMapSupport from 'source-map-support'
 
+import {
+  anonymousCacheControlHeader,
+  getETag,
+  isNotModified,
+} from '~/lib/headers.server'
+import { sessionCookieName } from '~/routes/_auth/auth.server'
+
 sourceMapSupport.install()
 
 const remixHandler = createRequestHandler({
@@ -12,6 +22,109 @@ const remixHandler = createRequestHandler({
 
 const { CDN_SECRET } = process.env
 
+/** Headers that a 304 Not Modified response repeats from the full response. */
+const notModifiedHeaders = [
+  'cache-control',
+  'content-location',
+  'date',
+  'etag',
+  'expires',
+  'last-modified',
+  'vary',
+]
+
+type ResultHeaders = NonNullable<APIGatewayProxyStructuredResultV2['headers']>
+
+/**
+ * Find the key of a response header. Response header names are lower case, so
+ * check for any capitalization.
+ */
+function findHeader(headers: ResultHeaders, name: string) {
+  name = name.toLowerCase()
+  return Object.keys(headers).find((key) => key.toLowerCase() === name)
+}
+
+/**
+ * Apply the cache policy that a route declared for anonymous requests.
+ *
+ * Routes that render the same page for everyone who is not signed in opt in
+ * by sending the anonymousCacheControlHeader. It becomes the Cache-Control
+ * header if the request has no session cookie and the response sets no
+ * cookies. Otherwise, it is removed, and the response is not cached.
+ */
+function withAnonymousCaching(
+  event: APIGatewayProxyEventV2,
+  result: APIGatewayProxyStructuredResultV2
+): APIGatewayProxyStructuredResultV2 {
+  const headers = (result.headers ??= {})
+  const key = findHeader(headers, anonymousCacheControlHeader)
+  if (key === undefined) return result
+  const cacheControl = headers[key]
+  delete headers[key]
+
+  if (
+    result.statusCode !== 200 ||
+    !['GET', 'HEAD'].includes(event.requestContext.http.method) ||
+    result.cookies?.length ||
+    findHeader(headers, 'Set-Cookie') !== undefined ||
+    findHeader(headers, 'Cache-Control') !== undefined ||
+    event.cookies?.some(
+      (cookie) => cookie.split('=', 1)[0].trim() === sessionCookieName
+    )
+  )
+    return result
+
+  headers['Cache-Control'] = cacheControl
+  // Signed-in users must not get the anonymous page from any cache.
+  const varyKey = findHeader(headers, 'Vary')
+  if (varyKey === undefined) headers['Vary'] = 'Cookie'
+  else headers[varyKey] = `${headers[varyKey]}, Cookie`
+  return result
+}
+
+/**
+ * Handle conditional requests for publicly cacheable responses.
+ *
+ * Responses with public Cache-Control get a strong ETag computed from the
+ * body, unless the route provided one. If the request's If-None-Match or
+ * If-Modified-Since header shows that the client or CDN already has the
+ * response, then it is replaced by an empty 304 Not Modified response.
+ */
+function withConditionalCaching(
+  event: APIGatewayProxyEventV2,
+  result: APIGatewayProxyStructuredResultV2
+): APIGatewayProxyStructuredResultV2 {
+  if (result.statusCode !== 200 || event.requestContext.http.method !== 'GET')
+    return result
+
+  const resultHeaders = (result.headers ??= {})
+  const headers = new Headers(
+    Object.entries(resultHeaders).map(([key, value]) => [key, String(value)])
+  )
+  if (!headers.get('Cache-Control')?.split(/\s*,\s*/).includes('public'))
+    return result
+  if (!headers.has('ETag') && result.body !== undefined) {
+    resultHeaders['ETag'] = getETag(result.body)
+    headers.set('ETag', resultHeaders['ETag'])
+  }
+
+  const requestHeaders = new Headers(
+    Object.entries(event.headers).flatMap(([key, value]) =>
+      value === undefined ? [] : [[key, value]]
+    )
+  )
+  if (!isNotModified(requestHeaders, headers)) return result
+
+  return {
+    statusCode: 304,
+    headers: Object.fromEntries(
+      Object.entries(resultHeaders).filter(([key]) =>
+        notModifiedHeaders.includes(key.toLowerCase())
+      )
+    ),
+  }
+}
+
 export const handler: RequestHandler = async (event, ...args) => {
   if (CDN_SECRET && event.headers['x-cdn-secret'] !== CDN_SECRET)
     // FIXME: this shouldn't need to be a promise.
@@ -22,10 +135,12 @@ export const handler: RequestHandler = async (event, ...args) => {
   // This prevents us from showing stale pages. For example, if the user
   // logs out and then clicks the "back" button, they should not see a page
   // that looks like they are still logged in.
-  const result = (await remixHandler(
+  const result = withAnonymousCaching(
     event,
-    ...args
-  )) as APIGatewayProxyStructuredResultV2
-  ;(result.headers ??= {})['Cache-Control'] ??= 'max-age=0, no-store'
-  return result
+    (await remixHandler(event, ...args)) as APIGatewayProxyStructuredResultV2
+  )
+  const headers = (result.headers ??= {})
+  if (findHeader(headers, 'Cache-Control') === undefined)
+    headers['Cache-Control'] = 'max-age=0, no-store'
+  return withConditionalCaching(event, result)
 }
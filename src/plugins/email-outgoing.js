@@ -33,6 +33,11 @@ export const deploy = {
               },
             ],
           },
+          {
+            Effect: 'Allow',
+            Action: ['ses:GetAccount'],
+            Resource: '*',
+          },
         ],
       },
     })
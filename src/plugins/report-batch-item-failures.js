@@ -0,0 +1,25 @@
+/*!
+ * Copyright © 2023 United States Government as represented by the
+ * Administrator of the National Aeronautics and Space Administration.
+ * All Rights Reserved.
+ *
+ * SPDX-License-Identifier: Apache-2.0
+ */
+
+// Let table stream handlers report partial batch failures, so that only the
+// records that failed are retried.
+export const deploy = {
+  start({ cloudformation }) {
+    for (const { Type, Properties } of Object.values(
+      cloudformation.Resources
+    )) {
+      if (
+        Type === 'AWS::Lambda::EventSourceMapping' &&
+        Properties.EventSourceArn?.['Fn::GetAtt']?.[1] === 'StreamArn'
+      ) {
+        Properties.FunctionResponseTypes = ['ReportBatchItemFailures']
+      }
+    }
+    return cloudformation
+  },
+}